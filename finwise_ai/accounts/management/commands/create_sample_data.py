@@ -6,7 +6,7 @@ import random
 from decimal import Decimal
 
 from accounts.models import UserProfile
-from expenses.models import ExpenseCategory, Expense, RecurringExpense, AnomalyDetection
+from expenses.models import ExpenseCategory, Expense, AnomalyDetection
 from loans.models import LoanType, Loan
 from goals.models import SavingsGoal, GoalContribution
 from investments.models import InvestmentType, Investment, InvestmentTransaction
@@ -86,26 +86,18 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS('Created sample expenses'))
         
         # Create recurring expenses
-        if RecurringExpense.objects.filter(parent_expense__user=demo_user).count() < 5:
-            # First create parent expenses
+        if Expense.objects.filter(user=demo_user).exclude(recurrence='none').count() < 5:
+            # Occurrences are generated from the rule, so only the parent expenses are stored
             for category in random.sample(category_objects, 5):
-                parent_expense = Expense.objects.create(
+                Expense.objects.create(
                     user=demo_user,
                     category=category,
                     amount=Decimal(str(random.randint(100, 2000) + random.random())).quantize(Decimal('0.01')),
                     description=f"Recurring {category.name.lower()}",
-                    date=timezone.now() - timedelta(days=30),
-                    recurrence='monthly'
+                    date=(timezone.now() - timedelta(days=30)).date(),
+                    recurrence='monthly',
+                    recurrence_end_date=(timezone.now() + timedelta(days=90)).date()
                 )
-                
-                # Create recurring instances
-                for i in range(1, 4):  # Create 3 future instances
-                    RecurringExpense.objects.create(
-                        parent_expense=parent_expense,
-                        amount=parent_expense.amount,
-                        date=timezone.now() + timedelta(days=30*i),
-                        is_paid=False
-                    )
             self.stdout.write(self.style.SUCCESS('Created recurring expenses'))
         
         # Create some anomalies
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='cash_balance',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='emergency_fund',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='other_assets_value',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='other_liabilities_value',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='other_monthly_debt_payments',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+    ]
@@ -81,6 +81,13 @@ class UserProfile(models.Model):
     investment_focused = models.BooleanField(default=False)
     budget_conscious = models.BooleanField(default=False)
     
+    # Balance sheet items not tracked by other apps
+    cash_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    emergency_fund = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    other_assets_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # Property, vehicles, etc.
+    other_liabilities_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    other_monthly_debt_payments = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -0,0 +1,12 @@
+from finwise.query_plans import hot_query
+from .models import CreditEstimation, CreditHistory
+
+
+@hot_query('credit.history')
+def history(user, today):
+    return CreditHistory.objects.filter(user=user).order_by('-date')
+
+
+@hot_query('credit.latest_estimation')
+def latest_estimation(user, today):
+    return CreditEstimation.objects.filter(user=user).order_by('-created_at')[:1]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='creditestimation',
+            index=models.Index(fields=['user', '-created_at'], name='creditest_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='credithistory',
+            index=models.Index(fields=['user', '-date'], name='credithistory_user_date_idx'),
+        ),
+    ]
@@ -33,6 +33,9 @@ class CreditHistory(models.Model):
         ordering = ['-date']
         verbose_name = "Credit History"
         verbose_name_plural = "Credit Histories"
+        indexes = [
+            models.Index(fields=['user', '-date'], name='credithistory_user_date_idx'),
+        ]
 
 
 class CreditFactorScore(models.Model):
@@ -94,6 +97,9 @@ class CreditEstimation(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='creditest_user_created_idx'),
+        ]
 
 
 class ImprovementSuggestion(models.Model):
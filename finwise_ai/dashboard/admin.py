@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Dashboard, DashboardWidget, Notification, FinancialInsight
+from .models import Dashboard, DashboardWidget, Notification, FinancialInsight, NetWorthSnapshot, WidgetSnapshot, FinancialHealthScore
 
 
 @admin.register(Dashboard)
@@ -28,3 +28,24 @@ class FinancialInsightAdmin(admin.ModelAdmin):
     list_display = ("user", "title", "category", "importance_score")
     list_filter = ("category",)
     search_fields = ("title", "user__email")
+
+
+@admin.register(NetWorthSnapshot)
+class NetWorthSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("user", "month", "assets", "liabilities", "net_worth", "computed_at")
+    list_filter = ("month",)
+    search_fields = ("user__email",)
+
+
+@admin.register(FinancialHealthScore)
+class FinancialHealthScoreAdmin(admin.ModelAdmin):
+    list_display = ("user", "date", "score", "dti_score", "emergency_fund_score", "savings_rate_score")
+    list_filter = ("date",)
+    search_fields = ("user__email",)
+
+
+@admin.register(WidgetSnapshot)
+class WidgetSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("widget", "computed_for", "computed_at", "next_refresh_at")
+    list_filter = ("computed_for",)
+    search_fields = ("widget__title", "widget__dashboard__user__email")
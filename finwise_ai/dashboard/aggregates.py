@@ -0,0 +1,88 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import Q, Sum
+from django.utils import timezone
+from expenses.models import Expense
+
+WEEKS_IN_TREND = 4
+
+
+def month_bounds(today):
+    """Return the first day of the current month and of the previous month."""
+    current_month_start = today.replace(day=1)
+    last_month_start = (current_month_start - timedelta(days=1)).replace(day=1)
+    return current_month_start, last_month_start
+
+
+def weekly_ranges(today, weeks=WEEKS_IN_TREND):
+    """Return (label, start, end) tuples for the last completed weeks, oldest first."""
+    ranges = []
+
+    for i in range(weeks, 0, -1):
+        week_end = today - timedelta(days=today.weekday() + 1 + (7 * (i - 1)))
+        week_start = week_end - timedelta(days=6)
+        ranges.append((f'Week {weeks + 1 - i}', week_start, week_end))
+
+    return ranges
+
+
+def expense_overview(user, today=None):
+    """
+    Aggregate the dashboard expense figures for a user.
+
+    Month totals and the weekly trend come from one conditional aggregate and
+    the category breakdown from one grouped aggregate, so the page always costs
+    two queries regardless of how many categories or expenses exist.
+    """
+    today = today or timezone.now().date()
+    current_month_start, last_month_start = month_bounds(today)
+    weeks = weekly_ranges(today)
+
+    # Single pass over the window covering both months and all trend weeks
+    window_start = min(last_month_start, weeks[0][1])
+    expenses = Expense.objects.filter(user=user, date__gte=window_start, date__lte=today)
+
+    aggregates = {
+        'current_month': Sum('amount', filter=Q(date__gte=current_month_start)),
+        'last_month': Sum('amount', filter=Q(date__gte=last_month_start, date__lt=current_month_start)),
+    }
+    for index, (_, week_start, week_end) in enumerate(weeks):
+        aggregates[f'week_{index}'] = Sum('amount', filter=Q(date__gte=week_start, date__lte=week_end))
+
+    totals = expenses.aggregate(**aggregates)
+    current_month_total = totals['current_month'] or Decimal('0')
+    last_month_total = totals['last_month'] or Decimal('0')
+
+    weekly_spending = []
+    for index, (label, week_start, week_end) in enumerate(weeks):
+        weekly_spending.append({
+            'week': label,
+            'start_date': week_start.strftime('%m/%d'),
+            'end_date': week_end.strftime('%m/%d'),
+            'amount': totals[f'week_{index}'] or Decimal('0')
+        })
+
+    # Category breakdown for the current month, grouped in the database
+    category_totals = (
+        expenses
+        .filter(date__gte=current_month_start, category__isnull=False)
+        .values('category_id', 'category__name')
+        .annotate(total=Sum('amount'))
+        .order_by('-total')
+    )
+
+    expense_breakdown = []
+    for entry in category_totals:
+        if entry['total'] > 0:
+            expense_breakdown.append({
+                'category': entry['category__name'],
+                'amount': entry['total'],
+                'percentage': (entry['total'] / current_month_total * 100) if current_month_total > 0 else 0
+            })
+
+    return {
+        'current_month_total': current_month_total,
+        'last_month_total': last_month_total,
+        'expense_breakdown': expense_breakdown,
+        'weekly_spending': weekly_spending,
+    }
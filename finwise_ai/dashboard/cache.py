@@ -0,0 +1,75 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+VERSION_KEY = 'finwise:data-version:{user_id}'
+
+# Backends whose entries are private to one process
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+RESULT_KEY = 'finwise:result:{name}:{user_id}:{version}:{today}'
+
+
+def cache_is_shared(alias='default'):
+    """
+    Whether every process sees the same cache entries.
+
+    Data versions live in the cache, so workers and commands only agree with
+    the web processes on them when the cache is shared.
+    """
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def _version_key(user_id):
+    return VERSION_KEY.format(user_id=user_id)
+
+
+def get_data_version(user_id):
+    """
+    Return the current data version for a user.
+
+    A missing version is seeded from the clock rather than a counter, so a
+    version evicted from the cache can never come back with a value that old
+    cached results were stored under.
+    """
+    key = _version_key(user_id)
+    version = cache.get(key)
+
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_data_version(user_id):
+    """Invalidate every cached result for a user by moving to a new data version."""
+    key = _version_key(user_id)
+
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # No version stored yet: any fresh seed is already newer than old results
+        version = time.time_ns()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def cached_for_user(user_id, name, compute):
+    """
+    Return the cached result of compute() for the user's current data version.
+
+    Results are also keyed by date, since figures such as the 90-day expense
+    window move at midnight without any write.
+    """
+    key = RESULT_KEY.format(name=name, user_id=user_id, version=get_data_version(user_id), today=timezone.now().date())
+    result = cache.get(key)
+
+    if result is None:
+        result = compute()
+        cache.set(key, result, timeout=getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 86400))
+
+    return result
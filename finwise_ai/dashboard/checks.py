@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+from .cache import cache_is_shared
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Data versions are coordinated through the default cache."""
+    if cache_is_shared():
+        return []
+    return [Warning(
+        'The default cache is private to each process, so data versions bumped by one process are not seen by '
+        'the others: precomputed widgets never match and cached results can be served stale.',
+        hint='Set CACHE_LOCATION (or configure another shared cache backend) when running more than one process.',
+        id='dashboard.W001',
+    )]
@@ -0,0 +1,60 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.functional import cached_property
+from accounts.models import UserProfile
+from expenses.models import Expense
+from investments.models import Investment
+from loans.models import Loan
+from .aggregates import expense_overview
+
+# Trailing window used for average expenses and savings rate
+EXPENSE_WINDOW_DAYS = 90
+EXPENSE_WINDOW_MONTHS = 3
+
+
+class FinancialContext:
+    """
+    Financial data for one user, loaded lazily and at most once per request.
+
+    Every dashboard helper takes a FinancialContext instead of a user, so a
+    page costs one query per kind of data (profile, active loans, active
+    investments, expense window) no matter how many helpers read it.
+    """
+
+    def __init__(self, user, today=None):
+        self.user = user
+        self.today = today or timezone.now().date()
+
+    @cached_property
+    def profile(self):
+        return UserProfile.objects.get(user=self.user)
+
+    @property
+    def monthly_income(self):
+        return self.profile.monthly_income or 0
+
+    @cached_property
+    def active_loans(self):
+        return list(Loan.objects.filter(user=self.user, status='active'))
+
+    @cached_property
+    def active_investments(self):
+        return list(Investment.objects.filter(user=self.user, status='active', is_simulation=False))
+
+    @cached_property
+    def expense_overview(self):
+        """Month totals, category breakdown and weekly trend as of today."""
+        return expense_overview(self.user, today=self.today)
+
+    @cached_property
+    def expense_window_total(self):
+        """Total expenses over the trailing window ending today."""
+        total = Expense.objects.filter(
+            user=self.user,
+            date__gte=self.today - timedelta(days=EXPENSE_WINDOW_DAYS),
+            date__lte=self.today
+        ).aggregate(total=Sum('amount'))['total']
+
+        return total or Decimal('0')
@@ -0,0 +1,199 @@
+from datetime import datetime, time, timedelta
+import numpy as np
+from django.db.models import Sum
+from django.utils import timezone
+from accounts.models import UserProfile
+from expenses.models import Expense
+from loans.models import Loan
+from .context import EXPENSE_WINDOW_DAYS, EXPENSE_WINDOW_MONTHS
+from .models import FinancialHealthScore, FinancialInsight
+
+# Component scores by band, best band first
+BAND_SCORES = np.array([100, 80, 60, 40, 20])
+
+WEIGHTS = {'dti': 0.4, 'emergency_fund': 0.3, 'savings_rate': 0.3}
+
+# Insights raised when a component falls to its two weakest bands
+WEAK_COMPONENT_SCORE = 40
+INSIGHTS = {
+    'dti': (
+        'budget',
+        'Your debt payments are high relative to income',
+        'Debt payments take {value:.0f}% of your monthly income. Keeping this under 36% '
+        'makes new credit easier to get and leaves room for saving.'
+    ),
+    'emergency_fund': (
+        'saving',
+        'Build up your emergency fund',
+        'Your emergency fund covers {value:.1f} months of expenses. Aim for 3 to 6 months.'
+    ),
+    'savings_rate': (
+        'saving',
+        'Your savings rate is low',
+        'You saved {value:.0f}% of your income over the last 3 months. '
+        'A rate of 15-20% is a healthy target.'
+    ),
+}
+
+
+def dti_scores(debt_to_income):
+    """Score debt-to-income ratios (%) element-wise; lower is better."""
+    dti = np.asarray(debt_to_income, dtype=float)
+    return np.select([dti <= 20, dti <= 36, dti <= 43, dti <= 50], BAND_SCORES[:4], default=BAND_SCORES[4])
+
+
+def emergency_fund_scores(emergency_fund_months):
+    """Score emergency fund coverage (months) element-wise; higher is better."""
+    months = np.asarray(emergency_fund_months, dtype=float)
+    return np.select([months >= 6, months >= 3, months >= 1, months > 0], BAND_SCORES[:4], default=BAND_SCORES[4])
+
+
+def savings_rate_scores(savings_rate):
+    """Score savings rates (%) element-wise; higher is better."""
+    rate = np.asarray(savings_rate, dtype=float)
+    return np.select([rate >= 20, rate >= 15, rate >= 10, rate >= 5], BAND_SCORES[:4], default=BAND_SCORES[4])
+
+
+def health_scores(debt_to_income, emergency_fund_months, savings_rate):
+    """
+    Score arrays of metrics at once.
+
+    Returns a dict of arrays with the overall score (0-100) and each
+    component score.
+    """
+    components = {
+        'dti': dti_scores(debt_to_income),
+        'emergency_fund': emergency_fund_scores(emergency_fund_months),
+        'savings_rate': savings_rate_scores(savings_rate),
+    }
+    components['score'] = sum(components[name] * weight for name, weight in WEIGHTS.items())
+
+    return components
+
+
+def load_health_metrics(user_ids, today):
+    """
+    Load the scoring inputs of many users as arrays aligned with user_ids.
+
+    Uses one grouped query per source (profiles, active loans, expense window),
+    with the same definitions as the single-user financial summary.
+    """
+    index = {user_id: i for i, user_id in enumerate(user_ids)}
+    size = len(user_ids)
+    income = np.zeros(size)
+    emergency_fund = np.zeros(size)
+    debt_payments = np.zeros(size)
+    expenses = np.zeros(size)
+
+    for user_id, monthly_income, fund, other_payments in UserProfile.objects.filter(
+        user_id__in=user_ids
+    ).values_list('user_id', 'monthly_income', 'emergency_fund', 'other_monthly_debt_payments'):
+        i = index[user_id]
+        income[i] = float(monthly_income or 0)
+        emergency_fund[i] = float(fund or 0)
+        debt_payments[i] += float(other_payments or 0)
+
+    for user_id, total in (
+        Loan.objects
+        .filter(user_id__in=user_ids, status='active')
+        .values('user_id')
+        .annotate(total=Sum('monthly_payment'))
+        .order_by()
+        .values_list('user_id', 'total')
+    ):
+        debt_payments[index[user_id]] += float(total or 0)
+
+    for user_id, total in (
+        Expense.objects
+        .filter(user_id__in=user_ids, date__gte=today - timedelta(days=EXPENSE_WINDOW_DAYS), date__lte=today)
+        .values('user_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+        .values_list('user_id', 'total')
+    ):
+        expenses[index[user_id]] = float(total or 0)
+
+    has_income = income > 0
+    safe_income = np.where(has_income, income, 1)
+    monthly_expenses = expenses / EXPENSE_WINDOW_MONTHS
+
+    return {
+        'debt_to_income': np.where(has_income, debt_payments / safe_income * 100, 0),
+        'emergency_fund_months': np.where(
+            monthly_expenses > 0, emergency_fund / np.where(monthly_expenses > 0, monthly_expenses, 1), 0
+        ),
+        'savings_rate': np.where(
+            has_income, (safe_income * EXPENSE_WINDOW_MONTHS - expenses) / (safe_income * EXPENSE_WINDOW_MONTHS) * 100, 0
+        ),
+    }
+
+
+def _weak_component_insights(user_ids, metrics, scores, today):
+    """Build insights for weak components, skipping ones already raised today."""
+    start_of_day = timezone.make_aware(datetime.combine(today, time.min))
+    titles = {insight[1] for insight in INSIGHTS.values()}
+    existing = set(
+        FinancialInsight.objects
+        .filter(user_id__in=user_ids, title__in=titles, created_at__gte=start_of_day)
+        .values_list('user_id', 'title')
+    )
+    metric_names = {'dti': 'debt_to_income', 'emergency_fund': 'emergency_fund_months', 'savings_rate': 'savings_rate'}
+
+    insights = []
+    for component, (category, title, description) in INSIGHTS.items():
+        values = metrics[metric_names[component]]
+        component_scores = scores[component]
+        for i in np.flatnonzero(component_scores <= WEAK_COMPONENT_SCORE):
+            if (user_ids[i], title) in existing:
+                continue
+            insights.append(FinancialInsight(
+                user_id=user_ids[i],
+                title=title,
+                description=description.format(value=values[i]),
+                category=category,
+                # Weakest band ranks highest
+                importance_score=8 if component_scores[i] == BAND_SCORES[-1] else 6
+            ))
+
+    return insights
+
+
+def refresh_health_scores(user_ids, today=None):
+    """
+    Score a chunk of users and store today's scores and insights in bulk.
+
+    Returns the number of scores written.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+
+    today = today or timezone.now().date()
+    now = timezone.now()
+    metrics = load_health_metrics(user_ids, today)
+    scores = health_scores(metrics['debt_to_income'], metrics['emergency_fund_months'], metrics['savings_rate'])
+
+    FinancialHealthScore.objects.bulk_create(
+        [FinancialHealthScore(
+            user_id=user_id,
+            date=today,
+            score=round(float(scores['score'][i]), 2),
+            dti_score=int(scores['dti'][i]),
+            emergency_fund_score=int(scores['emergency_fund'][i]),
+            savings_rate_score=int(scores['savings_rate'][i]),
+            debt_to_income=round(float(metrics['debt_to_income'][i]), 2),
+            emergency_fund_months=round(float(metrics['emergency_fund_months'][i]), 2),
+            savings_rate=round(float(metrics['savings_rate'][i]), 2),
+            computed_at=now
+        ) for i, user_id in enumerate(user_ids)],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['user', 'date'],
+        update_fields=[
+            'score', 'dti_score', 'emergency_fund_score', 'savings_rate_score',
+            'debt_to_income', 'emergency_fund_months', 'savings_rate', 'computed_at'
+        ]
+    )
+    FinancialInsight.objects.bulk_create(_weak_component_insights(user_ids, metrics, scores, today), batch_size=1000)
+
+    return len(user_ids)
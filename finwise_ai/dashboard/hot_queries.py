@@ -0,0 +1,25 @@
+from finwise.query_plans import hot_query
+from .models import FinancialHealthScore, FinancialInsight, NetWorthSnapshot, Notification
+from .networth import month_window
+
+
+@hot_query('dashboard.net_worth_history')
+def net_worth_history(user, today):
+    return NetWorthSnapshot.objects.filter(
+        user=user, month__gte=month_window(today, 13)[0], month__lt=today.replace(day=1)
+    ).values('month', 'assets', 'liabilities', 'net_worth')
+
+
+@hot_query('dashboard.health_history')
+def health_history(user, today):
+    return FinancialHealthScore.objects.filter(user=user).order_by('-date')[:30]
+
+
+@hot_query('dashboard.unread_notifications')
+def unread_notifications(user, today):
+    return Notification.objects.filter(user=user, is_read=False).order_by('-created_at')
+
+
+@hot_query('dashboard.insights')
+def insights(user, today):
+    return FinancialInsight.objects.filter(user=user, is_dismissed=False)
@@ -0,0 +1,58 @@
+from collections import defaultdict
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from finwise.query_plans import audit_query_plans
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Explains the catalogued hot querysets, flags full scans and temporary sorts, and proposes indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*',
+                            help='Only audit queries whose names start with these prefixes (e.g. loans goals.active)')
+        parser.add_argument('--user', type=int, default=1,
+                            help='Primary key of the user the querysets are built for')
+        parser.add_argument('--database', default='default',
+                            help='Database alias to explain the queries on')
+        parser.add_argument('--show-plans', action='store_true',
+                            help='Print the full plan of every query')
+        parser.add_argument('--fail', action='store_true',
+                            help='Exit with an error if any query has findings, for CI')
+
+    def handle(self, *args, **options):
+        user = User(pk=options['user'])
+        audits = audit_query_plans(user, timezone.now().date(), using=options['database'], names=options['names'])
+        if not audits:
+            raise CommandError('No catalogued queries match')
+
+        proposals = defaultdict(dict)
+        for audit in audits:
+            if audit.ok:
+                self.stdout.write(f'OK    {audit.name}')
+            else:
+                self.stdout.write(self.style.WARNING(f'FLAG  {audit.name}'))
+                for kind, line in audit.findings:
+                    self.stdout.write(f'        {kind}: {line}')
+                if audit.proposed_index:
+                    # One index serves an ordering and its reverse
+                    plain = tuple(name.lstrip('-') for name in audit.proposed_index)
+                    proposals[audit.model._meta.label].setdefault(plain, audit.proposed_index)
+            if options['show_plans']:
+                for line in audit.plan.splitlines():
+                    self.stdout.write(f'        | {line}')
+
+        if proposals:
+            self.stdout.write('\nProposed indexes (add to Meta.indexes, then run makemigrations):')
+            for label, indexes in sorted(proposals.items()):
+                self.stdout.write(f'  {label}')
+                for _, fields in sorted(indexes.items()):
+                    self.stdout.write(f'    models.Index(fields={fields!r}),')
+
+        flagged = sum(not audit.ok for audit in audits)
+        if flagged and options['fail']:
+            raise CommandError(f'{flagged} of {len(audits)} queries have plan findings')
+        self.stdout.write(self.style.SUCCESS(f'Audited {len(audits)} queries, {flagged} flagged'))
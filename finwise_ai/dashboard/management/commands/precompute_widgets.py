@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.cache import cache_is_shared
+from dashboard.precompute import precompute_widgets
+
+
+class Command(BaseCommand):
+    help = 'Precomputes dashboard widget payloads that are due according to their refresh interval'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--active-days', type=int, default=30,
+                            help='Only precompute for users who logged in within this many days')
+        parser.add_argument('--chunk-size', type=int, default=200,
+                            help='Number of widgets processed per batch')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, checking for due widgets every --sleep seconds')
+        parser.add_argument('--sleep', type=int, default=60,
+                            help='Seconds to wait between passes when looping')
+
+    def handle(self, *args, **options):
+        # Snapshots are matched against data versions, which must be the web processes' own
+        if not cache_is_shared():
+            raise CommandError(
+                'The default cache is private to this process; set CACHE_LOCATION to a cache shared with the web '
+                'processes so precomputed widgets match their data versions'
+            )
+        
+        while True:
+            written = precompute_widgets(active_days=options['active_days'], chunk_size=options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f'Precomputed {written} widget payloads'))
+            
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
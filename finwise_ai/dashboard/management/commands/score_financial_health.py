@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from dashboard.health import refresh_health_scores
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Scores the financial health of all users in vectorized batches and records insights for weak areas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Number of users scored per batch')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Scoring financial health...')
+        
+        users = User.objects.filter(is_active=True).order_by('pk')
+        last_pk = 0
+        scored = 0
+        
+        # Walk users by primary key so each chunk is an indexed range scan
+        while True:
+            user_ids = list(users.filter(pk__gt=last_pk).values_list('pk', flat=True)[:options['chunk_size']])
+            if not user_ids:
+                break
+            
+            scored += refresh_health_scores(user_ids)
+            last_pk = user_ids[-1]
+        
+        self.stdout.write(self.style.SUCCESS(f'Scored {scored} users'))
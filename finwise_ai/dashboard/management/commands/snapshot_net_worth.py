@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from dashboard.networth import refresh_snapshots
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Writes monthly net worth snapshots for all users, recomputing only months whose data changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=12,
+                            help='Number of months of history to keep up to date')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Number of users processed per batch')
+        parser.add_argument('--force', action='store_true',
+                            help='Recompute every month even if nothing changed')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Updating net worth snapshots...')
+        
+        users = User.objects.filter(is_active=True).order_by('pk')
+        last_pk = 0
+        processed = 0
+        written = 0
+        
+        # Walk users by primary key so each chunk is an indexed range scan
+        while True:
+            user_ids = list(users.filter(pk__gt=last_pk).values_list('pk', flat=True)[:options['chunk_size']])
+            if not user_ids:
+                break
+            
+            written += refresh_snapshots(user_ids, months=options['months'], force=options['force'])
+            processed += len(user_ids)
+            last_pk = user_ids[-1]
+        
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} users, wrote {written} snapshots'))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NetWorthSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('assets', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('liabilities', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('net_worth', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('breakdown', models.JSONField(default=dict)),
+                ('computed_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='net_worth_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Net Worth Snapshot',
+                'verbose_name_plural': 'Net Worth Snapshots',
+                'ordering': ['month'],
+                'unique_together': {('user', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_networthsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WidgetSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.BinaryField()),
+                ('data_version', models.CharField(max_length=40)),
+                ('computed_for', models.DateField()),
+                ('computed_at', models.DateTimeField()),
+                ('next_refresh_at', models.DateTimeField(db_index=True)),
+                ('widget', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot', to='dashboard.dashboardwidget')),
+            ],
+            options={
+                'verbose_name': 'Widget Snapshot',
+                'verbose_name_plural': 'Widget Snapshots',
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_widgetsnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinancialHealthScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('score', models.FloatField()),
+                ('dti_score', models.PositiveSmallIntegerField()),
+                ('emergency_fund_score', models.PositiveSmallIntegerField()),
+                ('savings_rate_score', models.PositiveSmallIntegerField()),
+                ('debt_to_income', models.FloatField()),
+                ('emergency_fund_months', models.FloatField()),
+                ('savings_rate', models.FloatField()),
+                ('computed_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='health_scores', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Financial Health Score',
+                'verbose_name_plural': 'Financial Health Scores',
+                'ordering': ['-date'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
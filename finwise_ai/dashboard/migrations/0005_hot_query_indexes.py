@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit', '0002_hot_query_indexes'),
+        ('dashboard', '0004_financialhealthscore'),
+        ('expenses', '0008_hot_query_indexes'),
+        ('goals', '0002_hot_query_indexes'),
+        ('investments', '0002_hot_query_indexes'),
+        ('loans', '0002_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='financialinsight',
+            index=models.Index(fields=['user', '-importance_score', '-created_at'], name='insight_user_importance_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at'], name='notification_user_created_idx'),
+        ),
+    ]
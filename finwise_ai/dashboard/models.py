@@ -90,6 +90,9 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='notification_user_created_idx'),
+        ]
 
 
 class FinancialInsight(models.Model):
@@ -119,3 +122,69 @@ class FinancialInsight(models.Model):
     
     class Meta:
         ordering = ['-importance_score', '-created_at']
+        indexes = [
+            models.Index(fields=['user', '-importance_score', '-created_at'], name='insight_user_importance_idx'),
+        ]
+
+
+class NetWorthSnapshot(models.Model):
+    """Model for a user's month-end net worth, written by the snapshot_net_worth job."""
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='net_worth_snapshots')
+    month = models.DateField()  # First day of the month
+    assets = models.DecimalField(max_digits=14, decimal_places=2)
+    liabilities = models.DecimalField(max_digits=14, decimal_places=2)
+    net_worth = models.DecimalField(max_digits=14, decimal_places=2)
+    breakdown = models.JSONField(default=dict)  # Per-component values (cash, investments, loans, ...)
+    computed_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"Net worth for {self.user.email} in {self.month:%b %Y}"
+    
+    class Meta:
+        verbose_name = "Net Worth Snapshot"
+        verbose_name_plural = "Net Worth Snapshots"
+        ordering = ['month']
+        unique_together = [('user', 'month')]
+
+
+class FinancialHealthScore(models.Model):
+    """Model for a user's daily financial health score, written by the score_financial_health job."""
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='health_scores')
+    date = models.DateField()
+    score = models.FloatField()  # 0-100 weighted score
+    dti_score = models.PositiveSmallIntegerField()
+    emergency_fund_score = models.PositiveSmallIntegerField()
+    savings_rate_score = models.PositiveSmallIntegerField()
+    debt_to_income = models.FloatField()  # percentage
+    emergency_fund_months = models.FloatField()
+    savings_rate = models.FloatField()  # percentage
+    computed_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"Health score {self.score:.0f} for {self.user.email} on {self.date}"
+    
+    class Meta:
+        verbose_name = "Financial Health Score"
+        verbose_name_plural = "Financial Health Scores"
+        ordering = ['-date']
+        unique_together = [('user', 'date')]
+
+
+class WidgetSnapshot(models.Model):
+    """Model for a precomputed widget payload, written by the precompute_widgets worker."""
+    
+    widget = models.OneToOneField(DashboardWidget, on_delete=models.CASCADE, related_name='snapshot')
+    payload = models.BinaryField()  # zlib-compressed compact JSON
+    data_version = models.CharField(max_length=40)  # User data version the payload was computed at
+    computed_for = models.DateField()  # Date the month/week windows were anchored to
+    computed_at = models.DateTimeField()
+    next_refresh_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"Snapshot of {self.widget}"
+    
+    class Meta:
+        verbose_name = "Widget Snapshot"
+        verbose_name_plural = "Widget Snapshots"
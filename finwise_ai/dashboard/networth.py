@@ -0,0 +1,236 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import F, Max
+from django.utils import timezone
+from accounts.models import UserProfile
+from investments.models import Investment
+from loans.models import Loan, LoanPayment
+from .models import NetWorthSnapshot
+
+ZERO = Decimal('0.00')
+ASSET_COMPONENTS = ('cash', 'emergency_fund', 'investments', 'other_assets')
+LIABILITY_COMPONENTS = ('loans', 'other_liabilities')
+
+
+def month_window(today, months):
+    """Return the first days of the last `months` months up to and including the current one."""
+    window = []
+    month = today.replace(day=1)
+
+    for _ in range(months):
+        window.append(month)
+        month = (month - timedelta(days=1)).replace(day=1)
+
+    return list(reversed(window))
+
+
+def month_end(month):
+    """Return the last day of the month starting at `month`."""
+    return (month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def _to_decimal(value):
+    return Decimal(value or 0).quantize(Decimal('0.01'))
+
+
+def compute_components(user_ids, months, today):
+    """
+    Compute net worth components for each (user, month) with a fixed number of bulk queries.
+
+    The current month uses live balances. Closed months are reconstructed from
+    what the data records over time: loan balances from the paid payment
+    schedule and investments held at month end at their cost basis. Profile
+    balances have no history and are carried as-is.
+    """
+    current_month = today.replace(day=1)
+    components = {}
+
+    profiles = {
+        row['user_id']: row
+        for row in UserProfile.objects.filter(user_id__in=user_ids).values(
+            'user_id', 'cash_balance', 'emergency_fund', 'other_assets_value', 'other_liabilities_value'
+        )
+    }
+
+    investments = defaultdict(list)
+    for row in (
+        Investment.objects
+        .filter(user_id__in=user_ids, is_simulation=False, status__in=['active', 'sold'])
+        .values('user_id', 'purchase_date', 'status', 'purchase_price', 'quantity', 'current_price', 'updated_at')
+    ):
+        investments[row['user_id']].append(row)
+
+    loans = defaultdict(list)
+    for row in (
+        Loan.objects
+        .filter(user_id__in=user_ids, is_simulation=False, status__in=['active', 'paid'])
+        .values('id', 'user_id', 'amount', 'start_date', 'remaining_balance', 'status')
+    ):
+        loans[row['user_id']].append(row)
+
+    # Paid schedule rows, oldest first, to read each loan's balance at a month end
+    payments = defaultdict(list)
+    for loan_id, payment_date, balance in (
+        LoanPayment.objects
+        .filter(loan__user_id__in=user_ids, is_paid=True, payment_date__lte=today)
+        .order_by('loan_id', 'payment_date')
+        .values_list('loan_id', 'payment_date', 'remaining_balance')
+    ):
+        payments[loan_id].append((payment_date, balance))
+
+    for user_id in user_ids:
+        profile = profiles.get(user_id, {})
+
+        for month in months:
+            end = month_end(month)
+            is_current = month == current_month
+
+            investment_value = ZERO
+            for inv in investments[user_id]:
+                if inv['purchase_date'] and inv['purchase_date'] > end:
+                    continue
+                # A sold position's last update is the closest record of its sale date
+                if inv['status'] == 'sold' and (is_current or inv['updated_at'].date() <= end):
+                    continue
+                price = (inv['current_price'] or inv['purchase_price']) if is_current else inv['purchase_price']
+                investment_value += price * inv['quantity']
+
+            loan_balance = ZERO
+            for loan in loans[user_id]:
+                if is_current:
+                    if loan['status'] == 'active':
+                        loan_balance += loan['remaining_balance'] or ZERO
+                    continue
+                if not loan['start_date'] or loan['start_date'] > end:
+                    continue
+                balance = loan['amount']
+                for payment_date, remaining in payments[loan['id']]:
+                    if payment_date > end:
+                        break
+                    balance = remaining
+                loan_balance += balance
+
+            components[(user_id, month)] = {
+                'cash': _to_decimal(profile.get('cash_balance')),
+                'emergency_fund': _to_decimal(profile.get('emergency_fund')),
+                'investments': _to_decimal(investment_value),
+                'other_assets': _to_decimal(profile.get('other_assets_value')),
+                'loans': _to_decimal(loan_balance),
+                'other_liabilities': _to_decimal(profile.get('other_liabilities_value')),
+            }
+
+    return components
+
+
+def last_changes(user_ids):
+    """Return the most recent update time of each user's balance-sheet records."""
+    changed = {}
+
+    for records in (
+        UserProfile.objects.filter(user_id__in=user_ids).values('user_id'),
+        Loan.objects.filter(user_id__in=user_ids).values('user_id'),
+        Investment.objects.filter(user_id__in=user_ids).values('user_id'),
+        # Closed months read loan balances from paid schedule rows
+        LoanPayment.objects.filter(loan__user_id__in=user_ids).values(user_id=F('loan__user_id')),
+    ):
+        for row in records.annotate(last_change=Max('updated_at')).order_by():
+            if row['user_id'] not in changed or row['last_change'] > changed[row['user_id']]:
+                changed[row['user_id']] = row['last_change']
+
+    return changed
+
+
+def follows_edits(month, computed_at, current_month):
+    """
+    Whether a snapshot is recomputed when its user's records change.
+
+    Snapshots taken while their month was open are observations and stay
+    frozen; only the open month and reconstructed months follow later edits.
+    """
+    return month == current_month or computed_at.date() > month_end(month)
+
+
+def forget_snapshots(user_id, today=None):
+    """
+    Drop a user's snapshots that follow edits, so the next refresh recomputes them.
+
+    Deleted records leave no update time behind, so deletions of loans,
+    investments and paid loan payments go through here instead of last_changes.
+    """
+    current_month = (today or timezone.now().date()).replace(day=1)
+    stale = [
+        pk
+        for pk, month, computed_at in (
+            NetWorthSnapshot.objects.filter(user_id=user_id).values_list('pk', 'month', 'computed_at')
+        )
+        if follows_edits(month, computed_at, current_month)
+    ]
+    if stale:
+        NetWorthSnapshot.objects.filter(pk__in=stale).delete()
+    return len(stale)
+
+
+def refresh_snapshots(user_ids, months=12, today=None, force=False):
+    """
+    Write missing or out-of-date snapshots for a chunk of users.
+
+    A month is recomputed only when it has no snapshot yet or when one of the
+    user's profile, loan, loan payment or investment records changed after it
+    was computed.
+    Returns the number of snapshots written.
+    """
+    today = today or timezone.now().date()
+    now = timezone.now()
+    window = month_window(today, months)
+
+    existing = defaultdict(dict)
+    for user_id, month, computed_at in (
+        NetWorthSnapshot.objects
+        .filter(user_id__in=user_ids, month__gte=window[0])
+        .values_list('user_id', 'month', 'computed_at')
+    ):
+        existing[user_id][month] = computed_at
+
+    changed = last_changes(user_ids)
+
+    def is_stale(user_id, month):
+        computed_at = existing[user_id].get(month)
+        if force or computed_at is None:
+            return True
+        last_change = changed.get(user_id)
+        if not last_change or last_change <= computed_at:
+            return False
+        return follows_edits(month, computed_at, window[-1])
+
+    # Group users by the set of months they need so each group is computed in bulk
+    stale = defaultdict(list)
+    for user_id in user_ids:
+        months_to_compute = tuple(month for month in window if is_stale(user_id, month))
+        if months_to_compute:
+            stale[months_to_compute].append(user_id)
+
+    snapshots = []
+    for months_to_compute, stale_users in stale.items():
+        for (user_id, month), values in compute_components(stale_users, list(months_to_compute), today).items():
+            assets = sum(values[name] for name in ASSET_COMPONENTS)
+            liabilities = sum(values[name] for name in LIABILITY_COMPONENTS)
+            snapshots.append(NetWorthSnapshot(
+                user_id=user_id,
+                month=month,
+                assets=assets,
+                liabilities=liabilities,
+                net_worth=assets - liabilities,
+                breakdown={name: str(value) for name, value in values.items()},
+                computed_at=now
+            ))
+
+    NetWorthSnapshot.objects.bulk_create(
+        snapshots,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['user', 'month'],
+        update_fields=['assets', 'liabilities', 'net_worth', 'breakdown', 'computed_at']
+    )
+
+    return len(snapshots)
@@ -0,0 +1,131 @@
+import json
+import zlib
+from collections import defaultdict
+from datetime import timedelta
+from django.core.cache import cache
+from django.utils import timezone
+from .cache import VERSION_KEY, get_data_version
+from .context import FinancialContext
+from .models import DashboardWidget, WidgetSnapshot
+from .widgets import WIDGET_BUILDERS
+
+
+def encode_payload(payload):
+    """Serialize a payload as compressed compact JSON."""
+    return zlib.compress(json.dumps(payload, separators=(',', ':')).encode())
+
+
+def decode_payload(data):
+    return json.loads(zlib.decompress(bytes(data)))
+
+
+def due_widgets(now, active_days=30):
+    """Enabled, auto-refreshing widgets of recently active users."""
+    return (
+        DashboardWidget.objects
+        .filter(
+            is_enabled=True,
+            refresh_interval__gt=0,
+            widget_type__in=list(WIDGET_BUILDERS),
+            dashboard__user__is_active=True,
+            dashboard__user__last_login__gte=now - timedelta(days=active_days),
+        )
+        .select_related('dashboard__user', 'snapshot')
+        .order_by('pk')
+    )
+
+
+def precompute_widgets(now=None, active_days=30, chunk_size=200):
+    """
+    Recompute widget payloads that are due and store them compactly.
+
+    A widget is due when it has no snapshot, its refresh interval has elapsed,
+    its snapshot was computed for an earlier day, or the owner's data version
+    moved. Widgets of the same user share one FinancialContext. Returns the
+    number of payloads written.
+
+    Data versions are read from the default cache, which has to be shared
+    with the web processes for the stored versions to match theirs.
+    """
+    now = now or timezone.now()
+    today = now.date()
+    widgets = due_widgets(now, active_days)
+    last_pk = 0
+    written = 0
+
+    while True:
+        chunk = list(widgets.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1].pk
+
+        user_ids = {widget.dashboard.user_id for widget in chunk}
+        stored = cache.get_many([VERSION_KEY.format(user_id=user_id) for user_id in user_ids])
+        versions = {
+            user_id: stored.get(VERSION_KEY.format(user_id=user_id)) or get_data_version(user_id)
+            for user_id in user_ids
+        }
+
+        by_user = defaultdict(list)
+        for widget in chunk:
+            snapshot = getattr(widget, 'snapshot', None)
+            if (
+                snapshot is None
+                or snapshot.next_refresh_at <= now
+                or snapshot.computed_for != today
+                or snapshot.data_version != str(versions[widget.dashboard.user_id])
+            ):
+                by_user[widget.dashboard.user].append(widget)
+
+        snapshots = []
+        for user, user_widgets in by_user.items():
+            ctx = FinancialContext(user, today=today)
+            payloads = {}
+            for widget in user_widgets:
+                if widget.widget_type not in payloads:
+                    payloads[widget.widget_type] = WIDGET_BUILDERS[widget.widget_type](ctx)
+                snapshots.append(WidgetSnapshot(
+                    widget=widget,
+                    payload=encode_payload(payloads[widget.widget_type]),
+                    data_version=str(versions[user.pk]),
+                    computed_for=today,
+                    computed_at=now,
+                    next_refresh_at=now + timedelta(minutes=widget.refresh_interval)
+                ))
+
+        WidgetSnapshot.objects.bulk_create(
+            snapshots,
+            update_conflicts=True,
+            unique_fields=['widget'],
+            update_fields=['payload', 'data_version', 'computed_for', 'computed_at', 'next_refresh_at']
+        )
+        written += len(snapshots)
+
+    return written
+
+
+def widget_payloads(ctx, widget_types):
+    """
+    Return payloads for the requested widget types.
+
+    Precomputed payloads are used when they match the user's current data
+    version and date; anything else is computed synchronously.
+    """
+    payloads = {}
+    version = str(get_data_version(ctx.user.pk))
+
+    snapshots = WidgetSnapshot.objects.filter(
+        widget__dashboard__user=ctx.user,
+        widget__widget_type__in=widget_types,
+        data_version=version,
+        computed_for=ctx.today,
+    ).values_list('widget__widget_type', 'payload')
+
+    for widget_type, payload in snapshots:
+        payloads.setdefault(widget_type, decode_payload(payload))
+
+    for widget_type in widget_types:
+        if widget_type not in payloads:
+            payloads[widget_type] = WIDGET_BUILDERS[widget_type](ctx)
+
+    return payloads
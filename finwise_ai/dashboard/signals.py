@@ -0,0 +1,86 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from accounts.models import UserProfile
+from expenses.models import Expense
+from expenses.signals import expenses_bulk_created, expenses_bulk_updated
+from loans.models import Loan, LoanPayment
+from loans.signals import loan_payments_bulk_created
+from goals.models import SavingsGoal
+from investments.models import Investment
+from credit.models import CreditHistory
+from .cache import bump_data_version
+from .networth import forget_snapshots
+
+# Models whose writes change a user's dashboard figures, with how to reach the user id
+VERSIONED_MODELS = {
+    Expense: lambda instance: instance.user_id,
+    Loan: lambda instance: instance.user_id,
+    LoanPayment: lambda instance: instance.loan.user_id,  # Load payments with their loan to avoid a query each
+    Investment: lambda instance: instance.user_id,
+    SavingsGoal: lambda instance: instance.user_id,
+    CreditHistory: lambda instance: instance.user_id,
+    UserProfile: lambda instance: instance.user_id,
+}
+
+
+def deleted_in_cascade(instance, origin):
+    """Whether a row is being deleted along with a parent, such as a payment with its loan."""
+    if origin is None:
+        return False
+    if isinstance(origin, QuerySet):
+        return origin.model is not type(instance)
+    return not isinstance(origin, type(instance))
+
+
+def bump_owner_version(sender, instance, raw=False, origin=None, **kwargs):
+    """Bump the owning user's data version once the write is committed."""
+    # The parent's own delete bumps the version, so cascaded rows need no lookup
+    if raw or deleted_in_cascade(instance, origin):
+        return
+
+    user_id = VERSIONED_MODELS[sender](instance)
+    if user_id is not None:
+        transaction.on_commit(lambda: bump_data_version(user_id))
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_owner_version, sender=model, dispatch_uid=f'dashboard-version-save-{model.__name__}')
+    post_delete.connect(bump_owner_version, sender=model, dispatch_uid=f'dashboard-version-delete-{model.__name__}')
+
+
+def bump_bulk_owner_version(sender, user_id, **kwargs):
+    transaction.on_commit(lambda: bump_data_version(user_id))
+
+
+expenses_bulk_created.connect(bump_bulk_owner_version, dispatch_uid='dashboard-version-expenses-bulk')
+loan_payments_bulk_created.connect(bump_bulk_owner_version, dispatch_uid='dashboard-version-loan-payments-bulk')
+
+
+def bump_bulk_owner_versions(sender, user_ids, **kwargs):
+    user_ids = list(user_ids)
+
+    def bump():
+        for user_id in user_ids:
+            bump_data_version(user_id)
+
+    transaction.on_commit(bump)
+
+
+expenses_bulk_updated.connect(bump_bulk_owner_versions, dispatch_uid='dashboard-version-expenses-bulk-update')
+
+
+def forget_owner_snapshots(sender, instance, origin=None, **kwargs):
+    """Recompute net worth history after a balance-sheet record is deleted."""
+    if deleted_in_cascade(instance, origin):
+        return
+    # Only paid payments feed the reconstructed loan balances
+    if sender is LoanPayment and not instance.is_paid:
+        return
+
+    user_id = VERSIONED_MODELS[sender](instance)
+    transaction.on_commit(lambda: forget_snapshots(user_id))
+
+
+for model in (Loan, LoanPayment, Investment):
+    post_delete.connect(forget_owner_snapshots, sender=model, dispatch_uid=f'dashboard-networth-delete-{model.__name__}')
@@ -0,0 +1,466 @@
+import json
+import tempfile
+from unittest import mock
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from accounts.models import UserProfile
+from finwise.performance import QueryBudget, QueryBudgetExceeded
+from finwise.testing import QueryBudgetTestMixin
+from finwise.query_plans import FULL_SCAN, TEMP_SORT, audit_query_plans, plan_findings, suggest_index
+from expenses.models import Expense, ExpenseCategory
+from loans.amortization import monthly_payment
+from loans.models import Loan, LoanPayment
+from loans.views import generate_payment_schedule
+from .aggregates import expense_overview
+from .cache import cached_for_user, get_data_version
+from .context import FinancialContext
+from .health import refresh_health_scores
+from .models import Dashboard, DashboardWidget, FinancialHealthScore, FinancialInsight, NetWorthSnapshot, WidgetSnapshot
+from .networth import refresh_snapshots
+from .precompute import precompute_widgets
+from . import views
+from .views import build_financial_summary, calculate_financial_health_score
+
+
+class ExpenseOverviewTests(TestCase):
+    """Tests for the dashboard expense aggregation service."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='overview@example.com', password='StrongPass123')
+        self.today = date(2025, 5, 21)
+
+    def add_expense(self, category, amount, day):
+        return Expense.objects.create(
+            user=self.user, category=category, amount=Decimal(amount),
+            description='Test expense', date=day
+        )
+
+    def test_totals_breakdown_and_weekly_trend(self):
+        rent = ExpenseCategory.objects.create(name='Rent')
+        food = ExpenseCategory.objects.create(name='Groceries')
+        self.add_expense(rent, '1000.00', date(2025, 5, 2))
+        self.add_expense(food, '150.00', date(2025, 5, 12))
+        self.add_expense(None, '50.00', date(2025, 5, 13))
+        self.add_expense(food, '200.00', date(2025, 4, 28))
+
+        overview = expense_overview(self.user, today=self.today)
+
+        self.assertEqual(overview['current_month_total'], Decimal('1200.00'))
+        self.assertEqual(overview['last_month_total'], Decimal('200.00'))
+        self.assertEqual(
+            [item['category'] for item in overview['expense_breakdown']],
+            ['Rent', 'Groceries']
+        )
+        # Weeks end on the last completed Sunday (2025-05-18)
+        self.assertEqual(
+            [item['amount'] for item in overview['weekly_spending']],
+            [Decimal('0'), Decimal('1200.00'), Decimal('0'), Decimal('200.00')]
+        )
+
+    def test_query_count_does_not_grow_with_categories(self):
+        for index in range(25):
+            category = ExpenseCategory.objects.create(name=f'Category {index}')
+            self.add_expense(category, '10.00', date(2025, 5, 1 + index % 20))
+
+        with self.assertNumQueries(2):
+            overview = expense_overview(self.user, today=self.today)
+
+        self.assertEqual(len(overview['expense_breakdown']), 25)
+
+
+class FinancialSummaryCacheTests(TestCase):
+    """Tests for the per-user versioned result cache."""
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(email='cache@example.com', password='StrongPass123')
+        UserProfile.objects.create(user=self.user, monthly_income=Decimal('5000.00'), cash_balance=Decimal('1000.00'))
+
+    def summary(self):
+        return cached_for_user(self.user.pk, 'financial_summary', lambda: build_financial_summary(FinancialContext(self.user)))
+
+    def assert_exact_invalidation(self):
+        self.assertEqual(self.summary()['assets'], Decimal('1000.00'))
+
+        # Repeated loads are served without touching the database
+        with self.assertNumQueries(0):
+            self.summary()
+
+        version = get_data_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = UserProfile.objects.get(user=self.user)
+            profile.cash_balance = Decimal('2500.00')
+            profile.save()
+
+        self.assertNotEqual(get_data_version(self.user.pk), version)
+        self.assertEqual(self.summary()['assets'], Decimal('2500.00'))
+
+    def test_local_memory_cache(self):
+        self.assert_exact_invalidation()
+
+    def test_file_based_cache(self):
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }}):
+                self.assert_exact_invalidation()
+
+    def test_results_expire_at_midnight(self):
+        compute = mock.Mock(return_value={'assets': Decimal('1000.00')})
+        with mock.patch('django.utils.timezone.now') as now:
+            now.return_value = timezone.make_aware(datetime(2026, 3, 1, 23, 59))
+            cached_for_user(self.user.pk, 'financial_summary', compute)
+            cached_for_user(self.user.pk, 'financial_summary', compute)
+            self.assertEqual(compute.call_count, 1)
+
+            now.return_value = timezone.make_aware(datetime(2026, 3, 2, 0, 1))
+            cached_for_user(self.user.pk, 'financial_summary', compute)
+            self.assertEqual(compute.call_count, 2)
+
+    def test_loan_payments_bump_without_a_query_each(self):
+        loan = Loan.objects.create(
+            user=self.user, amount=Decimal('12000.00'), interest_rate=Decimal('5.00'), term_months=12,
+            start_date=date(2025, 1, 1), monthly_payment=monthly_payment(12000, 5, 12), status='active',
+            is_simulation=False
+        )
+        with override_settings(LOAN_SCHEDULE_HORIZON_DAYS=None):
+            generate_payment_schedule(loan)
+
+        version = get_data_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            payment = loan.payments.first()
+            payment.is_paid = not payment.is_paid
+            payment.save()
+        self.assertNotEqual(get_data_version(self.user.pk), version)
+
+        # Payments deleted with their loan leave the bump to the loan
+        version = get_data_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            Loan.objects.get(pk=loan.pk).delete()
+        self.assertLess(len(queries), 12)
+        self.assertNotEqual(get_data_version(self.user.pk), version)
+
+
+class NetWorthSnapshotTests(TestCase):
+    """Tests for the incremental net worth snapshot job."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='networth@example.com', password='StrongPass123')
+        UserProfile.objects.create(user=self.user, cash_balance=Decimal('5000.00'))
+        self.loan = Loan.objects.create(
+            user=self.user, amount=Decimal('1200.00'), interest_rate=Decimal('0.00'), term_months=12,
+            start_date=date(2025, 1, 1), monthly_payment=Decimal('100.00'),
+            remaining_balance=Decimal('900.00'), status='active', is_simulation=False
+        )
+        for month, balance in [(1, '1100.00'), (2, '1000.00'), (3, '900.00')]:
+            LoanPayment.objects.create(
+                loan=self.loan, payment_date=date(2025, month, 15), amount=Decimal('100.00'),
+                principal_amount=Decimal('100.00'), interest_amount=Decimal('0.00'),
+                remaining_balance=Decimal(balance), is_paid=True
+            )
+        self.today = date(2025, 3, 20)
+
+    def test_history_and_incremental_refresh(self):
+        written = refresh_snapshots([self.user.pk], months=4, today=self.today)
+        self.assertEqual(written, 4)
+
+        history = {
+            snapshot.month: snapshot.net_worth
+            for snapshot in NetWorthSnapshot.objects.filter(user=self.user)
+        }
+        self.assertEqual(history, {
+            date(2024, 12, 1): Decimal('5000.00'),
+            date(2025, 1, 1): Decimal('3900.00'),
+            date(2025, 2, 1): Decimal('4000.00'),
+            date(2025, 3, 1): Decimal('4100.00'),
+        })
+
+        # Nothing changed, nothing is recomputed
+        self.assertEqual(refresh_snapshots([self.user.pk], months=4, today=self.today), 0)
+
+        self.loan.remaining_balance = Decimal('800.00')
+        self.loan.save()
+        refresh_snapshots([self.user.pk], months=4, today=self.today)
+
+        current = NetWorthSnapshot.objects.get(user=self.user, month=date(2025, 3, 1))
+        self.assertEqual(current.breakdown['loans'], '800.00')
+
+    def test_payment_changes_and_deletions_mark_reconstructed_months_stale(self):
+        refresh_snapshots([self.user.pk], months=4, today=self.today)
+
+        payment = self.loan.payments.get(payment_date=date(2025, 2, 15))
+        payment.is_paid = False
+        payment.save()
+        refresh_snapshots([self.user.pk], months=4, today=self.today)
+        self.assertEqual(
+            NetWorthSnapshot.objects.get(user=self.user, month=date(2025, 2, 1)).breakdown['loans'], '1100.00'
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.loan.payments.get(payment_date=date(2025, 1, 15)).delete()
+        self.assertFalse(NetWorthSnapshot.objects.filter(user=self.user, month=date(2025, 1, 1)).exists())
+        refresh_snapshots([self.user.pk], months=4, today=self.today)
+        self.assertEqual(
+            NetWorthSnapshot.objects.get(user=self.user, month=date(2025, 1, 1)).breakdown['loans'], '1200.00'
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Loan.objects.get(pk=self.loan.pk).delete()
+        refresh_snapshots([self.user.pk], months=4, today=self.today)
+        self.assertEqual(
+            {snapshot.breakdown['loans'] for snapshot in NetWorthSnapshot.objects.filter(user=self.user)}, {'0.00'}
+        )
+
+
+class FinancialContextTests(TestCase):
+    """Tests for the request-scoped financial data loader."""
+
+    def test_summary_costs_a_fixed_number_of_queries(self):
+        User = get_user_model()
+        user = User.objects.create_user(email='context@example.com', password='StrongPass123')
+        UserProfile.objects.create(
+            user=user, monthly_income=Decimal('4000.00'),
+            emergency_fund=Decimal('3000.00'), other_monthly_debt_payments=Decimal('100.00')
+        )
+        for index in range(3):
+            Loan.objects.create(
+                user=user, amount=Decimal('1000.00'), interest_rate=Decimal('5.00'), term_months=12,
+                monthly_payment=Decimal('100.00'), remaining_balance=Decimal('500.00'),
+                status='active', is_simulation=False
+            )
+        Expense.objects.create(
+            user=user, amount=Decimal('3000.00'), description='Rent', date=date.today()
+        )
+
+        # Profile, active loans, active investments and the expense window
+        with self.assertNumQueries(4):
+            summary = build_financial_summary(FinancialContext(user))
+
+        self.assertEqual(summary['liabilities'], Decimal('1500.00'))
+        self.assertEqual(summary['monthly_debt_payments'], Decimal('400.00'))
+        self.assertEqual(summary['debt_to_income'], Decimal('10'))
+        self.assertEqual(summary['emergency_fund_months'], Decimal('3'))
+
+
+class DashboardWidgetsApiTests(QueryBudgetTestMixin, TestCase):
+    """Tests for the batched widget endpoint and its conditional GET handling."""
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(email='widgets@example.com', password='StrongPass123')
+        UserProfile.objects.create(user=self.user, monthly_income=Decimal('3000.00'))
+        self.client.force_login(self.user)
+        self.url = reverse('dashboard_api_widgets')
+
+    def test_returns_requested_widgets_and_honours_etag(self):
+        response = self.client.get(self.url, {'types': 'loan_summary,income_vs_expense'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.json()['widgets']), ['income_vs_expense', 'loan_summary'])
+        etag = response['ETag']
+
+        # Unchanged data costs only the session and user lookups
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                self.url, {'types': 'income_vs_expense,loan_summary'}, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(user=self.user, amount=Decimal('25.00'), description='Lunch', date=date.today())
+
+        response = self.client.get(self.url, {'types': 'loan_summary,income_vs_expense'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_unknown_widget_type_is_rejected(self):
+        response = self.client.get(self.url, {'types': 'expense_summary,bogus'})
+        self.assertEqual(response.status_code, 400)
+
+
+class WidgetPrecomputeTests(TestCase):
+    """Tests for background widget precomputation and serving stored payloads."""
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(email='precompute@example.com', password='StrongPass123')
+        self.user.last_login = timezone.now()
+        self.user.save()
+        UserProfile.objects.create(user=self.user, monthly_income=Decimal('3000.00'))
+        dashboard = Dashboard.objects.create(user=self.user)
+        self.widget = DashboardWidget.objects.create(
+            dashboard=dashboard, widget_type='income_vs_expense', title='Income', refresh_interval=15
+        )
+        DashboardWidget.objects.create(dashboard=dashboard, widget_type='loan_summary', title='Loans')
+
+    def test_only_due_widgets_are_recomputed(self):
+        now = timezone.now()
+        self.assertEqual(precompute_widgets(now=now), 1)
+        self.assertEqual(WidgetSnapshot.objects.get().widget, self.widget)
+
+        # Nothing is due until the interval elapses or the data changes
+        self.assertEqual(precompute_widgets(now=now + timedelta(minutes=5)), 0)
+        self.assertEqual(precompute_widgets(now=now + timedelta(minutes=16)), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(user=self.user, amount=Decimal('25.00'), description='Lunch', date=date.today())
+        self.assertEqual(precompute_widgets(now=now + timedelta(minutes=17)), 1)
+
+    def test_api_serves_current_snapshot_and_ignores_stale_one(self):
+        precompute_widgets()
+        self.client.force_login(self.user)
+        url = reverse('dashboard_api_widgets')
+
+        # Session, user and snapshot lookups only; the profile is never loaded
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'types': 'income_vs_expense'})
+        self.assertEqual(response.json()['widgets']['income_vs_expense']['income'], 3000.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(user=self.user, amount=Decimal('25.00'), description='Lunch', date=date.today())
+
+        response = self.client.get(url, {'types': 'income_vs_expense'})
+        self.assertEqual(response.json()['widgets']['income_vs_expense']['expenses'], 25.0)
+
+    def test_dashboard_home_reads_snapshots(self):
+        dashboard = Dashboard.objects.get(user=self.user)
+        for widget_type in views.DASHBOARD_HOME_WIDGETS:
+            DashboardWidget.objects.get_or_create(
+                dashboard=dashboard, widget_type=widget_type, defaults={'title': widget_type, 'refresh_interval': 15}
+            )
+        precompute_widgets()
+        request = RequestFactory().get('/dashboard/')
+        request.user = self.user
+
+        # Snapshots and active loans; no aggregate, goal or profile query
+        with mock.patch('dashboard.views.render') as render, self.assertNumQueries(2):
+            views.dashboard_home(request)
+        context = render.call_args.args[2]
+        self.assertEqual((context['monthly_income'], context['savings_rate']), (3000.0, 100.0))
+
+    def test_command_requires_a_shared_cache(self):
+        with self.assertRaises(CommandError):
+            call_command('precompute_widgets', stdout=StringIO())
+
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }}):
+                call_command('precompute_widgets', stdout=StringIO())
+        self.assertEqual(WidgetSnapshot.objects.count(), 1)
+
+
+class FinancialHealthScoreTests(TestCase):
+    """Tests for vectorized health scoring and the batch job."""
+
+    def test_band_boundaries(self):
+        self.assertEqual(calculate_financial_health_score(20, 6, 20), 100)
+        self.assertEqual(calculate_financial_health_score(20.01, 5.99, 19.99), 80)
+        self.assertEqual(calculate_financial_health_score(50, 0.5, 5), 40)
+        self.assertEqual(calculate_financial_health_score(51, 0, 4.99), 20)
+
+    def test_batch_matches_single_user_summary(self):
+        User = get_user_model()
+        today = date.today()
+        users = []
+        for i, (income, fund, spent) in enumerate([(4000, 12000, 3000), (2000, 0, 5400), (0, 0, 0)]):
+            user = User.objects.create_user(email=f'health{i}@example.com', password='StrongPass123')
+            UserProfile.objects.create(user=user, monthly_income=Decimal(income), emergency_fund=Decimal(fund))
+            if spent:
+                Expense.objects.create(user=user, amount=Decimal(spent), description='Rent', date=today)
+            users.append(user)
+        Loan.objects.create(
+            user=users[1], amount=Decimal('20000.00'), interest_rate=Decimal('6.00'), term_months=60,
+            monthly_payment=Decimal('900.00'), remaining_balance=Decimal('20000.00'), status='active'
+        )
+
+        # Profiles, loans, expenses, existing insights, then one write each
+        with self.assertNumQueries(6):
+            self.assertEqual(refresh_health_scores([user.pk for user in users], today=today), 3)
+
+        for user in users:
+            summary = build_financial_summary(FinancialContext(user, today=today))
+            stored = FinancialHealthScore.objects.get(user=user, date=today)
+            self.assertAlmostEqual(stored.score, summary['financial_health_score'])
+
+        self.assertEqual(
+            set(FinancialInsight.objects.filter(user=users[1]).values_list('category', flat=True)), {'budget', 'saving'}
+        )
+
+        # Re-scoring the same day updates scores without repeating insights
+        insights = FinancialInsight.objects.count()
+        refresh_health_scores([user.pk for user in users], today=today)
+        self.assertEqual(FinancialHealthScore.objects.count(), 3)
+        self.assertEqual(FinancialInsight.objects.count(), insights)
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Tests for per-view query budgets."""
+
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.user = User.objects.create_user(email='budget@example.com', password='StrongPass123')
+        UserProfile.objects.create(user=self.user, monthly_income=Decimal('3000.00'))
+        self.client.force_login(self.user)
+
+    def test_dashboard_api_views_stay_within_budget(self):
+        for name in ('dashboard_api_expense_breakdown', 'dashboard_api_weekly_spending', 'dashboard_api_widgets'):
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(hasattr(response.wsgi_request, 'query_stats'))
+
+    def test_exceeding_budget_fails_request(self):
+        with mock.patch.object(views.dashboard_api_weekly_spending, 'query_budget', QueryBudget(queries=1)):
+            with self.assertLogs('finwise.performance', 'WARNING'), self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('dashboard_api_weekly_spending'))
+
+    def test_assert_within_budget(self):
+        with self.assertRaises(AssertionError):
+            with self.assertWithinBudget(queries=1):
+                list(Expense.objects.all())
+                list(ExpenseCategory.objects.all())
+
+
+class QueryPlanAuditTests(TestCase):
+    """Tests for the hot query catalog and its plan audit."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='plans@example.com', password='StrongPass123')
+
+    def test_catalogued_queries_have_no_scans_or_sorts(self):
+        audits = audit_query_plans(self.user, date(2025, 6, 1))
+
+        self.assertGreater(len(audits), 20)
+        self.assertEqual([(audit.name, audit.findings) for audit in audits if not audit.ok], [])
+
+    def test_findings_are_read_from_sqlite_plans(self):
+        plan = '3 0 0 SCAN loans_loan\n9 0 0 SEARCH loans_loanpayment USING INDEX x (loan_id=?)\n20 0 0 USE TEMP B-TREE FOR ORDER BY'
+        self.assertEqual(
+            [kind for kind, _ in plan_findings(plan, 'sqlite')], [FULL_SCAN, TEMP_SORT]
+        )
+
+    def test_index_is_proposed_from_filters_and_ordering(self):
+        unindexed = Loan.objects.filter(user=self.user, interest_rate__gte=5, is_simulation=True).order_by('-amount')
+        self.assertEqual(suggest_index(unindexed), ['user', '-amount'])
+
+        joined = LoanPayment.objects.filter(loan__user=self.user, payment_date__gte=date(2025, 1, 1))
+        self.assertEqual(suggest_index(joined.order_by('-amount')), ['loan', '-amount'])
+        # Default ordering is covered by loanpayment_loan_date_idx
+        self.assertIsNone(suggest_index(joined))
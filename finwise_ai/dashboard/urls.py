@@ -0,0 +1,15 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('', views.dashboard_home, name='dashboard_home'),
+    path('summary/', views.financial_summary, name='financial_summary'),
+    path('expense-trends/', views.expense_trends, name='expense_trends'),
+    path('income-vs-expenses/', views.income_vs_expenses, name='income_vs_expenses'),
+    path('net-worth/', views.net_worth_tracker, name='net_worth_tracker'),
+    path('goals-progress/', views.financial_goals_progress, name='financial_goals_progress'),
+    path('budget-performance/', views.budget_performance, name='budget_performance'),
+    path('api/expense-breakdown/', views.dashboard_api_expense_breakdown, name='dashboard_api_expense_breakdown'),
+    path('api/weekly-spending/', views.dashboard_api_weekly_spending, name='dashboard_api_weekly_spending'),
+    path('api/widgets/', views.dashboard_api_widgets, name='dashboard_api_widgets'),
+]
@@ -2,43 +2,46 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
 from django.utils import timezone
 from datetime import datetime, timedelta
 import json
 import pandas as pd
 import numpy as np
 from accounts.models import UserProfile
+from finwise.performance import query_budget
 from expenses.models import Expense, ExpenseCategory
-from loans.models import Loan
+from expenses.rollups import category_totals, monthly_category_totals, monthly_totals
 from goals.models import SavingsGoal
 from investments.models import Investment
-from credit.models import CreditHistory
+from .aggregates import expense_overview
+from .cache import cached_for_user
+from .context import EXPENSE_WINDOW_MONTHS, FinancialContext
+from .health import health_scores
+from .models import NetWorthSnapshot
+from .networth import month_window
+from .precompute import widget_payloads
+from .widgets import parse_widget_types, widgets_etag
 
+# Widget payloads the dashboard home page is built from
+DASHBOARD_HOME_WIDGETS = [
+    'credit_score', 'expense_summary', 'income_vs_expense', 'investment_performance', 'loan_summary', 'savings_progress',
+]
+
+@query_budget(queries=10)
 @login_required
 def dashboard_home(request):
     """Main dashboard view showing overview of all financial data."""
-    # Get current date and date ranges
-    today = timezone.now().date()
-    current_month_start = today.replace(day=1)
-    last_month_start = (current_month_start - timedelta(days=1)).replace(day=1)
-    
-    # Get user's expenses for current month
-    current_month_expenses = Expense.objects.filter(
-        user=request.user,
-        date__gte=current_month_start,
-        date__lte=today
-    )
+    # Figures come from the precomputed widget payloads when they are current
+    ctx = FinancialContext(request.user)
+    payloads = widget_payloads(ctx, DASHBOARD_HOME_WIDGETS)
     
-    # Get user's expenses for last month
-    last_month_expenses = Expense.objects.filter(
-        user=request.user,
-        date__gte=last_month_start,
-        date__lt=current_month_start
-    )
-    
-    # Calculate total expenses for current and last month
-    current_month_total = sum(expense.amount for expense in current_month_expenses)
-    last_month_total = sum(expense.amount for expense in last_month_expenses)
+    expenses = payloads['expense_summary']
+    current_month_total = expenses['current_month_total']
+    last_month_total = expenses['last_month_total']
+    expense_breakdown = expenses['expense_breakdown']
+    weekly_spending = expenses['weekly_spending']
     
     # Calculate month-over-month change
     if last_month_total > 0:
@@ -46,96 +49,24 @@ def dashboard_home(request):
     else:
         mom_change = 0
     
-    # Get expense breakdown by category for current month
-    categories = ExpenseCategory.objects.all()
-    expense_breakdown = []
-    
-    for category in categories:
-        category_expenses = current_month_expenses.filter(category=category)
-        category_total = sum(expense.amount for expense in category_expenses)
-        
-        if category_total > 0:
-            expense_breakdown.append({
-                'category': category.name,
-                'amount': category_total,
-                'percentage': (category_total / current_month_total * 100) if current_month_total > 0 else 0
-            })
-    
-    # Sort expense breakdown by amount (descending)
-    expense_breakdown = sorted(expense_breakdown, key=lambda x: x['amount'], reverse=True)
-    
-    # Get user's income
-    user_profile = UserProfile.objects.get(user=request.user)
-    monthly_income = user_profile.monthly_income
-    
-    # Calculate savings rate
-    if monthly_income > 0:
-        savings_rate = ((monthly_income - current_month_total) / monthly_income) * 100
-    else:
-        savings_rate = 0
+    # Get user's income and savings rate
+    monthly_income = payloads['income_vs_expense']['income']
+    savings_rate = payloads['income_vs_expense']['savings_rate']
     
     # Get active loans
-    active_loans = Loan.objects.filter(
-        user=request.user,
-        status='active'
-    )
+    active_loans = ctx.active_loans
     
-    total_loan_balance = sum(loan.remaining_balance for loan in active_loans)
+    total_loan_balance = payloads['loan_summary']['total_balance']
     
-    # Get savings goals
-    savings_goals = SavingsGoal.objects.filter(
-        user=request.user,
-        is_completed=False
-    ).order_by('target_date')
-    
-    # Calculate progress for each goal
-    for goal in savings_goals:
-        goal.progress_percentage = (goal.current_amount / goal.target_amount) * 100 if goal.target_amount > 0 else 0
+    # Get active savings goals with their progress
+    savings_goals = payloads['savings_progress']['goals']
     
     # Get investment portfolio
-    investments = Investment.objects.filter(
-        user=request.user,
-        status='active',
-        is_simulation=False
-    )
-    
-    total_investment_value = sum(inv.current_value for inv in investments)
-    total_investment_cost = sum(inv.purchase_price * inv.quantity for inv in investments)
-    
-    # Calculate investment return
-    if total_investment_cost > 0:
-        investment_return = ((total_investment_value - total_investment_cost) / total_investment_cost) * 100
-    else:
-        investment_return = 0
+    total_investment_value = payloads['investment_performance']['total_value']
+    investment_return = payloads['investment_performance']['return_percentage']
     
     # Get latest credit score
-    latest_credit = CreditHistory.objects.filter(
-        user=request.user
-    ).order_by('-date').first()
-    
-    credit_score = latest_credit.score if latest_credit else None
-    
-    # Get weekly spending trend (last 4 weeks)
-    weekly_spending = []
-    
-    for i in range(4, 0, -1):
-        week_end = today - timedelta(days=today.weekday() + 1 + (7 * (i - 1)))
-        week_start = week_end - timedelta(days=6)
-        
-        week_expenses = Expense.objects.filter(
-            user=request.user,
-            date__gte=week_start,
-            date__lte=week_end
-        )
-        
-        week_total = sum(expense.amount for expense in week_expenses)
-        
-        weekly_spending.append({
-            'week': f'Week {5-i}',
-            'start_date': week_start.strftime('%m/%d'),
-            'end_date': week_end.strftime('%m/%d'),
-            'amount': week_total
-        })
+    credit_score = payloads['credit_score']['score']
     
     # Prepare context for template
     context = {
@@ -152,71 +83,25 @@ def dashboard_home(request):
         'investment_return': investment_return,
         'credit_score': credit_score,
         'weekly_spending': weekly_spending,
-        'expense_breakdown_json': json.dumps([{
-            'category': item['category'],
-            'amount': float(item['amount']),
-            'percentage': float(item['percentage'])
-        } for item in expense_breakdown]),
+        'expense_breakdown_json': json.dumps(expense_breakdown),
         'weekly_spending_json': json.dumps([{
             'week': item['week'],
-            'amount': float(item['amount'])
+            'amount': item['amount']
         } for item in weekly_spending])
     }
     
     return render(request, 'dashboard/dashboard_home.html', context)
 
+@query_budget(queries=6)
 @login_required
 def financial_summary(request):
     """View for displaying a comprehensive financial summary."""
-    # Get user profile
-    user_profile = UserProfile.objects.get(user=request.user)
-    
-    # Calculate net worth
-    assets = calculate_total_assets(request.user)
-    liabilities = calculate_total_liabilities(request.user)
-    net_worth = assets - liabilities
-    
-    # Calculate debt-to-income ratio
-    monthly_debt_payments = calculate_monthly_debt_payments(request.user)
-    monthly_income = user_profile.monthly_income
-    
-    if monthly_income > 0:
-        debt_to_income = (monthly_debt_payments / monthly_income) * 100
-    else:
-        debt_to_income = 0
-    
-    # Calculate emergency fund coverage
-    monthly_expenses = calculate_average_monthly_expenses(request.user)
-    emergency_fund = user_profile.emergency_fund
-    
-    if monthly_expenses > 0:
-        emergency_fund_months = emergency_fund / monthly_expenses
-    else:
-        emergency_fund_months = 0
-    
-    # Calculate savings rate (last 3 months)
-    savings_rate = calculate_savings_rate(request.user)
-    
-    # Get financial health score
-    financial_health_score = calculate_financial_health_score(
-        debt_to_income, emergency_fund_months, savings_rate
-    )
-    
-    context = {
-        'assets': assets,
-        'liabilities': liabilities,
-        'net_worth': net_worth,
-        'debt_to_income': debt_to_income,
-        'monthly_debt_payments': monthly_debt_payments,
-        'monthly_income': monthly_income,
-        'emergency_fund': emergency_fund,
-        'emergency_fund_months': emergency_fund_months,
-        'savings_rate': savings_rate,
-        'financial_health_score': financial_health_score
-    }
+    # Served from cache until one of the user's financial records changes
+    context = cached_for_user(request.user.pk, 'financial_summary', lambda: build_financial_summary(FinancialContext(request.user)))
     
     return render(request, 'dashboard/financial_summary.html', context)
 
+@query_budget(queries=4)
 @login_required
 def expense_trends(request):
     """View for analyzing expense trends over time."""
@@ -231,31 +116,25 @@ def expense_trends(request):
     if start_date.month > today.month:
         start_date = start_date.replace(year=today.year - 1)
     
-    # Get expenses in date range
-    expenses = Expense.objects.filter(
-        user=request.user,
-        date__gte=start_date,
-        date__lte=end_date
-    )
-    
-    # Group expenses by month and category
+    # Group expenses by month and category using the monthly rollups
     monthly_expenses = {}
     categories = ExpenseCategory.objects.all()
     
-    for expense in expenses:
-        month_key = expense.date.strftime('%Y-%m')
+    for row in monthly_category_totals(request.user, start_date, end_date):
+        month_key = row['month'].strftime('%Y-%m')
         
         if month_key not in monthly_expenses:
             monthly_expenses[month_key] = {
-                'month': expense.date.strftime('%b %Y'),
+                'month': row['month'].strftime('%b %Y'),
                 'total': 0,
                 'categories': {category.name: 0 for category in categories}
             }
         
-        monthly_expenses[month_key]['total'] += expense.amount
-        monthly_expenses[month_key]['categories'][expense.category.name] += expense.amount
+        monthly_expenses[month_key]['total'] += row['amount']
+        if row['category__name'] is not None:
+            monthly_expenses[month_key]['categories'][row['category__name']] += row['amount']
     
-    # Convert to list and sort by month
+    # Convert to list (rollup rows are already ordered by month)
     monthly_data = list(monthly_expenses.values())
     
     # Calculate month-over-month changes
@@ -286,6 +165,7 @@ def expense_trends(request):
     
     return render(request, 'dashboard/expense_trends.html', context)
 
+@query_budget(queries=4)
 @login_required
 def income_vs_expenses(request):
     """View for comparing income vs expenses over time."""
@@ -304,12 +184,8 @@ def income_vs_expenses(request):
     user_profile = UserProfile.objects.get(user=request.user)
     monthly_income = user_profile.monthly_income
     
-    # Get expenses in date range
-    expenses = Expense.objects.filter(
-        user=request.user,
-        date__gte=start_date,
-        date__lte=end_date
-    )
+    # Get monthly expense totals from the rollups
+    expense_totals = monthly_totals(request.user, start_date, end_date)
     
     # Group expenses by month
     monthly_data = {}
@@ -334,11 +210,11 @@ def income_vs_expenses(request):
             current_date = current_date.replace(month=current_date.month + 1)
     
     # Add expenses to monthly data
-    for expense in expenses:
-        month_key = expense.date.strftime('%Y-%m')
+    for month, total in expense_totals.items():
+        month_key = month.strftime('%Y-%m')
         
         if month_key in monthly_data:
-            monthly_data[month_key]['expenses'] += expense.amount
+            monthly_data[month_key]['expenses'] += total
             monthly_data[month_key]['savings'] = monthly_data[month_key]['income'] - monthly_data[month_key]['expenses']
     
     # Convert to list and sort by month
@@ -370,53 +246,41 @@ def income_vs_expenses(request):
     
     return render(request, 'dashboard/income_vs_expenses.html', context)
 
+@query_budget(queries=3)
 @login_required
 def net_worth_tracker(request):
     """View for tracking net worth over time."""
-    # Calculate current net worth
-    assets = calculate_total_assets(request.user)
-    liabilities = calculate_total_liabilities(request.user)
-    net_worth = assets - liabilities
-    
-    # Get historical net worth data (if available)
-    # In a real app, this would come from a NetWorthHistory model
-    # For this demo, we'll generate some sample data
+    # Calculate current net worth (shares the cached financial summary)
+    summary = cached_for_user(request.user.pk, 'financial_summary', lambda: build_financial_summary(FinancialContext(request.user)))
+    assets = summary['assets']
+    liabilities = summary['liabilities']
+    net_worth = summary['net_worth']
     
-    # Generate monthly data for the last 12 months
+    # Get monthly history for the last 12 months with a single range read
     today = timezone.now().date()
+    current_month = today.replace(day=1)
     
-    net_worth_history = []
-    current_net_worth = net_worth
-    
-    for i in range(12, 0, -1):
-        month_date = today.replace(day=1)
-        if month_date.month <= i:
-            month_date = month_date.replace(year=month_date.year - 1, month=12 - (i - month_date.month))
-        else:
-            month_date = month_date.replace(month=month_date.month - i)
-        
-        # Simulate some random fluctuation in past net worth
-        random_factor = 1 + (np.random.random() * 0.05 - 0.025)  # +/- 2.5%
-        historical_net_worth = current_net_worth * random_factor * (0.97 ** i)  # Assume 3% monthly growth
-        
-        net_worth_history.append({
-            'date': month_date,
-            'assets': historical_net_worth * 0.7,  # Assume 70% assets, 30% liabilities
-            'liabilities': historical_net_worth * 0.3 * -1,  # Negative for liabilities
-            'net_worth': historical_net_worth
-        })
-    
-    # Add current month
+    snapshots = NetWorthSnapshot.objects.filter(
+        user=request.user,
+        month__gte=month_window(today, 13)[0],
+        month__lt=current_month
+    ).values('month', 'assets', 'liabilities', 'net_worth')
+    
+    net_worth_history = [{
+        'date': snapshot['month'],
+        'assets': snapshot['assets'],
+        'liabilities': snapshot['liabilities'] * -1,  # Negative for liabilities
+        'net_worth': snapshot['net_worth']
+    } for snapshot in snapshots]
+    
+    # Add current month from live figures
     net_worth_history.append({
-        'date': today.replace(day=1),
+        'date': current_month,
         'assets': assets,
         'liabilities': liabilities * -1,  # Negative for liabilities
         'net_worth': net_worth
     })
     
-    # Sort by date
-    net_worth_history = sorted(net_worth_history, key=lambda x: x['date'])
-    
     # Prepare data for charts
     dates = [item['date'].strftime('%b %Y') for item in net_worth_history]
     assets_data = [float(item['assets']) for item in net_worth_history]
@@ -449,6 +313,7 @@ def net_worth_tracker(request):
     
     return render(request, 'dashboard/net_worth_tracker.html', context)
 
+@query_budget(queries=3)
 @login_required
 def financial_goals_progress(request):
     """View for tracking progress towards financial goals."""
@@ -493,6 +358,7 @@ def financial_goals_progress(request):
     
     return render(request, 'dashboard/financial_goals_progress.html', context)
 
+@query_budget(queries=5)
 @login_required
 def budget_performance(request):
     """View for analyzing budget performance."""
@@ -515,19 +381,17 @@ def budget_performance(request):
     total_budget = monthly_income * 0.5
     budget_per_category = total_budget / len(categories)
     
-    # Get expenses for current month
-    current_month_expenses = Expense.objects.filter(
-        user=request.user,
-        date__gte=current_month_start,
-        date__lte=current_month_end
-    )
+    # Get category totals for current month from the rollups
+    actual_by_category = {
+        row['category_id']: row['amount']
+        for row in category_totals(request.user, current_month_start, current_month_end)
+    }
     
     # Calculate budget performance
     budget_performance = []
     
     for category in categories:
-        category_expenses = current_month_expenses.filter(category=category)
-        category_total = sum(expense.amount for expense in category_expenses)
+        category_total = actual_by_category.get(category.pk, 0)
         
         budget_performance.append({
             'category': category.name,
@@ -555,169 +419,146 @@ def budget_performance(request):
     
     return render(request, 'dashboard/budget_performance.html', context)
 
+@query_budget(queries=4)
 @login_required
 def dashboard_api_expense_breakdown(request):
     """API endpoint for expense breakdown data."""
-    # Get current month
-    today = timezone.now().date()
-    current_month_start = today.replace(day=1)
-    
-    # Get user's expenses for current month
-    current_month_expenses = Expense.objects.filter(
-        user=request.user,
-        date__gte=current_month_start,
-        date__lte=today
-    )
-    
-    # Calculate total expenses
-    current_month_total = sum(expense.amount for expense in current_month_expenses)
-    
-    # Get expense breakdown by category
-    categories = ExpenseCategory.objects.all()
-    expense_breakdown = []
-    
-    for category in categories:
-        category_expenses = current_month_expenses.filter(category=category)
-        category_total = sum(expense.amount for expense in category_expenses)
-        
-        if category_total > 0:
-            expense_breakdown.append({
-                'category': category.name,
-                'amount': float(category_total),
-                'percentage': float((category_total / current_month_total * 100) if current_month_total > 0 else 0)
-            })
+    overview = expense_overview(request.user)
     
-    # Sort by amount (descending)
-    expense_breakdown = sorted(expense_breakdown, key=lambda x: x['amount'], reverse=True)
+    expense_breakdown = [{
+        'category': item['category'],
+        'amount': float(item['amount']),
+        'percentage': float(item['percentage'])
+    } for item in overview['expense_breakdown']]
     
     return JsonResponse({'expense_breakdown': expense_breakdown})
 
+@query_budget(queries=4)
 @login_required
 def dashboard_api_weekly_spending(request):
     """API endpoint for weekly spending trend data."""
-    # Get current date
-    today = timezone.now().date()
-    
-    # Get weekly spending trend (last 4 weeks)
-    weekly_spending = []
+    overview = expense_overview(request.user)
     
-    for i in range(4, 0, -1):
-        week_end = today - timedelta(days=today.weekday() + 1 + (7 * (i - 1)))
-        week_start = week_end - timedelta(days=6)
-        
-        week_expenses = Expense.objects.filter(
-            user=request.user,
-            date__gte=week_start,
-            date__lte=week_end
-        )
-        
-        week_total = sum(expense.amount for expense in week_expenses)
-        
-        weekly_spending.append({
-            'week': f'Week {5-i}',
-            'start_date': week_start.strftime('%m/%d'),
-            'end_date': week_end.strftime('%m/%d'),
-            'amount': float(week_total)
-        })
+    weekly_spending = [dict(item, amount=float(item['amount'])) for item in overview['weekly_spending']]
     
     return JsonResponse({'weekly_spending': weekly_spending})
 
+def _widgets_etag(request):
+    widget_types = parse_widget_types(request.GET.get('types'))
+    if widget_types is None:
+        return None
+    return widgets_etag(request.user.pk, widget_types, timezone.now().date())
+
+@query_budget(queries=12)
+@login_required
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_widgets_etag)
+def dashboard_api_widgets(request):
+    """API endpoint returning several widget payloads in one response (?types=a,b)."""
+    widget_types = parse_widget_types(request.GET.get('types'))
+    
+    if widget_types is None:
+        return JsonResponse({'error': 'Unknown widget type.'}, status=400)
+    
+    # Precomputed payloads are served when current; the rest share one context
+    ctx = FinancialContext(request.user)
+    
+    return JsonResponse({'widgets': widget_payloads(ctx, widget_types)})
+
 # Helper functions
 
-def calculate_total_assets(user):
+def build_financial_summary(ctx):
+    """Compute the figures shown on the financial summary page."""
+    # Calculate net worth
+    assets = calculate_total_assets(ctx)
+    liabilities = calculate_total_liabilities(ctx)
+    net_worth = assets - liabilities
+    
+    # Calculate debt-to-income ratio
+    monthly_debt_payments = calculate_monthly_debt_payments(ctx)
+    monthly_income = ctx.monthly_income
+    
+    if monthly_income > 0:
+        debt_to_income = (monthly_debt_payments / monthly_income) * 100
+    else:
+        debt_to_income = 0
+    
+    # Calculate emergency fund coverage
+    monthly_expenses = calculate_average_monthly_expenses(ctx)
+    emergency_fund = ctx.profile.emergency_fund
+    
+    if monthly_expenses > 0:
+        emergency_fund_months = emergency_fund / monthly_expenses
+    else:
+        emergency_fund_months = 0
+    
+    # Calculate savings rate (last 3 months)
+    savings_rate = calculate_savings_rate(ctx)
+    
+    # Get financial health score
+    financial_health_score = calculate_financial_health_score(
+        debt_to_income, emergency_fund_months, savings_rate
+    )
+    
+    return {
+        'assets': assets,
+        'liabilities': liabilities,
+        'net_worth': net_worth,
+        'debt_to_income': debt_to_income,
+        'monthly_debt_payments': monthly_debt_payments,
+        'monthly_income': monthly_income,
+        'emergency_fund': emergency_fund,
+        'emergency_fund_months': emergency_fund_months,
+        'savings_rate': savings_rate,
+        'financial_health_score': financial_health_score
+    }
+
+def calculate_total_assets(ctx):
     """Calculate total assets for a user."""
-    # Get user profile
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = ctx.profile
     
     # Cash assets
     cash_assets = user_profile.cash_balance + user_profile.emergency_fund
     
     # Investment assets
-    investments = Investment.objects.filter(
-        user=user,
-        status='active',
-        is_simulation=False
-    )
-    investment_assets = sum(inv.current_value for inv in investments)
+    investment_assets = sum(inv.current_value for inv in ctx.active_investments)
     
     # Other assets (property, vehicles, etc.)
     other_assets = user_profile.other_assets_value
     
     return cash_assets + investment_assets + other_assets
 
-def calculate_total_liabilities(user):
+def calculate_total_liabilities(ctx):
     """Calculate total liabilities for a user."""
-    # Get loans
-    loans = Loan.objects.filter(
-        user=user,
-        status='active'
-    )
-    loan_liabilities = sum(loan.remaining_balance for loan in loans)
+    loan_liabilities = sum(loan.remaining_balance or 0 for loan in ctx.active_loans)
     
-    # Get user profile for other liabilities
-    user_profile = UserProfile.objects.get(user=user)
-    other_liabilities = user_profile.other_liabilities_value
+    # Other liabilities from the user profile
+    other_liabilities = ctx.profile.other_liabilities_value
     
     return loan_liabilities + other_liabilities
 
-def calculate_monthly_debt_payments(user):
+def calculate_monthly_debt_payments(ctx):
     """Calculate total monthly debt payments for a user."""
-    # Get loans
-    loans = Loan.objects.filter(
-        user=user,
-        status='active'
-    )
-    loan_payments = sum(loan.monthly_payment for loan in loans)
+    loan_payments = sum(loan.monthly_payment for loan in ctx.active_loans)
     
-    # Get user profile for other debt payments
-    user_profile = UserProfile.objects.get(user=user)
-    other_debt_payments = user_profile.other_monthly_debt_payments
+    # Other debt payments from the user profile
+    other_debt_payments = ctx.profile.other_monthly_debt_payments
     
     return loan_payments + other_debt_payments
 
-def calculate_average_monthly_expenses(user):
+def calculate_average_monthly_expenses(ctx):
     """Calculate average monthly expenses for a user (last 3 months)."""
-    # Get current date
-    today = timezone.now().date()
-    three_months_ago = today - timedelta(days=90)
-    
-    # Get expenses for last 3 months
-    expenses = Expense.objects.filter(
-        user=user,
-        date__gte=three_months_ago,
-        date__lte=today
-    )
-    
-    total_expenses = sum(expense.amount for expense in expenses)
-    
-    # Calculate monthly average
-    return total_expenses / 3
+    return ctx.expense_window_total / EXPENSE_WINDOW_MONTHS
 
-def calculate_savings_rate(user):
+def calculate_savings_rate(ctx):
     """Calculate savings rate for a user (last 3 months)."""
-    # Get user profile
-    user_profile = UserProfile.objects.get(user=user)
-    monthly_income = user_profile.monthly_income
-    
-    # Get current date
-    today = timezone.now().date()
-    three_months_ago = today - timedelta(days=90)
-    
-    # Get expenses for last 3 months
-    expenses = Expense.objects.filter(
-        user=user,
-        date__gte=three_months_ago,
-        date__lte=today
-    )
-    
-    total_expenses = sum(expense.amount for expense in expenses)
-    
     # Calculate total income for 3 months
-    total_income = monthly_income * 3
+    total_income = ctx.monthly_income * EXPENSE_WINDOW_MONTHS
     
     # Calculate savings and savings rate
     if total_income > 0:
-        savings = total_income - total_expenses
+        savings = total_income - ctx.expense_window_total
         savings_rate = (savings / total_income) * 100
     else:
         savings_rate = 0
@@ -726,41 +567,6 @@ def calculate_savings_rate(user):
 
 def calculate_financial_health_score(debt_to_income, emergency_fund_months, savings_rate):
     """Calculate financial health score (0-100)."""
-    # Debt-to-income score (lower is better)
-    if debt_to_income <= 20:
-        dti_score = 100
-    elif debt_to_income <= 36:
-        dti_score = 80
-    elif debt_to_income <= 43:
-        dti_score = 60
-    elif debt_to_income <= 50:
-        dti_score = 40
-    else:
-        dti_score = 20
-    
-    # Emergency fund score (higher is better)
-    if emergency_fund_months >= 6:
-        ef_score = 100
-    elif emergency_fund_months >= 3:
-        ef_score = 80
-    elif emergency_fund_months >= 1:
-        ef_score = 60
-    elif emergency_fund_months > 0:
-        ef_score = 40
-    else:
-        ef_score = 20
-    
-    # Savings rate score (higher is better)
-    if savings_rate >= 20:
-        sr_score = 100
-    elif savings_rate >= 15:
-        sr_score = 80
-    elif savings_rate >= 10:
-        sr_score = 60
-    elif savings_rate >= 5:
-        sr_score = 40
-    else:
-        sr_score = 20
-    
-    # Calculate weighted average
-    return (dti_score * 0.4) + (ef_score * 0.3) + (sr_score * 0.3)
+    # Same scoring as the batch job, applied to a single user
+    scores = health_scores([float(debt_to_income)], [float(emergency_fund_months)], [float(savings_rate)])
+    return float(scores['score'][0])
@@ -0,0 +1,116 @@
+import hashlib
+from credit.models import CreditHistory
+from goals.models import SavingsGoal
+from .cache import get_data_version
+
+
+def expense_summary_payload(ctx):
+    """Current and last month totals, category breakdown and weekly trend."""
+    overview = ctx.expense_overview
+
+    return {
+        'current_month_total': float(overview['current_month_total']),
+        'last_month_total': float(overview['last_month_total']),
+        'expense_breakdown': [{
+            'category': item['category'],
+            'amount': float(item['amount']),
+            'percentage': float(item['percentage'])
+        } for item in overview['expense_breakdown']],
+        'weekly_spending': [
+            dict(item, amount=float(item['amount'])) for item in overview['weekly_spending']
+        ],
+    }
+
+
+def income_vs_expense_payload(ctx):
+    """Monthly income against spending so far this month."""
+    overview = ctx.expense_overview
+    monthly_income = ctx.monthly_income
+    expenses = overview['current_month_total']
+
+    return {
+        'income': float(monthly_income),
+        'expenses': float(expenses),
+        'savings': float(monthly_income - expenses),
+        'savings_rate': float((monthly_income - expenses) / monthly_income * 100) if monthly_income > 0 else 0,
+    }
+
+
+def savings_progress_payload(ctx):
+    """Progress of the user's active savings goals."""
+    goals = SavingsGoal.objects.filter(user=ctx.user, status='active').order_by('target_date')
+
+    return {
+        'goals': [{
+            'name': goal.name,
+            'target_amount': float(goal.target_amount),
+            'current_amount': float(goal.current_amount),
+            'progress_percentage': float(goal.progress_percentage),
+            'target_date': goal.target_date.isoformat(),
+        } for goal in goals],
+    }
+
+
+def loan_summary_payload(ctx):
+    """Balance and monthly payments across active loans."""
+    return {
+        'active_loans': len(ctx.active_loans),
+        'total_balance': float(sum(loan.remaining_balance or 0 for loan in ctx.active_loans)),
+        'monthly_payments': float(sum(loan.monthly_payment for loan in ctx.active_loans)),
+    }
+
+
+def investment_performance_payload(ctx):
+    """Value, cost and return of active investments."""
+    value = sum(inv.current_value for inv in ctx.active_investments)
+    cost = sum(inv.purchase_price * inv.quantity for inv in ctx.active_investments)
+
+    return {
+        'total_value': float(value),
+        'total_cost': float(cost),
+        'return_percentage': float((value - cost) / cost * 100) if cost > 0 else 0,
+    }
+
+
+def credit_score_payload(ctx):
+    """Latest recorded credit score."""
+    latest = CreditHistory.objects.filter(user=ctx.user).order_by('-date').first()
+
+    return {
+        'score': latest.score if latest else None,
+        'date': latest.date.isoformat() if latest else None,
+    }
+
+
+# Payload builders keyed by DashboardWidget.widget_type
+WIDGET_BUILDERS = {
+    'expense_summary': expense_summary_payload,
+    'income_vs_expense': income_vs_expense_payload,
+    'savings_progress': savings_progress_payload,
+    'loan_summary': loan_summary_payload,
+    'investment_performance': investment_performance_payload,
+    'credit_score': credit_score_payload,
+}
+
+
+def parse_widget_types(value):
+    """Return the requested widget types in a stable order, or None if any is unknown."""
+    if not value:
+        return sorted(WIDGET_BUILDERS)
+
+    types = sorted({widget_type.strip() for widget_type in value.split(',') if widget_type.strip()})
+    if not types or any(widget_type not in WIDGET_BUILDERS for widget_type in types):
+        return None
+
+    return types
+
+
+def widgets_etag(user_id, widget_types, today):
+    """
+    Strong ETag for a set of widget payloads.
+
+    Payloads only change when the user's data version moves or the date rolls
+    over (month and week windows), so both are part of the tag.
+    """
+    key = f'{user_id}:{get_data_version(user_id)}:{today.isoformat()}:{",".join(widget_types)}'
+    return hashlib.sha256(key.encode()).hexdigest()
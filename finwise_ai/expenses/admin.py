@@ -5,6 +5,10 @@ from .models import (
     Expense,
     RecurringExpense,
     AnomalyDetection,
+    MonthlyExpenseRollup,
+    CategorySpendingStats,
+    AnomalyRescan,
+    CategoryRule,
 )
 
 
@@ -33,3 +37,29 @@ class AnomalyDetectionAdmin(admin.ModelAdmin):
     list_display = ("user", "expense", "anomaly_type", "confidence_score")
     search_fields = ("user__email", "expense__description")
     list_filter = ("anomaly_type",)
+
+
+@admin.register(MonthlyExpenseRollup)
+class MonthlyExpenseRollupAdmin(admin.ModelAdmin):
+    list_display = ("user", "month", "category", "total", "expense_count")
+    search_fields = ("user__email",)
+    list_filter = ("month",)
+
+
+@admin.register(CategorySpendingStats)
+class CategorySpendingStatsAdmin(admin.ModelAdmin):
+    list_display = ("user", "category", "count", "mean", "decayed_mean", "updated_at")
+    search_fields = ("user__email",)
+
+
+@admin.register(AnomalyRescan)
+class AnomalyRescanAdmin(admin.ModelAdmin):
+    list_display = ("started_at", "method", "threshold", "rows_scanned", "anomalies_found", "finished_at")
+    list_filter = ("method",)
+
+
+@admin.register(CategoryRule)
+class CategoryRuleAdmin(admin.ModelAdmin):
+    list_display = ("pattern", "match_type", "category", "user", "priority", "is_active")
+    search_fields = ("pattern", "user__email")
+    list_filter = ("match_type", "is_active")
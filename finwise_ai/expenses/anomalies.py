@@ -0,0 +1,223 @@
+import warnings
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from .models import AnomalyDetection, CategorySpendingStats, Expense
+from .signals import expenses_bulk_updated
+from .stats import baselines
+
+# Spikes need at least 5 other expenses and exceed the mean by 2 std; rescans look back 6 months
+LOOKBACK_DAYS = 180
+MIN_HISTORY = 5
+SPIKE_STD_DEVIATIONS = 2
+
+# Scales the median absolute deviation to a standard deviation under normality
+MAD_SCALE = 0.6745
+
+# Rows per id list when updating expenses by primary key
+UPDATE_BATCH_SIZE = 500
+
+# Values gathered at once when computing rolling medians
+MAX_WINDOW_CELLS = 4_000_000
+
+
+def detect_anomalies_batch(user, expense_ids, chunk_size=2000):
+    """
+    Flag spikes among many new expenses of one user in a single pass.
+
+    Equivalent to calling detect_anomalies on each expense once all of them
+    are stored: every expense is compared with its category's running
+    statistics without itself. The statistics rows are loaded once and each
+    chunk is compared per category in a few vector operations. Returns the
+    number of expenses flagged.
+    """
+    stats = {row.category_id: row for row in CategorySpendingStats.objects.filter(user=user)}
+
+    flagged = 0
+    for start in range(0, len(expense_ids), chunk_size):
+        by_category = defaultdict(list)
+        for row in (
+            Expense.objects
+            .filter(user=user, pk__in=list(expense_ids[start:start + chunk_size]))
+            .values_list('pk', 'category_id', 'date', 'amount')
+        ):
+            by_category[row[1]].append(row)
+
+        anomalies = []
+        for category_id, rows in by_category.items():
+            if category_id not in stats:
+                continue
+            values = np.array([float(amount) for _, _, _, amount in rows])
+            counts, means, stds = baselines(stats[category_id], values, [date for _, _, date, _ in rows])
+
+            spikes = (counts >= MIN_HISTORY) & (values > means + SPIKE_STD_DEVIATIONS * stds)
+
+            for i in np.flatnonzero(spikes):
+                pk, _, _, amount = rows[i]
+                anomalies.append(AnomalyDetection(
+                    user=user,
+                    expense_id=pk,
+                    anomaly_type='spike',
+                    confidence_score=float(min(1.0, (values[i] - means[i]) / (3 * stds[i]))) if stds[i] > 0 else 1.0,
+                    description=f"This expense is significantly higher than your usual spending in this category. Average: {means[i]:.2f}, This expense: {amount:.2f}"
+                ))
+
+        AnomalyDetection.objects.bulk_create(anomalies)
+        Expense.objects.filter(pk__in=[anomaly.expense_id for anomaly in anomalies]).update(is_flagged=True)
+        flagged += len(anomalies)
+
+    return flagged
+
+
+def load_expense_columns(user_ids):
+    """Load the partition's expenses as columns, ordered for per-(user, category) rolling windows."""
+    rows = (
+        Expense.objects
+        .filter(user_id__in=user_ids)
+        .order_by('user_id', 'category_id', 'date', 'pk')
+        .values_list('pk', 'user_id', 'category_id', 'date', 'amount')
+    )
+    frame = pd.DataFrame.from_records(
+        list(rows.iterator(chunk_size=5000)), columns=['pk', 'user_id', 'category_id', 'date', 'amount']
+    )
+    frame['category_id'] = frame['category_id'].fillna(-1).astype('int64')
+    frame['date'] = pd.to_datetime(frame['date'])
+    frame['amount'] = frame['amount'].astype('float64')
+    return frame
+
+
+def rolling_median_mad(frame, window_days, max_cells=MAX_WINDOW_CELLS):
+    """
+    Median and scaled median absolute deviation of each expense's preceding window.
+
+    The windows match spike_scores: same user and category, from window_days
+    before the expense's date up to the day before it. Each block of rows
+    gathers its windows into a NaN-padded matrix of at most max_cells values,
+    so both medians are taken with nanmedian along the rows instead of once
+    per row in Python. Rows with empty windows get NaN.
+    """
+    groups = frame.groupby(['user_id', 'category_id'], sort=False).ngroup().to_numpy().astype(np.int64)
+    days = frame['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    days -= days.min()
+    # Rows are sorted by group then date, so one sorted key finds every window's bounds
+    span = int(days.max()) + window_days + 1
+    key = groups * span + days
+    starts = np.searchsorted(key, key - window_days, side='left')
+    lengths = np.searchsorted(key, key, side='left') - starts
+
+    amounts = frame['amount'].to_numpy()
+    medians = np.full(len(frame), np.nan)
+    spreads = np.full(len(frame), np.nan)
+    width = max(int(lengths.max()), 1)
+    offsets = np.arange(width)
+    step = max(max_cells // width, 1)
+
+    with warnings.catch_warnings():
+        # Empty windows are all-NaN rows
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for begin in range(0, len(frame), step):
+            block = slice(begin, begin + step)
+            index = np.minimum(starts[block, None] + offsets, len(amounts) - 1)
+            windows = np.where(offsets < lengths[block, None], amounts[index], np.nan)
+            medians[block] = np.nanmedian(windows, axis=1)
+            spreads[block] = np.nanmedian(np.abs(windows - medians[block, None]), axis=1) / MAD_SCALE
+
+    return medians, spreads
+
+
+def spike_scores(frame, method='zscore', window_days=LOOKBACK_DAYS, min_history=MIN_HISTORY):
+    """
+    Score every expense against the same category's expenses in the preceding window.
+
+    The window covers window_days before the expense's date and excludes that
+    date, like detect_anomalies. 'zscore' uses the window's mean and standard
+    deviation; 'mad' the median and scaled median absolute deviation, which a
+    few earlier spikes cannot inflate. Expenses with fewer than min_history
+    earlier expenses score NaN. Returns (scores, centers) aligned with frame.
+    """
+    windows = frame.groupby(['user_id', 'category_id'], sort=False).rolling(
+        f'{window_days}D', on='date', closed='left'
+    )['amount']
+
+    def aligned(result):
+        # Rows are sorted by group, so results come back in the frame's row order
+        return result.to_numpy()
+
+    counts = aligned(windows.count())
+
+    if method == 'mad':
+        centers, spreads = rolling_median_mad(frame, window_days)
+    else:
+        centers = aligned(windows.mean())
+        spreads = aligned(windows.std(ddof=0))
+
+    amounts = frame['amount'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = np.where(spreads > 0, (amounts - centers) / spreads, np.where(amounts > centers, np.inf, 0.0))
+    scores[np.nan_to_num(counts) < min_history] = np.nan
+
+    return scores, centers
+
+
+def rescan_partition(user_ids, method='zscore', threshold=SPIKE_STD_DEVIATIONS,
+                     window_days=LOOKBACK_DAYS, min_history=MIN_HISTORY):
+    """
+    Re-run spike detection for a partition of users and store the outcome.
+
+    Unreviewed spike anomalies are replaced; reviewed ones are kept and are
+    not raised again. Expense.is_flagged ends up set for new spikes and for
+    spikes confirmed on review, kept for expenses with other kinds of
+    anomalies and cleared everywhere else. Returns (rows scanned, anomalies
+    created).
+    """
+    frame = load_expense_columns(user_ids)
+    if frame.empty:
+        return 0, 0
+
+    scores, centers = spike_scores(frame, method, window_days, min_history)
+    spikes = np.flatnonzero(scores > threshold)
+
+    reviewed = dict(
+        AnomalyDetection.objects
+        .filter(user_id__in=user_ids, anomaly_type='spike', is_reviewed=True)
+        .values_list('expense_id', 'is_false_positive')
+    )
+
+    pks = frame['pk'].to_numpy()
+    users = frame['user_id'].to_numpy()
+    amounts = frame['amount'].to_numpy()
+    anomalies = []
+    for i in spikes:
+        if int(pks[i]) in reviewed:
+            continue
+        anomalies.append(AnomalyDetection(
+            user_id=int(users[i]),
+            expense_id=int(pks[i]),
+            anomaly_type='spike',
+            confidence_score=float(min(1.0, scores[i] / (1.5 * threshold))),
+            description=f"This expense is significantly higher than your usual spending in this category. Average: {centers[i]:.2f}, This expense: {amounts[i]:.2f}"
+        ))
+
+    flagged = [anomaly.expense_id for anomaly in anomalies]
+    flagged += [expense_id for expense_id, is_false_positive in reviewed.items() if not is_false_positive]
+
+    with transaction.atomic():
+        AnomalyDetection.objects.filter(user_id__in=user_ids, anomaly_type='spike', is_reviewed=False).delete()
+        AnomalyDetection.objects.bulk_create(anomalies, batch_size=1000)
+
+        # Flags raised by other detectors, such as fraud flags, are not the rescan's to clear
+        other_anomalies = AnomalyDetection.objects.filter(user_id__in=user_ids).exclude(anomaly_type='spike')
+        (
+            Expense.objects
+            .filter(user_id__in=user_ids, is_flagged=True)
+            .exclude(pk__in=other_anomalies.values('expense_id'))
+            .update(is_flagged=False)
+        )
+        for start in range(0, len(flagged), UPDATE_BATCH_SIZE):
+            Expense.objects.filter(pk__in=flagged[start:start + UPDATE_BATCH_SIZE]).update(is_flagged=True)
+
+        # update() skips the model signals that keep cached dashboard figures current
+        expenses_bulk_updated.send(sender=Expense, user_ids=list(user_ids))
+
+    return len(frame), len(anomalies)
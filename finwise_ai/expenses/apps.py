@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class ExpensesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'expenses'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from . import signals  # noqa: F401
+        from .search import install_search_index
+
+        # Recreate search triggers dropped when a migration rebuilds the expense table
+        post_migrate.connect(install_search_index, sender=self)
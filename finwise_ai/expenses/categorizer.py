@@ -0,0 +1,260 @@
+"""
+Rule-based automatic categorization of expenses.
+
+Every active CategoryRule, global and per user, is compiled into a single
+Aho-Corasick automaton over description words, so a description is matched
+against all patterns in one pass over its words, whatever the number of
+rules. The automaton is built once per process and rebuilt when the rules
+change: each process compares the number of rules and their latest
+updated_at with those it compiled, at most every RULES_CHECK_INTERVAL
+seconds, so creates, edits and deletes reach every process without relying
+on a cache shared between them.
+
+Among the rules that match a description and accept its amount, the user's
+own rules beat global ones, then higher priority, then longer patterns.
+"""
+import re
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from decimal import Decimal
+from itertools import groupby
+from django.db import transaction
+from django.db.models import Count, Max
+from .columnar import invalidate_columns
+from .models import CategoryRule, Expense
+from .rollups import rebuild_rollups
+from .stats import rebuild_spending_stats
+
+# Seconds a process trusts its automaton before checking the rules version
+RULES_CHECK_INTERVAL = 5
+
+WORD = re.compile(r'[^\W_]+')
+
+
+def words(text):
+    """Split text into the lower-case words patterns are matched on."""
+    return tuple(WORD.findall(text.lower()))
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    pk: int
+    user_id: int
+    category_id: int
+    words: tuple
+    anchored: bool
+    priority: int = 0
+    min_amount: Decimal = None
+    max_amount: Decimal = None
+
+    def accepts(self, user_id, amount):
+        if self.user_id is not None and self.user_id != user_id:
+            return False
+        if amount is None:
+            return self.min_amount is None and self.max_amount is None
+        if self.min_amount is not None and amount < self.min_amount:
+            return False
+        if self.max_amount is not None and amount > self.max_amount:
+            return False
+        return True
+
+
+def _rank(rule):
+    return (rule.user_id is None, -rule.priority, -len(rule.words), rule.pk)
+
+
+class RuleAutomaton:
+    """Aho-Corasick automaton over words; rules are numbered in order of precedence."""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        # Rules without a pattern match every description
+        self.catch_all = []
+
+        for index, rule in enumerate(rules):
+            if not rule.words:
+                self.catch_all.append(index)
+                continue
+            node = 0
+            for word in rule.words:
+                if word not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[node][word] = len(self.goto) - 1
+                node = self.goto[node][word]
+            self.output[node].append(index)
+
+        # Breadth-first fail links; each node also reports the patterns ending in its suffixes
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for word, child in self.goto[node].items():
+                queue.append(child)
+                if node:
+                    state = self.fail[node]
+                    while state and word not in self.goto[state]:
+                        state = self.fail[state]
+                    self.fail[child] = self.goto[state].get(word, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def candidates(self, description):
+        """Return the indexes of the rules whose pattern occurs in a description, best first."""
+        found = set(self.catch_all)
+        goto, fail, output, rules = self.goto, self.fail, self.output, self.rules
+        node = 0
+        for position, word in enumerate(words(description)):
+            while node and word not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(word, 0)
+            for index in output[node]:
+                # Merchant patterns must start the description
+                if not rules[index].anchored or position + 1 == len(rules[index].words):
+                    found.add(index)
+        return sorted(found)
+
+    def best(self, candidates, user_id, amount):
+        for index in candidates:
+            rule = self.rules[index]
+            if rule.accepts(user_id, amount):
+                return rule.category_id
+        return None
+
+
+def compile_rules(rules=None):
+    """Build an automaton from CategoryRule rows (all active rules if omitted)."""
+    if rules is None:
+        rules = CategoryRule.objects.filter(is_active=True)
+
+    compiled = [
+        CompiledRule(
+            pk=rule.pk,
+            user_id=rule.user_id,
+            category_id=rule.category_id,
+            words=words(rule.pattern),
+            anchored=rule.match_type == 'merchant',
+            priority=rule.priority,
+            min_amount=rule.min_amount,
+            max_amount=rule.max_amount,
+        )
+        for rule in rules
+    ]
+    compiled.sort(key=_rank)
+    return RuleAutomaton(compiled)
+
+
+_automaton = None
+_automaton_version = None
+_checked_at = 0.0
+
+
+def rules_version():
+    """Number of stored rules and when the latest one changed; any create, edit or delete moves it."""
+    summary = CategoryRule.objects.aggregate(count=Count('pk'), changed=Max('updated_at'))
+    return summary['count'], summary['changed']
+
+
+def invalidate_rules():
+    """Make this process rebuild its automaton; other processes notice the change from rules_version."""
+    global _automaton
+    _automaton = None
+
+
+def get_automaton():
+    """Return this process's automaton, rebuilding it if the rules changed."""
+    global _automaton, _automaton_version, _checked_at
+
+    now = time.monotonic()
+    if _automaton is not None and now - _checked_at < RULES_CHECK_INTERVAL:
+        return _automaton
+
+    version = rules_version()
+    if _automaton is None or version != _automaton_version:
+        _automaton = compile_rules()
+        _automaton_version = version
+    _checked_at = now
+    return _automaton
+
+
+def categorize(description, amount, user_id):
+    """Return the category id the rules assign to one expense, or None."""
+    automaton = get_automaton()
+    return automaton.best(automaton.candidates(description), user_id, amount)
+
+
+def categorize_many(user_id, expenses):
+    """
+    Return the category ids the rules assign to many (description, amount) pairs of one user.
+
+    Repeated descriptions, common in statements, are matched once.
+    """
+    automaton = get_automaton()
+    seen = {}
+    categories = []
+    for description, amount in expenses:
+        candidates = seen.get(description)
+        if candidates is None:
+            candidates = seen[description] = automaton.candidates(description)
+        categories.append(automaton.best(candidates, user_id, amount))
+    return categories
+
+
+def categorize_uncategorized(user_ids=None, chunk_size=5000):
+    """
+    Apply the rules to existing expenses without a category and return how many were categorized.
+
+    Assignments are written with one UPDATE per category and chunk, which
+    skips the save signals, so the rollups, spending statistics and
+    analytics columns of the affected users are rebuilt afterwards and
+    expenses_bulk_updated is sent for them.
+    """
+    expenses = Expense.objects.filter(category__isnull=True)
+    if user_ids:
+        expenses = expenses.filter(user_id__in=user_ids)
+
+    categorized = 0
+    affected = set()
+    with transaction.atomic():
+        rows = (
+            expenses
+            .order_by('user_id', 'pk')
+            .values_list('pk', 'user_id', 'description', 'amount')
+            .iterator(chunk_size=chunk_size)
+        )
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                categorized += _categorize_chunk(chunk, affected)
+                chunk = []
+        categorized += _categorize_chunk(chunk, affected)
+
+        if affected:
+            # Imported here: the signals module imports this one
+            from .signals import expenses_bulk_updated
+
+            rebuild_rollups(user_ids=sorted(affected))
+            rebuild_spending_stats(user_ids=sorted(affected))
+            transaction.on_commit(lambda: [invalidate_columns(user_id) for user_id in affected])
+            expenses_bulk_updated.send(sender=Expense, user_ids=sorted(affected))
+
+    return categorized
+
+
+def _categorize_chunk(chunk, affected):
+    assigned = defaultdict(list)
+    for user_id, rows in groupby(chunk, key=lambda row: row[1]):
+        rows = list(rows)
+        categories = categorize_many(user_id, ((description, amount) for _, _, description, amount in rows))
+        for (pk, _, _, _), category_id in zip(rows, categories):
+            if category_id is not None:
+                assigned[category_id].append(pk)
+                affected.add(user_id)
+
+    for category_id, pks in assigned.items():
+        Expense.objects.filter(pk__in=pks).update(category_id=category_id)
+    return sum(len(pks) for pks in assigned.values())
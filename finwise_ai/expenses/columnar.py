@@ -0,0 +1,305 @@
+"""
+Columnar on-disk cache of each user's expenses for analytics.
+
+A user's expenses are stored as fixed-width column files: id (int64), date as
+days since 1970-01-01 (int32), amount in integer cents (int64) and category
+id (int32, -1 for uncategorized). Readers memory-map the columns, so the
+analytics page works on compact arrays served from the page cache instead
+of materializing model rows.
+
+New expenses are appended once their transaction commits. Edits, deletes
+and bulk writes drop the user's store, which is rebuilt from the database in
+one streaming pass on the next read. A small meta.json names the current
+generation of column files and how many rows are committed; it is replaced
+atomically, so readers never see a half-written append or rebuild.
+"""
+import calendar
+import json
+import os
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+from .models import Expense, ExpenseCategory
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no flock; msvcrt locks a byte range of the lock file instead
+    fcntl = None
+    import msvcrt
+
+COLUMNS = {
+    'pk': np.dtype('<i8'),
+    'day': np.dtype('<i4'),
+    'cents': np.dtype('<i8'),
+    'category': np.dtype('<i4'),
+}
+
+EPOCH = date(1970, 1, 1)
+UNCATEGORIZED = -1
+
+# Rows read from the database per chunk while rebuilding
+REBUILD_CHUNK_SIZE = 5000
+
+
+@dataclass
+class ExpenseColumns:
+    """Read-only column arrays of one user's expenses, in no particular order."""
+
+    pk: np.ndarray
+    day: np.ndarray
+    cents: np.ndarray
+    category: np.ndarray
+
+    def __len__(self):
+        return len(self.pk)
+
+
+def _user_dir(user_id):
+    return Path(settings.EXPENSE_COLUMNS_DIR) / str(user_id)
+
+
+def _column_path(directory, name, generation):
+    return directory / f'{name}.{generation}.bin'
+
+
+def _read_meta(directory):
+    try:
+        with open(directory / 'meta.json') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_meta(directory, meta):
+    tmp = directory / 'meta.json.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, directory / 'meta.json')
+
+
+def _lock_file(lock):
+    if fcntl is not None:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            # Gives up after about ten seconds, so keep waiting
+            msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def _unlock_file(lock):
+    if fcntl is not None:
+        fcntl.flock(lock, fcntl.LOCK_UN)
+    else:
+        lock.seek(0)
+        msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def _locked(directory):
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / 'lock', 'w') as lock:
+        _lock_file(lock)
+        try:
+            yield
+        finally:
+            _unlock_file(lock)
+
+
+def _to_columns(rows):
+    """Convert (pk, date, amount, category_id) tuples to column arrays."""
+    return {
+        'pk': np.fromiter((row[0] for row in rows), COLUMNS['pk'], len(rows)),
+        'day': np.fromiter((row[1].toordinal() - EPOCH.toordinal() for row in rows), COLUMNS['day'], len(rows)),
+        'cents': np.fromiter((int(Decimal(row[2]).scaleb(2)) for row in rows), COLUMNS['cents'], len(rows)),
+        'category': np.fromiter(
+            (UNCATEGORIZED if row[3] is None else row[3] for row in rows), COLUMNS['category'], len(rows)
+        ),
+    }
+
+
+def _append(directory, meta, rows):
+    columns = _to_columns(rows)
+    for name, values in columns.items():
+        path = _column_path(directory, name, meta['generation'])
+        with open(path, 'r+b' if path.exists() else 'wb') as f:
+            # Overwrite anything past the committed rows left by an interrupted append
+            f.seek(meta['rows'] * COLUMNS[name].itemsize)
+            f.write(values.tobytes())
+            f.truncate()
+    meta['rows'] += len(rows)
+
+
+def rebuild_columns(user_id, if_missing=False):
+    """Write a fresh generation of a user's columns from the database and return its row count."""
+    directory = _user_dir(user_id)
+    with _locked(directory):
+        previous = _read_meta(directory)
+        if if_missing and previous is not None:
+            # Another process rebuilt the store while this one waited for the lock
+            return previous['rows']
+        meta = {'generation': (previous['generation'] + 1) if previous else 1, 'rows': 0}
+
+        rows = (
+            Expense.objects
+            .filter(user_id=user_id)
+            .order_by()
+            .values_list('pk', 'date', 'amount', 'category_id')
+            .iterator(chunk_size=REBUILD_CHUNK_SIZE)
+        )
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= REBUILD_CHUNK_SIZE:
+                _append(directory, meta, chunk)
+                chunk = []
+        _append(directory, meta, chunk)
+
+        _write_meta(directory, meta)
+
+        # Readers still mapping the old generation keep their open files
+        for path in directory.glob('*.bin'):
+            if not path.name.endswith(f'.{meta["generation"]}.bin'):
+                path.unlink(missing_ok=True)
+
+    return meta['rows']
+
+
+def append_expenses(user_id, rows):
+    """Append (pk, date, amount, category_id) rows to a user's store, if one exists."""
+    directory = _user_dir(user_id)
+    if not rows or not directory.exists():
+        return
+
+    # Waits for a rebuild in progress, whose snapshot may or may not include the rows
+    with _locked(directory):
+        meta = _read_meta(directory)
+        if meta is None:
+            return
+        if meta['rows']:
+            stored = np.memmap(
+                _column_path(directory, 'pk', meta['generation']), dtype=COLUMNS['pk'], mode='r',
+                shape=(meta['rows'],)
+            )
+            present = set(stored[np.isin(stored, [row[0] for row in rows])].tolist())
+            rows = [row for row in rows if row[0] not in present]
+        if rows:
+            _append(directory, meta, rows)
+            _write_meta(directory, meta)
+
+
+def invalidate_columns(user_id):
+    """Drop a user's store so the next read rebuilds it."""
+    directory = _user_dir(user_id)
+    if not (directory / 'meta.json').exists():
+        return
+
+    with _locked(directory):
+        (directory / 'meta.json').unlink(missing_ok=True)
+
+
+def _map_columns(directory, meta):
+    arrays = {}
+    for name, dtype in COLUMNS.items():
+        if meta['rows'] == 0:
+            arrays[name] = np.empty(0, dtype)
+        else:
+            arrays[name] = np.memmap(
+                _column_path(directory, name, meta['generation']), dtype=dtype, mode='r', shape=(meta['rows'],)
+            )
+    return ExpenseColumns(**arrays)
+
+
+def load_columns(user_id):
+    """Memory-map a user's columns, rebuilding the store first if it is missing."""
+    directory = _user_dir(user_id)
+    for _ in range(3):
+        meta = _read_meta(directory)
+        if meta is None:
+            rebuild_columns(user_id, if_missing=True)
+            meta = _read_meta(directory)
+        try:
+            return _map_columns(directory, meta)
+        except (FileNotFoundError, TypeError):
+            # A rebuild replaced the generation between reading meta and opening its files
+            continue
+    raise RuntimeError(f'Expense columns for user {user_id} keep changing while being read')
+
+
+def _amount(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def expense_analytics_data(user_id, largest=10):
+    """
+    Compute the expense analytics page for a user from the columnar store.
+
+    Returns None when the user has no expenses. Only the largest expenses
+    and the names of the categories present are read from the database.
+    """
+    columns = load_columns(user_id)
+    if not len(columns):
+        return None
+
+    # Monthly trend, oldest first
+    months = columns.day.astype('datetime64[D]').astype('datetime64[M]')
+    month_values, month_index = np.unique(months, return_inverse=True)
+    month_cents = np.bincount(month_index, weights=columns.cents).astype(np.int64)
+    monthly_trend = [
+        {'date': str(month), 'amount': _amount(cents)} for month, cents in zip(month_values, month_cents)
+    ]
+
+    # Category breakdown by name, largest first; uncategorized expenses are left out
+    category_values, category_index = np.unique(columns.category, return_inverse=True)
+    category_cents = np.bincount(category_index, weights=columns.cents).astype(np.int64)
+    names = dict(ExpenseCategory.objects.filter(pk__in=category_values.tolist()).values_list('pk', 'name'))
+    name_cents = defaultdict(int)
+    for category, cents in zip(category_values.tolist(), category_cents.tolist()):
+        if category in names:
+            name_cents[names[category]] += cents
+    category_breakdown = [
+        {'category__name': name, 'amount': _amount(cents)}
+        for name, cents in sorted(sorted(name_cents.items()), key=lambda item: -item[1])
+    ]
+
+    # Days with expenses, in alphabetical order; 1970-01-01 was a Thursday
+    weekdays = (columns.day.astype(np.int64) + 3) % 7
+    weekday_cents = np.bincount(weekdays, weights=columns.cents, minlength=7).astype(np.int64)
+    counts = np.bincount(weekdays, minlength=7)
+    day_of_week = sorted(
+        (
+            {'day_of_week': calendar.day_name[weekday], 'amount': _amount(weekday_cents[weekday])}
+            for weekday in range(7) if counts[weekday]
+        ),
+        key=lambda row: row['day_of_week'],
+    )
+
+    # Largest expenses: pick ids from the columns, then load just those rows
+    top = np.argpartition(-columns.cents, min(largest, len(columns)) - 1)[:largest]
+    top_pks = [int(pk) for pk in columns.pk[top]]
+    largest_expenses = list(
+        Expense.objects
+        .filter(pk__in=top_pks)
+        .order_by('-amount')
+        .values('date', 'amount', 'category__name', 'description')
+    )
+
+    total_cents = int(columns.cents.sum(dtype=np.int64))
+    return {
+        'monthly_trend': monthly_trend,
+        'category_breakdown': category_breakdown,
+        'day_of_week': day_of_week,
+        'largest_expenses': largest_expenses,
+        'total_expenses': _amount(total_cents),
+        'avg_monthly': _amount(total_cents) / len(month_values),
+        'num_transactions': len(columns),
+    }
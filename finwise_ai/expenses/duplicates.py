@@ -0,0 +1,122 @@
+"""
+Duplicate expense detection.
+
+Each expense stores a fingerprint of its date, amount and normalized
+description, indexed together with its owner. A single insert is checked
+with one index lookup, an import chunk with one IN query, and near
+duplicates (same amount and description a few days apart, as left by
+statements that post a charge on different dates) are found by one pass
+over the user's expenses ordered by amount rather than by comparing pairs.
+"""
+import hashlib
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from decimal import Decimal
+from .models import Expense
+
+# Days apart within which identical charges are reported as near duplicates
+NEAR_DUPLICATE_DAYS = 3
+
+# Fingerprints sent per IN query, below SQLite's bound parameter limit
+LOOKUP_BATCH_SIZE = 500
+
+WORD = re.compile(r'[^\W_]+')
+
+
+def normalize_description(description):
+    """Case-fold a description and keep only its words, so punctuation and spacing do not matter."""
+    return ' '.join(WORD.findall(unicodedata.normalize('NFKC', description or '').casefold()))
+
+
+def expense_fingerprint(expense_date, amount, description):
+    """Return the hex fingerprint of an expense's date, amount and description."""
+    amount = Decimal(str(amount)).quantize(Decimal('0.01'))
+    key = f'{expense_date.isoformat()}|{amount}|{normalize_description(description)}'
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+def fingerprint_of(expense):
+    return expense_fingerprint(expense.date, expense.amount, expense.description)
+
+
+def find_duplicate(user_id, expense_date, amount, description, exclude_pk=None):
+    """Return an existing expense of the user with the same fingerprint, or None."""
+    duplicates = Expense.objects.filter(
+        user_id=user_id, fingerprint=expense_fingerprint(expense_date, amount, description)
+    )
+    if exclude_pk is not None:
+        duplicates = duplicates.exclude(pk=exclude_pk)
+    return duplicates.order_by('pk').first()
+
+
+def existing_fingerprints(user_id, fingerprints):
+    """Return which of the fingerprints the user's stored expenses already have."""
+    fingerprints = list(set(fingerprints))
+    found = set()
+    for start in range(0, len(fingerprints), LOOKUP_BATCH_SIZE):
+        found.update(
+            Expense.objects
+            .filter(user_id=user_id, fingerprint__in=fingerprints[start:start + LOOKUP_BATCH_SIZE])
+            .values_list('fingerprint', flat=True)
+        )
+    return found
+
+
+@dataclass
+class DuplicateGroup:
+    """Expenses with the same amount and description, each within the window of the previous one."""
+
+    amount: Decimal
+    description: str
+    expenses: list = field(default_factory=list)  # (date, pk), oldest first
+
+    @property
+    def pks(self):
+        return [pk for _, pk in self.expenses]
+
+
+def _clusters(amount, dated, days):
+    for description, entries in dated.items():
+        entries.sort()
+        group = DuplicateGroup(amount, description, [entries[0]])
+        for entry in entries[1:]:
+            if (entry[0] - group.expenses[-1][0]).days <= days:
+                group.expenses.append(entry)
+                continue
+            if len(group.expenses) > 1:
+                yield group
+            group = DuplicateGroup(amount, description, [entry])
+        if len(group.expenses) > 1:
+            yield group
+
+
+def near_duplicate_groups(user_id, days=NEAR_DUPLICATE_DAYS, start_date=None, end_date=None, chunk_size=5000):
+    """
+    Return groups of a user's expenses that look like duplicates of each other.
+
+    Expenses are streamed ordered by amount, so only the expenses sharing
+    one amount are held at a time; within an amount they are grouped by
+    normalized description and split wherever consecutive dates are more
+    than days apart.
+    """
+    expenses = Expense.objects.filter(user_id=user_id)
+    if start_date:
+        expenses = expenses.filter(date__gte=start_date)
+    if end_date:
+        expenses = expenses.filter(date__lte=end_date)
+
+    groups = []
+    current_amount, dated = None, {}
+    for pk, expense_date, amount, description in (
+        expenses.order_by('amount').values_list('pk', 'date', 'amount', 'description').iterator(chunk_size=chunk_size)
+    ):
+        if amount != current_amount:
+            groups.extend(_clusters(current_amount, dated, days))
+            current_amount, dated = amount, {}
+        dated.setdefault(normalize_description(description), []).append((expense_date, pk))
+    groups.extend(_clusters(current_amount, dated, days))
+
+    groups.sort(key=lambda group: group.expenses[0])
+    return groups
+
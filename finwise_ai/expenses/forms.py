@@ -1,4 +1,5 @@
 from django import forms
+from .duplicates import find_duplicate
 from .models import ExpenseCategory, Expense, RecurringExpense
 
 class ExpenseCategoryForm(forms.ModelForm):
@@ -17,6 +18,12 @@ class ExpenseCategoryForm(forms.ModelForm):
 class ExpenseForm(forms.ModelForm):
     """Form for creating and editing expenses."""
     
+    allow_duplicate = forms.BooleanField(
+        required=False,
+        label='Save even if the same expense is already recorded',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+    
     class Meta:
         model = Expense
         fields = ['category', 'amount', 'description', 'date', 'recurrence', 'recurrence_end_date', 'notes']
@@ -33,6 +40,7 @@ class ExpenseForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
+        self.user = user
         
         # Only show categories available to this user
         if user:
@@ -42,6 +50,25 @@ class ExpenseForm(forms.ModelForm):
         
         # Make recurrence end date only required if recurrence is not 'none'
         self.fields['recurrence_end_date'].required = False
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        
+        # Catch double submits and re-entered expenses with one indexed lookup
+        if self.user and not cleaned_data.get('allow_duplicate') and all(
+            cleaned_data.get(name) is not None for name in ('date', 'amount', 'description')
+        ):
+            duplicate = find_duplicate(
+                self.user.pk, cleaned_data['date'], cleaned_data['amount'], cleaned_data['description'],
+                exclude_pk=self.instance.pk
+            )
+            if duplicate is not None:
+                raise forms.ValidationError(
+                    f'This expense is already recorded ({duplicate.description}, {duplicate.amount} on '
+                    f'{duplicate.date:%Y-%m-%d}). Tick the box to save it anyway.'
+                )
+        
+        return cleaned_data
 
 
 class ExpenseFilterForm(forms.Form):
@@ -94,3 +121,35 @@ class RecurringExpenseForm(forms.ModelForm):
             'date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
             'is_paid': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
+
+
+class ExpenseImportForm(forms.Form):
+    """Form for uploading a CSV or OFX statement to import."""
+    
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('ofx', 'OFX / QFX'),
+    ]
+    
+    file = forms.FileField(widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.ofx,.qfx'}))
+    file_format = forms.ChoiceField(
+        choices=FORMAT_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        help_text='Detected from the file extension when left empty.'
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        upload = cleaned_data.get('file')
+        
+        if upload and not cleaned_data.get('file_format'):
+            extension = upload.name.rsplit('.', 1)[-1].lower()
+            if extension == 'csv':
+                cleaned_data['file_format'] = 'csv'
+            elif extension in ('ofx', 'qfx'):
+                cleaned_data['file_format'] = 'ofx'
+            else:
+                raise forms.ValidationError('Choose the file format; it could not be detected from the file name.')
+        
+        return cleaned_data
@@ -0,0 +1,46 @@
+from datetime import timedelta
+from finwise.query_plans import TEMP_SORT, hot_query
+from .anomalies import LOOKBACK_DAYS
+from .models import AnomalyDetection, Expense, MonthlyExpenseRollup
+from .pagination import DEFAULT_PAGE_SIZE
+from .recurrence import RECURRING
+
+
+@hot_query('expenses.list_page')
+def list_page(user, today):
+    return Expense.objects.filter(user=user).order_by('-date', '-pk')[:DEFAULT_PAGE_SIZE + 1]
+
+
+@hot_query('expenses.latest')
+def latest(user, today):
+    return Expense.objects.filter(user=user).order_by('-date')[:10]
+
+
+@hot_query('expenses.flagged')
+def flagged(user, today):
+    return Expense.objects.filter(user=user, is_flagged=True).order_by('-date')[:5]
+
+
+@hot_query('expenses.category_window')
+def category_window(user, today):
+    return Expense.objects.filter(
+        user=user, category_id=1, date__gte=today - timedelta(days=LOOKBACK_DAYS)
+    ).order_by('date')
+
+
+@hot_query('expenses.recurring_parents')
+def recurring_parents(user, today):
+    return Expense.objects.filter(user=user, recurrence__in=RECURRING, date__lte=today)
+
+
+@hot_query('expenses.unreviewed_anomalies')
+def unreviewed_anomalies(user, today):
+    return AnomalyDetection.objects.filter(user=user, is_reviewed=False).order_by('-created_at')
+
+
+# Grouping by month over a (user, month, category) index still sorts the few groups
+@hot_query('expenses.monthly_totals', allow=(TEMP_SORT,))
+def monthly_totals(user, today):
+    return MonthlyExpenseRollup.objects.filter(
+        user=user, month__gte=today.replace(day=1) - timedelta(days=180), month__lte=today
+    ).values('month').order_by('month')
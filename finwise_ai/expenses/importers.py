@@ -0,0 +1,325 @@
+"""
+Streaming bulk import of expenses from CSV and OFX statements.
+
+Files are read row by row and written in chunks, each in its own
+transaction, so memory stays bounded by the chunk size rather than the file
+size. Categories are resolved per chunk, rows without a known category are
+categorized by the category rules, rows already stored are skipped by
+fingerprint, monthly rollups and running statistics are updated once per
+bucket and anomaly detection runs as one batched pass after the last chunk.
+
+CSV amounts are read as positive expenses unless the file signs them: a
+file with any negative amount is a signed statement, whose negative rows
+are the debits imported and whose positive rows (salary, refunds) are
+credits that are skipped.
+"""
+import csv
+import io
+import re
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.db.models.functions import Lower
+from .anomalies import detect_anomalies_batch
+from .categorizer import categorize_many
+from .duplicates import existing_fingerprints, fingerprint_of
+from .models import CategorySpendingStats, Expense, ExpenseCategory
+from .rollups import apply_expense_delta, month_start
+from .signals import expenses_bulk_created
+from .stats import add_value, merge, update_stats
+
+DATE_FORMATS = ('%m/%d/%Y', '%d.%m.%Y', '%Y%m%d')
+
+# Accepted CSV header names for each expense field
+CSV_COLUMNS = {
+    'date': ('date', 'transaction date', 'posted date'),
+    'amount': ('amount', 'debit', 'value'),
+    'description': ('description', 'payee', 'name', 'merchant'),
+    'category': ('category',),
+    'notes': ('notes', 'memo'),
+}
+
+MAX_REPORTED_ERRORS = 100
+
+# Expense.amount holds 12 digits, 2 of them decimals
+MAX_AMOUNT = Decimal('1e10')
+
+OFX_FIELD = re.compile(r'<(DTPOSTED|TRNAMT|NAME|MEMO)>([^<\r\n]*)', re.IGNORECASE)
+
+
+class ImportFormatError(ValueError):
+    """Raised when a file cannot be read as the requested format."""
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    skipped: int = 0
+    duplicates: int = 0
+    credits: int = 0
+    flagged: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, row, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f'Row {row}: {message}')
+
+
+def parse_date(value):
+    value = value.strip()
+    try:
+        # Fast path for ISO dates, by far the most common in exports
+        return date.fromisoformat(value)
+    except ValueError:
+        pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f'unrecognized date "{value}"')
+
+
+def parse_amount(value):
+    """Parse an amount such as '1,234.50', '$12' or '(12.00)'."""
+    cleaned = re.sub(r'[^\d.\-()]', '', value or '')
+    if cleaned.startswith('(') and cleaned.endswith(')'):
+        cleaned = '-' + cleaned[1:-1]
+    try:
+        return Decimal(cleaned)
+    except InvalidOperation:
+        raise ValueError(f'invalid amount "{value}"')
+
+
+def iter_csv_rows(stream):
+    """Yield (line number, fields) from a CSV text stream with a header row."""
+    reader = csv.reader(stream)
+    try:
+        header = [name.strip().lower() for name in next(reader)]
+    except StopIteration:
+        return
+
+    columns = {}
+    for name, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in header:
+                columns[name] = header.index(alias)
+                break
+
+    missing = {'date', 'amount', 'description'} - set(columns)
+    if missing:
+        raise ImportFormatError(f'Missing required columns: {", ".join(sorted(missing))}')
+
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        yield reader.line_num, {
+            name: values[index].strip() if index < len(values) else ''
+            for name, index in columns.items()
+        }
+
+
+def iter_ofx_rows(stream):
+    """
+    Yield (row, fields) for each transaction in an OFX statement.
+
+    Handles both SGML (OFX 1.x, unclosed leaf tags) and XML (OFX 2.x) files,
+    with or without line breaks, by cutting the stream at each </STMTTRN>.
+    Statement amounts are signed, so only debits are yielded, as positive
+    expense amounts.
+    """
+    buffer = ''
+    number = 0
+    for line in stream:
+        buffer += line
+        while True:
+            end = buffer.upper().find('</STMTTRN>')
+            if end < 0:
+                break
+            block, buffer = buffer[:end], buffer[end + len('</STMTTRN>'):]
+            number += 1
+
+            fields = {tag.upper(): value.strip() for tag, value in OFX_FIELD.findall(block)}
+            amount = fields.get('TRNAMT', '')
+            if not amount.startswith('-'):
+                continue
+            yield number, {
+                'date': fields.get('DTPOSTED', '')[:8],
+                'amount': amount[1:],
+                'description': fields.get('NAME') or fields.get('MEMO', ''),
+                'notes': fields.get('MEMO', ''),
+            }
+
+        # Keep only the open transaction, if any, between reads
+        start = buffer.upper().rfind('<STMTTRN>')
+        buffer = buffer[start:] if start >= 0 else ''
+
+
+def text_stream(file):
+    """Wrap an uploaded or opened binary file for streaming text reads."""
+    return io.TextIOWrapper(getattr(file, 'file', file), encoding='utf-8-sig', errors='replace', newline='')
+
+
+def csv_debits_negative(file):
+    """Whether a CSV file signs debits negative, i.e. has any negative amount; rewinds the file."""
+    stream = text_stream(file)
+    try:
+        for _, fields in iter_csv_rows(stream):
+            try:
+                if parse_amount(fields['amount']) < 0:
+                    return True
+            except ValueError:
+                continue
+        return False
+    finally:
+        # Leave the binary file open for the import itself
+        stream.detach()
+        getattr(file, 'file', file).seek(0)
+
+
+class ExpenseImporter:
+    """Imports a stream of parsed rows for one user in chunked transactions."""
+
+    def __init__(self, user, chunk_size=2000, skip_duplicates=True, debits_negative=False):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.skip_duplicates = skip_duplicates
+        self.debits_negative = debits_negative
+        self.result = ImportResult()
+        self.created_ids = array('q')
+        self._categories = {}
+        # Fingerprints written by this import, which may legitimately repeat within one file
+        self._imported = set()
+
+    def run(self, rows):
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                self._import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._import_chunk(chunk)
+
+        if self.created_ids:
+            expenses_bulk_created.send(sender=Expense, user_id=self.user.pk)
+            self.result.flagged = detect_anomalies_batch(self.user, self.created_ids)
+
+        return self.result
+
+    def _resolve_categories(self, names):
+        """Map category names to ids case-insensitively, one query per chunk for unseen names."""
+        unseen = {name.lower() for name in names if name} - set(self._categories)
+        if unseen:
+            for category_id, name in (
+                ExpenseCategory.objects
+                .annotate(lower_name=Lower('name'))
+                .filter(lower_name__in=unseen)
+                .order_by('pk')
+                .values_list('pk', 'lower_name')
+            ):
+                self._categories.setdefault(name, category_id)
+            for name in unseen:
+                self._categories.setdefault(name, None)
+
+    def _import_chunk(self, chunk):
+        self._resolve_categories(fields.get('category', '') for _, fields in chunk)
+
+        expenses = []
+        for row, fields in chunk:
+            try:
+                amount = parse_amount(fields['amount'])
+                if self.debits_negative:
+                    # Positive rows of a signed statement are money coming in
+                    if amount > 0:
+                        self.result.credits += 1
+                        continue
+                    amount = -amount
+                if amount <= 0 or amount >= MAX_AMOUNT:
+                    raise ValueError(f'amount {amount} is out of range')
+                expense_date = parse_date(fields['date'])
+                description = fields['description'][:255]
+                if not description:
+                    raise ValueError('description is required')
+            except ValueError as e:
+                self.result.add_error(row, str(e))
+                continue
+
+            expenses.append(Expense(
+                user=self.user,
+                category_id=self._categories.get(fields.get('category', '').lower()),
+                amount=amount.quantize(Decimal('0.01')),
+                description=description,
+                date=expense_date,
+                notes=fields.get('notes') or None
+            ))
+
+        for expense in expenses:
+            expense.fingerprint = fingerprint_of(expense)
+        if self.skip_duplicates and expenses:
+            # Rows already stored before this import, e.g. from importing the same statement twice
+            stored = existing_fingerprints(self.user.pk, (expense.fingerprint for expense in expenses)) - self._imported
+            if stored:
+                kept = [expense for expense in expenses if expense.fingerprint not in stored]
+                self.result.duplicates += len(expenses) - len(kept)
+                expenses = kept
+            self._imported.update(expense.fingerprint for expense in expenses)
+
+        # Expenses without a known category are categorized by the rules in one batch
+        uncategorized = [expense for expense in expenses if expense.category_id is None]
+        categories = categorize_many(
+            self.user.pk, ((expense.description, expense.amount) for expense in uncategorized)
+        )
+        for expense, category_id in zip(uncategorized, categories):
+            expense.category_id = category_id
+
+        # bulk_create skips the save signals, so rollups get one delta per bucket
+        buckets = defaultdict(lambda: [Decimal('0'), 0])
+        for expense in expenses:
+            bucket = buckets[(month_start(expense.date), expense.category_id)]
+            bucket[0] += expense.amount
+            bucket[1] += 1
+
+        # Running statistics are summarized per category and merged once each
+        stats = {}
+        for expense in expenses:
+            if expense.category_id not in stats:
+                stats[expense.category_id] = CategorySpendingStats()
+            add_value(stats[expense.category_id], expense.amount, expense.date)
+
+        with transaction.atomic():
+            Expense.objects.bulk_create(expenses)
+            for (month, category_id), (amount, count) in buckets.items():
+                apply_expense_delta(self.user.pk, month, category_id, amount, count)
+            for category_id, partial in stats.items():
+                update_stats(self.user.pk, category_id, lambda stored: merge(stored, partial))
+
+        self.created_ids.extend(expense.pk for expense in expenses)
+        self.result.created += len(expenses)
+
+
+def import_expenses(user, file, file_format, chunk_size=2000, skip_duplicates=True, debits_negative=None):
+    """
+    Import a CSV or OFX file of expenses for a user, skipping rows already stored unless told otherwise.
+
+    debits_negative says whether CSV amounts are signed with debits negative;
+    by default it is detected with a first pass over the file. OFX rows
+    arrive as debits already.
+    """
+    if file_format == 'csv':
+        if debits_negative is None:
+            debits_negative = csv_debits_negative(file)
+        rows = iter_csv_rows(text_stream(file))
+    elif file_format == 'ofx':
+        debits_negative = False
+        rows = iter_ofx_rows(text_stream(file))
+    else:
+        raise ImportFormatError(f'Unsupported format: {file_format}')
+
+    importer = ExpenseImporter(user, chunk_size=chunk_size, skip_duplicates=skip_duplicates,
+                               debits_negative=debits_negative)
+    return importer.run(rows)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from expenses.categorizer import categorize_uncategorized
+
+
+class Command(BaseCommand):
+    help = 'Applies the category rules to existing expenses that have no category'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only categorize expenses of this user id (can be repeated)')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Number of expenses read per chunk')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Categorizing uncategorized expenses...')
+        
+        categorized = categorize_uncategorized(user_ids=options['user_ids'], chunk_size=options['chunk_size'])
+        
+        self.stdout.write(self.style.SUCCESS(f'Categorized {categorized} expenses'))
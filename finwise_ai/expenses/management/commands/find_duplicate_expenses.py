@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.duplicates import NEAR_DUPLICATE_DAYS, near_duplicate_groups
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Lists groups of expenses with the same amount and description recorded a few days apart'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only check expenses of this user id (can be repeated)')
+        parser.add_argument('--days', type=int, default=NEAR_DUPLICATE_DAYS,
+                            help='Maximum number of days between two expenses of a group')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError('--days must not be negative')
+        
+        users = User.objects.order_by('pk')
+        if options['user_ids']:
+            users = users.filter(pk__in=options['user_ids'])
+        
+        found = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            for group in near_duplicate_groups(user_id, days=options['days']):
+                found += 1
+                dates = ', '.join(f'{expense_date:%Y-%m-%d} (#{pk})' for expense_date, pk in group.expenses)
+                self.stdout.write(f'User {user_id}: {group.amount} "{group.description}" on {dates}')
+        
+        self.stdout.write(self.style.SUCCESS(f'Found {found} groups of possible duplicates'))
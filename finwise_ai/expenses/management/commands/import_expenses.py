@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.importers import ImportFormatError, import_expenses
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Imports expenses for a user from a CSV or OFX statement'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path of the statement file')
+        parser.add_argument('--user', type=int, required=True, dest='user_id',
+                            help='Id of the user the expenses belong to')
+        parser.add_argument('--format', choices=['csv', 'ofx'],
+                            help='File format (detected from the extension by default)')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Number of expenses written per transaction')
+        parser.add_argument('--keep-duplicates', action='store_true',
+                            help='Import rows even if the same expense is already stored')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(pk=options['user_id'])
+        except User.DoesNotExist:
+            raise CommandError(f'User {options["user_id"]} does not exist')
+        
+        file_format = options['format'] or ('ofx' if options['path'].lower().endswith(('.ofx', '.qfx')) else 'csv')
+        
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_expenses(
+                    user, file, file_format, chunk_size=options['chunk_size'],
+                    skip_duplicates=not options['keep_duplicates']
+                )
+        except (OSError, ImportFormatError) as e:
+            raise CommandError(str(e))
+        
+        for error in result.errors:
+            self.stdout.write(self.style.WARNING(error))
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created} expenses, skipped {result.skipped} invalid, {result.duplicates} duplicate and '
+            f'{result.credits} credit rows, flagged {result.flagged}'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from expenses.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the monthly expense rollup table from raw expenses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only rebuild rollups for this user id (can be repeated)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of rollup rows inserted per batch')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding monthly expense rollups...')
+        
+        created = rebuild_rollups(user_ids=options['user_ids'], batch_size=options['batch_size'])
+        
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} rollup rows'))
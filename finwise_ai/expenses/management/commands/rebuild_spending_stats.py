@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from expenses.stats import rebuild_spending_stats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the running per-category spending statistics exactly from raw expenses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only rebuild statistics for this user id (can be repeated)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of statistics rows inserted per batch')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding spending statistics...')
+        
+        created = rebuild_spending_stats(user_ids=options['user_ids'], batch_size=options['batch_size'])
+        
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} statistics rows'))
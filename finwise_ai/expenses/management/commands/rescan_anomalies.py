@@ -0,0 +1,92 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from expenses.anomalies import LOOKBACK_DAYS, MIN_HISTORY, SPIKE_STD_DEVIATIONS, rescan_partition
+from expenses.models import AnomalyRescan
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Re-runs spike detection over all expenses with vectorized rolling scores, in parallel user partitions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--method', choices=['zscore', 'mad'], default='zscore',
+                            help='Rolling z-score or robust median absolute deviation score')
+        parser.add_argument('--threshold', type=float, default=SPIKE_STD_DEVIATIONS,
+                            help='Score above which an expense is flagged')
+        parser.add_argument('--window-days', type=int, default=LOOKBACK_DAYS,
+                            help='Length of the history window before each expense')
+        parser.add_argument('--min-history', type=int, default=MIN_HISTORY,
+                            help='Earlier expenses in the window needed before scoring')
+        parser.add_argument('--partition-size', type=int, default=200,
+                            help='Number of users scored per partition')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of worker processes (1 runs partitions in this process)')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue the latest unfinished rescan with the same settings')
+
+    def handle(self, *args, **options):
+        params = {name: options[name] for name in ('method', 'threshold', 'window_days', 'min_history')}
+        
+        rescan = None
+        if options['resume']:
+            rescan = AnomalyRescan.objects.filter(finished_at__isnull=True, **params).first()
+            if rescan is None:
+                raise CommandError('No unfinished rescan with these settings to resume')
+            self.stdout.write(f'Resuming after user {rescan.last_user_id}...')
+        else:
+            rescan = AnomalyRescan.objects.create(**params)
+        
+        partitions = self.partitions(rescan.last_user_id, options['partition_size'])
+        started = time.monotonic()
+        rows = 0
+        
+        if options['workers'] > 1:
+            # Forked workers inherit the configured app registry and open their own connections
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=options['workers'], mp_context=context) as pool:
+                # Results are consumed in submission order so the checkpoint only covers finished users
+                results = pool.map(rescan_partition, partitions, *self.repeat(params, len(partitions)))
+                for user_ids, result in zip(partitions, results):
+                    rows += self.checkpoint(rescan, user_ids, result, rows, started)
+        else:
+            for user_ids in partitions:
+                result = rescan_partition(user_ids, **params)
+                rows += self.checkpoint(rescan, user_ids, result, rows, started)
+        
+        rescan.finished_at = timezone.now()
+        rescan.save(update_fields=['finished_at'])
+        
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Scanned {rows} expenses in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:.0f} rows/s), '
+            f'{rescan.anomalies_found} anomalies in total'
+        ))
+
+    def partitions(self, after_user_id, size):
+        user_ids = list(User.objects.filter(pk__gt=after_user_id).order_by('pk').values_list('pk', flat=True))
+        return [user_ids[start:start + size] for start in range(0, len(user_ids), size)]
+
+    def repeat(self, params, count):
+        return [[params[name]] * count for name in ('method', 'threshold', 'window_days', 'min_history')]
+
+    def checkpoint(self, rescan, user_ids, result, rows_before, started):
+        rows, anomalies = result
+        rescan.last_user_id = user_ids[-1]
+        rescan.rows_scanned += rows
+        rescan.anomalies_found += anomalies
+        rescan.save(update_fields=['last_user_id', 'rows_scanned', 'anomalies_found'])
+        
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Users up to {user_ids[-1]}: {rows_before + rows} expenses, '
+            f'{(rows_before + rows) / elapsed if elapsed else 0:.0f} rows/s'
+        )
+        return rows
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0002_monthlyexpenserollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategorySpendingStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('mean', models.FloatField(default=0)),
+                ('m2', models.FloatField(default=0)),
+                ('decayed_weight', models.FloatField(default=0)),
+                ('decayed_mean', models.FloatField(default=0)),
+                ('decayed_m2', models.FloatField(default=0)),
+                ('decay_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='spending_stats', to='expenses.expensecategory')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Category Spending Stats',
+                'verbose_name_plural': 'Category Spending Stats',
+                'unique_together': {('user', 'category')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0003_categoryspendingstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnomalyRescan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(choices=[('zscore', 'Rolling z-score'), ('mad', 'Rolling median absolute deviation')], default='zscore', max_length=10)),
+                ('threshold', models.FloatField()),
+                ('window_days', models.IntegerField()),
+                ('min_history', models.IntegerField()),
+                ('last_user_id', models.BigIntegerField(default=0)),
+                ('rows_scanned', models.BigIntegerField(default=0)),
+                ('anomalies_found', models.IntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Anomaly Rescan',
+                'verbose_name_plural': 'Anomaly Rescans',
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
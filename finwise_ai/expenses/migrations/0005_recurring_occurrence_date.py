@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:06
+
+from django.db import migrations, models
+
+
+def keep_only_exceptions(apps, schema_editor):
+    """Drop eagerly created occurrences that only repeat the rule; key the rest by their date."""
+    RecurringExpense = apps.get_model('expenses', 'RecurringExpense')
+
+    RecurringExpense.objects.filter(is_paid=False, is_modified=False).delete()
+
+    seen = set()
+    for instance in RecurringExpense.objects.order_by('pk'):
+        key = (instance.parent_expense_id, instance.date)
+        if key in seen:
+            continue
+        seen.add(key)
+        instance.occurrence_date = instance.date
+        instance.save(update_fields=['occurrence_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0004_anomalyrescan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recurringexpense',
+            name='occurrence_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(keep_only_exceptions, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='recurringexpense',
+            unique_together={('parent_expense', 'occurrence_date')},
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0005_recurring_occurrence_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', '-date', '-id'], name='expense_user_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:02
+
+from django.db import migrations
+
+# A frozen copy of the index definitions in expenses.search at the time of this migration
+FTS_TABLE = 'expenses_expense_fts'
+
+SQLITE_STATEMENTS = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        user_id, description, notes,
+        content='expenses_expense', content_rowid='id', tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3 4'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, user_id, description, notes)
+        VALUES (new.id, new.user_id, new.description, new.notes);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, user_id, description, notes)
+        VALUES ('delete', old.id, old.user_id, old.description, old.notes);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF user_id, description, notes
+    ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, user_id, description, notes)
+        VALUES ('delete', old.id, old.user_id, old.description, old.notes);
+        INSERT INTO {FTS_TABLE}(rowid, user_id, description, notes)
+        VALUES (new.id, new.user_id, new.description, new.notes);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_UNDO_STATEMENTS = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_update',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+POSTGRES_STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS expense_search_idx ON expenses_expense "
+    "USING GIN (to_tsvector('simple', coalesce(description, '') || ' ' || coalesce(notes, '')))",
+]
+
+POSTGRES_UNDO_STATEMENTS = ['DROP INDEX IF EXISTS expense_search_idx']
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        # Other databases search with icontains and need no index
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0006_expense_keyset_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_STATEMENTS, 'postgresql': POSTGRES_STATEMENTS}),
+            run_for_vendor({'sqlite': SQLITE_UNDO_STATEMENTS, 'postgresql': POSTGRES_UNDO_STATEMENTS}),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0007_expense_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='anomalydetection',
+            index=models.Index(fields=['user', '-created_at'], name='anomaly_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0008_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pattern', models.CharField(blank=True, max_length=255)),
+                ('match_type', models.CharField(choices=[('keyword', 'Keyword anywhere in the description'), ('merchant', 'Merchant at the start of the description')], default='keyword', max_length=10)),
+                ('min_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('max_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('priority', models.IntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rules', to='expenses.expensecategory')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='category_rules', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Category Rule',
+                'verbose_name_plural': 'Category Rules',
+                'ordering': ['-priority', 'pk'],
+            },
+        ),
+    ]
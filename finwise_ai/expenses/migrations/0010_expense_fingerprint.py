@@ -0,0 +1,52 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:30
+
+import hashlib
+import re
+import unicodedata
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+
+# A frozen copy of expenses.duplicates.expense_fingerprint at the time of this migration
+WORD = re.compile(r'[^\W_]+')
+
+
+def expense_fingerprint(expense_date, amount, description):
+    words = ' '.join(WORD.findall(unicodedata.normalize('NFKC', description or '').casefold()))
+    key = f'{expense_date.isoformat()}|{Decimal(str(amount)).quantize(Decimal("0.01"))}|{words}'
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+def fill_fingerprints(apps, schema_editor):
+    """Fingerprint the expenses recorded before duplicate detection existed."""
+    Expense = apps.get_model('expenses', 'Expense')
+
+    batch = []
+    for expense in Expense.objects.only('date', 'amount', 'description').order_by('pk').iterator(chunk_size=2000):
+        expense.fingerprint = expense_fingerprint(expense.date, expense.amount, expense.description)
+        batch.append(expense)
+        if len(batch) >= 2000:
+            Expense.objects.bulk_update(batch, ['fingerprint'])
+            batch = []
+    Expense.objects.bulk_update(batch, ['fingerprint'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0009_categoryrule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'fingerprint'], name='expense_user_fingerprint_idx'),
+        ),
+    ]
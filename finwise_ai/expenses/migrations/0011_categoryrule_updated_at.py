@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0010_expense_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoryrule',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_uncategorized_duplicates(apps, schema_editor):
+    """Fold duplicate uncategorized rollups, which the old constraint allowed, into one row per month."""
+    MonthlyExpenseRollup = apps.get_model('expenses', 'MonthlyExpenseRollup')
+
+    duplicated = (
+        MonthlyExpenseRollup.objects
+        .filter(category__isnull=True)
+        .values('user_id', 'month')
+        .annotate(rows=Count('pk'), merged_total=Sum('total'), merged_count=Sum('expense_count'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for bucket in duplicated:
+        rows = MonthlyExpenseRollup.objects.filter(
+            user_id=bucket['user_id'], month=bucket['month'], category__isnull=True
+        ).order_by('pk')
+        kept = rows.first()
+        rows.exclude(pk=kept.pk).delete()
+        kept.total = bucket['merged_total']
+        kept.expense_count = bucket['merged_count']
+        kept.save(update_fields=['total', 'expense_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0011_categoryrule_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='monthlyexpenserollup',
+            unique_together=set(),
+        ),
+        migrations.RunPython(merge_uncategorized_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='monthlyexpenserollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', False)), fields=('user', 'month', 'category'), name='expense_rollup_user_month_category_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyexpenserollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('user', 'month'), name='expense_rollup_user_month_uncategorized_uniq'),
+        ),
+    ]
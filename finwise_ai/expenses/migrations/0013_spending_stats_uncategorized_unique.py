@@ -0,0 +1,90 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:43
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+# A frozen copy of the merge in expenses.stats at the time of this migration
+HALF_LIFE_DAYS = 60
+
+
+def _decay(stats, to_date):
+    if stats.decay_date is None or stats.decayed_weight <= 0:
+        stats.decay_date = to_date
+        return
+    if to_date > stats.decay_date:
+        factor = 0.5 ** ((to_date - stats.decay_date).days / HALF_LIFE_DAYS)
+        stats.decayed_weight *= factor
+        stats.decayed_m2 *= factor
+        stats.decay_date = to_date
+
+
+def merge(stats, other):
+    """Fold other into stats (Chan et al. parallel update)."""
+    if not other.count:
+        return
+    if not stats.count:
+        for name in ('count', 'mean', 'm2', 'decayed_weight', 'decayed_mean', 'decayed_m2', 'decay_date'):
+            setattr(stats, name, getattr(other, name))
+        return
+
+    count = stats.count + other.count
+    delta = other.mean - stats.mean
+    stats.m2 += other.m2 + delta * delta * stats.count * other.count / count
+    stats.mean += delta * other.count / count
+    stats.count = count
+
+    later = max(stats.decay_date, other.decay_date)
+    _decay(stats, later)
+    _decay(other, later)
+    weight = stats.decayed_weight + other.decayed_weight
+    if weight <= 1e-9:
+        return
+    delta = other.decayed_mean - stats.decayed_mean
+    stats.decayed_m2 += other.decayed_m2 + delta * delta * stats.decayed_weight * other.decayed_weight / weight
+    stats.decayed_mean += delta * other.decayed_weight / weight
+    stats.decayed_weight = weight
+
+
+def merge_uncategorized_duplicates(apps, schema_editor):
+    """Fold duplicate uncategorized statistics, which the old constraint allowed, into one row per user."""
+    CategorySpendingStats = apps.get_model('expenses', 'CategorySpendingStats')
+
+    duplicated = (
+        CategorySpendingStats.objects
+        .filter(category__isnull=True)
+        .values('user_id')
+        .annotate(rows=Count('pk'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for user_id in [bucket['user_id'] for bucket in duplicated]:
+        kept, *others = CategorySpendingStats.objects.filter(user_id=user_id, category__isnull=True).order_by('pk')
+        for other in others:
+            merge(kept, other)
+            other.delete()
+        kept.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0012_rollup_uncategorized_unique'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='categoryspendingstats',
+            unique_together=set(),
+        ),
+        migrations.RunPython(merge_uncategorized_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='categoryspendingstats',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', False)), fields=('user', 'category'), name='spending_stats_user_category_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='categoryspendingstats',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('user',), name='spending_stats_user_uncategorized_uniq'),
+        ),
+    ]
@@ -37,6 +37,7 @@ class Expense(models.Model):
     recurrence_end_date = models.DateField(null=True, blank=True)
     is_flagged = models.BooleanField(default=False)  # For anomaly detection
     notes = models.TextField(blank=True, null=True)
+    fingerprint = models.CharField(max_length=32, blank=True, default='', editable=False)  # Of date, amount and description
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -45,12 +46,19 @@ class Expense(models.Model):
     
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Keyset pagination seeks on (date, id), newest first
+            models.Index(fields=['user', '-date', '-id'], name='expense_user_date_id_idx'),
+            # Duplicate checks look up one fingerprint of one user
+            models.Index(fields=['user', 'fingerprint'], name='expense_user_fingerprint_idx'),
+        ]
 
 
 class RecurringExpense(models.Model):
-    """Model for tracking recurring expense instances."""
+    """Model for a paid or user-modified occurrence of a recurring expense; other occurrences are generated on demand."""
     
     parent_expense = models.ForeignKey(Expense, on_delete=models.CASCADE, related_name='recurring_instances')
+    occurrence_date = models.DateField(null=True, blank=True)  # Scheduled date this instance replaces
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     date = models.DateField()
     is_paid = models.BooleanField(default=False)
@@ -61,6 +69,7 @@ class RecurringExpense(models.Model):
     
     class Meta:
         ordering = ['-date']
+        unique_together = [('parent_expense', 'occurrence_date')]
 
 
 class AnomalyDetection(models.Model):
@@ -81,3 +90,136 @@ class AnomalyDetection(models.Model):
     class Meta:
         verbose_name = "Anomaly Detection"
         verbose_name_plural = "Anomaly Detections"
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='anomaly_user_created_idx'),
+        ]
+
+
+class MonthlyExpenseRollup(models.Model):
+    """Model for per-user monthly expense totals by category, kept in sync with Expense writes."""
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_rollups')
+    month = models.DateField()  # First day of the month
+    category = models.ForeignKey(ExpenseCategory, on_delete=models.CASCADE, null=True, blank=True, related_name='rollups')
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expense_count = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.user} - {self.month:%Y-%m} - {self.total}"
+    
+    class Meta:
+        verbose_name = "Monthly Expense Rollup"
+        verbose_name_plural = "Monthly Expense Rollups"
+        ordering = ['month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'month', 'category'], condition=models.Q(category__isnull=False),
+                name='expense_rollup_user_month_category_uniq'
+            ),
+            # NULLs are distinct in unique constraints, so the uncategorized bucket needs its own
+            models.UniqueConstraint(
+                fields=['user', 'month'], condition=models.Q(category__isnull=True),
+                name='expense_rollup_user_month_uncategorized_uniq'
+            ),
+        ]
+
+
+class CategorySpendingStats(models.Model):
+    """Model for running expense amount statistics per user and category, kept in sync with Expense writes."""
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='spending_stats')
+    category = models.ForeignKey(ExpenseCategory, on_delete=models.CASCADE, null=True, blank=True, related_name='spending_stats')
+    
+    # Welford running statistics over all expenses
+    count = models.IntegerField(default=0)
+    mean = models.FloatField(default=0)
+    m2 = models.FloatField(default=0)  # Sum of squared deviations from the mean
+    
+    # Exponentially decayed variants, weighted towards recent expenses
+    decayed_weight = models.FloatField(default=0)
+    decayed_mean = models.FloatField(default=0)
+    decayed_m2 = models.FloatField(default=0)
+    decay_date = models.DateField(null=True, blank=True)  # Date at which an expense has weight 1
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user} - {self.category or 'Uncategorized'} ({self.count} expenses)"
+    
+    @property
+    def std(self):
+        return (self.m2 / self.count) ** 0.5 if self.count else 0.0
+    
+    @property
+    def decayed_std(self):
+        return (self.decayed_m2 / self.decayed_weight) ** 0.5 if self.decayed_weight > 0 else 0.0
+    
+    class Meta:
+        verbose_name = "Category Spending Stats"
+        verbose_name_plural = "Category Spending Stats"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'category'], condition=models.Q(category__isnull=False),
+                name='spending_stats_user_category_uniq'
+            ),
+            # NULLs are distinct in unique constraints, so the uncategorized bucket needs its own
+            models.UniqueConstraint(
+                fields=['user'], condition=models.Q(category__isnull=True),
+                name='spending_stats_user_uncategorized_uniq'
+            ),
+        ]
+
+
+class AnomalyRescan(models.Model):
+    """Model for a run of the rescan_anomalies command, used to resume it and report throughput."""
+    
+    METHOD_CHOICES = [
+        ('zscore', 'Rolling z-score'),
+        ('mad', 'Rolling median absolute deviation'),
+    ]
+    
+    method = models.CharField(max_length=10, choices=METHOD_CHOICES, default='zscore')
+    threshold = models.FloatField()
+    window_days = models.IntegerField()
+    min_history = models.IntegerField()
+    last_user_id = models.BigIntegerField(default=0)  # Every user up to this id has been rescanned
+    rows_scanned = models.BigIntegerField(default=0)
+    anomalies_found = models.IntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.get_method_display()} rescan started {self.started_at:%Y-%m-%d %H:%M}"
+    
+    class Meta:
+        verbose_name = "Anomaly Rescan"
+        verbose_name_plural = "Anomaly Rescans"
+        ordering = ['-started_at']
+
+
+class CategoryRule(models.Model):
+    """Model for a rule that assigns a category to matching expenses; rules without a user apply to everyone."""
+    
+    MATCH_CHOICES = [
+        ('keyword', 'Keyword anywhere in the description'),
+        ('merchant', 'Merchant at the start of the description'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='category_rules')
+    category = models.ForeignKey(ExpenseCategory, on_delete=models.CASCADE, related_name='rules')
+    pattern = models.CharField(max_length=255, blank=True)  # Whole words; blank matches any description
+    match_type = models.CharField(max_length=10, choices=MATCH_CHOICES, default='keyword')
+    min_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    max_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    priority = models.IntegerField(default=0)  # Higher wins among matching rules of the same owner
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.pattern or '*'} -> {self.category}"
+    
+    class Meta:
+        verbose_name = "Category Rule"
+        verbose_name_plural = "Category Rules"
+        ordering = ['-priority', 'pk']
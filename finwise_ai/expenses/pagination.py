@@ -0,0 +1,86 @@
+"""
+Keyset (seek) pagination for expenses, newest first.
+
+Pages are ordered by (date, id) descending and a cursor records the last or
+first row of a page, so fetching the next page is an indexed range scan
+whatever its depth, and rows inserted meanwhile never shift or repeat
+entries on later pages.
+"""
+import base64
+from dataclasses import dataclass
+from datetime import date
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor cannot be decoded."""
+
+
+@dataclass
+class KeysetPage:
+    items: list
+    next_cursor: str = None
+    previous_cursor: str = None
+
+
+def encode_cursor(expense):
+    value = f'{expense.date.isoformat()}:{expense.pk}'
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (date, id) position stored in a cursor."""
+    try:
+        value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        day, pk = value.split(':')
+        return date.fromisoformat(day), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {cursor}') from e
+
+
+def page_size_from(value):
+    """Parse a requested page size, clamped to MAX_PAGE_SIZE."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return min(max(size, 1), MAX_PAGE_SIZE)
+
+
+def keyset_page(queryset, after=None, before=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Return a page of expenses, newest first.
+
+    With `after`, the page continues past that cursor; with `before`, it ends
+    just ahead of it (the previous page). One query of page_size + 1 rows;
+    the extra row only tells whether another page exists.
+    """
+    if before is not None:
+        day, pk = decode_cursor(before)
+        rows = list(
+            queryset
+            .filter(Q(date__gt=day) | Q(date=day, pk__gt=pk))
+            .order_by('date', 'pk')[:page_size + 1]
+        )
+        items = list(reversed(rows[:page_size]))
+        # The cursor's own row is still ahead, so a previous page always has a next one
+        return KeysetPage(
+            items=items,
+            next_cursor=encode_cursor(items[-1]) if items else before,
+            previous_cursor=encode_cursor(items[0]) if len(rows) > page_size else None
+        )
+
+    if after is not None:
+        day, pk = decode_cursor(after)
+        queryset = queryset.filter(Q(date__lt=day) | Q(date=day, pk__lt=pk))
+
+    rows = list(queryset.order_by('-date', '-pk')[:page_size + 1])
+    items = rows[:page_size]
+    return KeysetPage(
+        items=items,
+        next_cursor=encode_cursor(items[-1]) if len(rows) > page_size else None,
+        previous_cursor=encode_cursor(items[0]) if items and after is not None else None
+    )
@@ -0,0 +1,166 @@
+"""
+On-demand occurrences of recurring expenses.
+
+An expense with a recurrence rule stands for its first occurrence; later
+occurrences are generated for whatever date window is asked for instead of
+being stored. Only occurrences the user paid or edited are persisted, as
+RecurringExpense exceptions keyed by the scheduled date they replace.
+"""
+import heapq
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+from django.db.models import Q
+from .models import Expense, RecurringExpense
+
+RECURRING = ('daily', 'weekly', 'monthly', 'yearly')
+
+
+@dataclass
+class Occurrence:
+    """One occurrence of a recurring expense, persisted as an exception or virtual."""
+
+    parent: Expense
+    scheduled_date: object
+    date: object
+    amount: Decimal
+    is_paid: bool = False
+    is_modified: bool = False
+    exception: RecurringExpense = None
+
+    @property
+    def is_virtual(self):
+        return self.exception is None
+
+
+def _nth_date(expense, n):
+    """Date of the n-th repetition after the expense itself, computed from the start to avoid drift."""
+    if expense.recurrence == 'daily':
+        return expense.date + timedelta(days=n)
+    if expense.recurrence == 'weekly':
+        return expense.date + timedelta(weeks=n)
+    if expense.recurrence == 'monthly':
+        return expense.date + relativedelta(months=n)
+    return expense.date + relativedelta(years=n)
+
+
+def _first_index(expense, start):
+    """Smallest n >= 1 whose repetition falls on or after start."""
+    if start <= expense.date:
+        return 1
+
+    days = (start - expense.date).days
+    if expense.recurrence == 'daily':
+        n = days
+    elif expense.recurrence == 'weekly':
+        n = -(-days // 7)
+    else:
+        step = 12 if expense.recurrence == 'yearly' else 1
+        months = (start.year - expense.date.year) * 12 + start.month - expense.date.month
+        n = max(months // step - 1, 1)
+        while _nth_date(expense, n) < start:
+            n += 1
+
+    return max(n, 1)
+
+
+def occurrence_dates(expense, start, end):
+    """
+    Yield the scheduled repetition dates of an expense between start and end (inclusive).
+
+    The expense's own date is the first occurrence and is not repeated here.
+    Generation stops at the recurrence end date, if any, so open-ended rules
+    are bounded by the requested window.
+    """
+    if expense.recurrence not in RECURRING:
+        return
+
+    if expense.recurrence_end_date and expense.recurrence_end_date < end:
+        end = expense.recurrence_end_date
+
+    n = _first_index(expense, start)
+    while True:
+        current = _nth_date(expense, n)
+        if current > end:
+            return
+        yield current
+        n += 1
+
+
+def _parent_occurrences(expense, start, end, exceptions):
+    """Merge one parent's scheduled dates with its exceptions, in date order."""
+    occurrences = []
+
+    for scheduled in occurrence_dates(expense, start, end):
+        exception = exceptions.pop(scheduled, None)
+        if exception is None:
+            occurrences.append(Occurrence(expense, scheduled, scheduled, expense.amount))
+        elif start <= exception.date <= end:
+            occurrences.append(_from_exception(expense, exception))
+
+    # Exceptions moved into the window from a scheduled date outside it
+    for exception in exceptions.values():
+        if start <= exception.date <= end:
+            occurrences.append(_from_exception(expense, exception))
+
+    occurrences.sort(key=lambda occurrence: occurrence.date)
+    return occurrences
+
+
+def _from_exception(expense, exception):
+    return Occurrence(
+        parent=expense,
+        scheduled_date=exception.occurrence_date or exception.date,
+        date=exception.date,
+        amount=exception.amount,
+        is_paid=exception.is_paid,
+        is_modified=exception.is_modified,
+        exception=exception
+    )
+
+
+def occurrences(user, start, end, expenses=None):
+    """
+    Return the occurrences of a user's recurring expenses between two dates, oldest first.
+
+    Uses two queries however many occurrences the window holds: one for the
+    recurring parents and one for the exceptions that touch the window.
+    """
+    if expenses is None:
+        expenses = Expense.objects.filter(user=user)
+
+    parents = list(
+        expenses
+        .filter(recurrence__in=RECURRING, date__lte=end)
+        .filter(Q(recurrence_end_date__isnull=True) | Q(recurrence_end_date__gte=start))
+        .select_related('category')
+    )
+    if not parents:
+        return []
+
+    exceptions = {parent.pk: {} for parent in parents}
+    for exception in RecurringExpense.objects.filter(parent_expense__in=parents).filter(
+        Q(occurrence_date__range=(start, end)) | Q(date__range=(start, end))
+    ):
+        exceptions[exception.parent_expense_id][exception.occurrence_date or exception.date] = exception
+
+    return list(heapq.merge(
+        *(_parent_occurrences(parent, start, end, exceptions[parent.pk]) for parent in parents),
+        key=lambda occurrence: occurrence.date
+    ))
+
+
+def totals_by_month(occurrences):
+    """Return {first day of month: total} for a list of occurrences."""
+    totals = {}
+    for occurrence in occurrences:
+        month = occurrence.date.replace(day=1)
+        totals[month] = totals.get(month, Decimal('0')) + occurrence.amount
+    return totals
+
+
+def is_scheduled(expense, scheduled_date):
+    """Whether a date is one of the expense's repetitions."""
+    return next(occurrence_dates(expense, scheduled_date, scheduled_date), None) == scheduled_date
+
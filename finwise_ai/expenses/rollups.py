@@ -0,0 +1,131 @@
+from datetime import datetime
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from .models import Expense, MonthlyExpenseRollup
+
+
+def month_start(value):
+    """Return the first day of the month for a date or datetime."""
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.replace(day=1)
+
+
+def apply_expense_delta(user_id, month, category_id, amount, count):
+    """Add an amount/count delta to a single (user, month, category) rollup row."""
+    month = month_start(month)
+    amount = Decimal(str(amount))
+    rollups = MonthlyExpenseRollup.objects.filter(user_id=user_id, month=month, category_id=category_id)
+
+    if rollups.update(total=F('total') + amount, expense_count=F('expense_count') + count):
+        return
+
+    # Nothing to subtract from a bucket that was never materialized
+    if count <= 0:
+        return
+
+    try:
+        with transaction.atomic():
+            MonthlyExpenseRollup.objects.create(
+                user_id=user_id,
+                month=month,
+                category_id=category_id,
+                total=amount,
+                expense_count=count
+            )
+    except IntegrityError:
+        # Another writer created the row first
+        rollups.update(total=F('total') + amount, expense_count=F('expense_count') + count)
+
+
+def rebuild_rollups(user_ids=None, batch_size=1000):
+    """Recompute rollups from raw expenses with grouped aggregates and bulk inserts."""
+    expenses = Expense.objects.all()
+    rollups = MonthlyExpenseRollup.objects.all()
+
+    if user_ids is not None:
+        expenses = expenses.filter(user_id__in=user_ids)
+        rollups = rollups.filter(user_id__in=user_ids)
+
+    grouped = (
+        expenses
+        .annotate(month=TruncMonth('date'))
+        .values('user_id', 'month', 'category_id')
+        .annotate(total=Sum('amount'), expense_count=Count('id'))
+        .order_by()
+    )
+
+    created = 0
+    with transaction.atomic():
+        rollups.delete()
+
+        batch = []
+        for row in grouped.iterator(chunk_size=batch_size):
+            batch.append(MonthlyExpenseRollup(**row))
+            if len(batch) >= batch_size:
+                MonthlyExpenseRollup.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+
+        if batch:
+            MonthlyExpenseRollup.objects.bulk_create(batch)
+            created += len(batch)
+
+    return created
+
+
+def monthly_totals(user, start_date, end_date, category=None):
+    """Return {month: total} for a user between two dates (month granularity)."""
+    rollups = MonthlyExpenseRollup.objects.filter(
+        user=user,
+        month__gte=month_start(start_date),
+        month__lte=end_date
+    )
+
+    if category is not None:
+        rollups = rollups.filter(category=category)
+
+    totals = rollups.values('month').annotate(amount=Sum('total')).order_by('month')
+    return {row['month']: row['amount'] for row in totals}
+
+
+def monthly_category_totals(user, start_date, end_date):
+    """Return rollup rows (month, category id/name, total) for a user, oldest month first."""
+    return list(
+        MonthlyExpenseRollup.objects
+        .filter(user=user, month__gte=month_start(start_date), month__lte=end_date)
+        .values('month', 'category_id', 'category__name')
+        .annotate(amount=Sum('total'))
+        .order_by('month')
+    )
+
+
+def category_totals(user, start_date=None, end_date=None, category=None):
+    """Return per-category totals for a user, largest first (uncategorized excluded)."""
+    rollups = MonthlyExpenseRollup.objects.filter(user=user, category__isnull=False)
+
+    if start_date is not None:
+        rollups = rollups.filter(month__gte=month_start(start_date))
+    if end_date is not None:
+        rollups = rollups.filter(month__lte=end_date)
+    if category is not None:
+        rollups = rollups.filter(category=category)
+
+    return list(
+        rollups
+        .values('category_id', 'category__name', 'category__color')
+        .annotate(amount=Sum('total'))
+        .order_by('-amount')
+    )
+
+
+def expense_total(user, category=None):
+    """Return the all-time expense total for a user from the rollups."""
+    rollups = MonthlyExpenseRollup.objects.filter(user=user)
+
+    if category is not None:
+        rollups = rollups.filter(category=category)
+
+    return rollups.aggregate(amount=Sum('total'))['amount'] or 0
@@ -0,0 +1,199 @@
+"""
+Full-text search over expense descriptions and notes.
+
+On SQLite an FTS5 table indexes expenses_expense as external content and is
+kept in sync by triggers, so bulk_create, queryset updates and deletes are
+indexed as well as model saves. The owner's id is indexed as a column of
+its own so a search intersects posting lists instead of scanning every
+user's matches. On PostgreSQL a GIN index over to_tsvector serves the same
+queries. Other databases fall back to icontains.
+
+Terms match word prefixes: "groc sup" finds "Grocery supplies". Short
+prefixes are indexed too, so typing-as-you-search stays within a few
+milliseconds at millions of rows. Set
+EXPENSE_SEARCH_BACKEND to a dotted path to plug in another backend.
+"""
+import re
+from functools import lru_cache
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+FTS_TABLE = 'expenses_expense_fts'
+
+# Relative weight of the user_id, description and notes columns in bm25
+FTS_WEIGHTS = (0.0, 10.0, 5.0)
+
+SQLITE_STATEMENTS = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        user_id, description, notes,
+        content='expenses_expense', content_rowid='id', tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3 4'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, user_id, description, notes)
+        VALUES (new.id, new.user_id, new.description, new.notes);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, user_id, description, notes)
+        VALUES ('delete', old.id, old.user_id, old.description, old.notes);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF user_id, description, notes
+    ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, user_id, description, notes)
+        VALUES ('delete', old.id, old.user_id, old.description, old.notes);
+        INSERT INTO {FTS_TABLE}(rowid, user_id, description, notes)
+        VALUES (new.id, new.user_id, new.description, new.notes);
+    END""",
+]
+
+POSTGRES_DOCUMENT = "to_tsvector('simple', coalesce(description, '') || ' ' || coalesce(notes, ''))"
+
+
+def search_terms(text):
+    """Split a search string into lower-case word terms."""
+    return re.findall(r'\w+', text.lower())
+
+
+class IContainsSearchBackend:
+    """Substring matching on description and notes, for databases without a full-text index."""
+
+    def install(self, connection):
+        pass
+
+    def uninstall(self, connection):
+        pass
+
+    def filter(self, queryset, user_id, terms):
+        query = Q()
+        for term in terms:
+            query &= Q(description__icontains=term) | Q(notes__icontains=term)
+        return queryset.filter(query)
+
+    def rank(self, queryset, user_id, terms):
+        return queryset.order_by('-date')
+
+
+class SQLiteSearchBackend:
+    """FTS5 external-content index maintained by triggers."""
+
+    def install(self, connection):
+        """Create the index and triggers if missing, filling the index when the triggers were missing."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s", [f'{FTS_TABLE}_%']
+            )
+            if cursor.fetchone()[0] == 3:
+                return
+            for statement in SQLITE_STATEMENTS:
+                cursor.execute(statement)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+    def uninstall(self, connection):
+        with connection.cursor() as cursor:
+            for name in ('insert', 'delete', 'update'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+    def match_expression(self, user_id, terms):
+        words = ' '.join(f'"{term}"*' for term in terms)
+        if user_id is None:
+            return f'{{description notes}} : ({words})'
+        return f'user_id : "{int(user_id)}" AND {{description notes}} : ({words})'
+
+    def filter(self, queryset, user_id, terms):
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [self.match_expression(user_id, terms)]
+        ))
+
+    def rank(self, queryset, user_id, terms):
+        # bm25 is lower for better matches; evaluated only for rows that matched
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        return queryset.annotate(search_rank=RawSQL(
+            f'SELECT bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = {queryset.model._meta.db_table}.id',
+            [self.match_expression(user_id, terms)],
+            output_field=FloatField()
+        )).order_by('search_rank', '-date')
+
+
+class PostgresSearchBackend:
+    """tsvector matching served by a GIN expression index."""
+
+    def install(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS expense_search_idx ON expenses_expense USING GIN ({POSTGRES_DOCUMENT})'
+            )
+
+    def uninstall(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX IF EXISTS expense_search_idx')
+
+    def tsquery(self, terms):
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def filter(self, queryset, user_id, terms):
+        return queryset.filter(RawSQL(
+            f"{POSTGRES_DOCUMENT} @@ to_tsquery('simple', %s)", [self.tsquery(terms)], output_field=BooleanField()
+        ))
+
+    def rank(self, queryset, user_id, terms):
+        return queryset.annotate(search_rank=RawSQL(
+            f"-ts_rank({POSTGRES_DOCUMENT}, to_tsquery('simple', %s))", [self.tsquery(terms)],
+            output_field=FloatField()
+        )).order_by('search_rank', '-date')
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def _backend_for(vendor, path):
+    if path:
+        return import_string(path)()
+    return BACKENDS.get(vendor, IContainsSearchBackend)()
+
+
+def get_search_backend(using=None):
+    """Return the search backend for a database connection (the default one if omitted)."""
+    vendor = (using or connection).vendor
+    return _backend_for(vendor, getattr(settings, 'EXPENSE_SEARCH_BACKEND', None))
+
+
+def search_expenses(expenses, text, user=None, ranked=False):
+    """
+    Narrow an expense queryset to those matching every term of a search string.
+
+    Pass the owning user when the queryset is limited to one user so the
+    index can be restricted to their expenses. With ranked, the best matches
+    come first.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return expenses
+
+    backend = get_search_backend()
+    user_id = user.pk if user is not None else None
+    expenses = backend.filter(expenses, user_id, terms)
+    if ranked:
+        expenses = backend.rank(expenses, user_id, terms)
+    return expenses
+
+
+def rank_expenses(expenses, text, user=None):
+    """Order expenses already narrowed by search_expenses best match first."""
+    terms = search_terms(text)
+    if not terms:
+        return expenses.order_by('-date')
+    return get_search_backend().rank(expenses, user.pk if user is not None else None, terms)
+
+
+def install_search_index(sender=None, using='default', **kwargs):
+    """Create the search index for a database; connected to post_migrate so table rebuilds are repaired."""
+    get_search_backend(connections[using]).install(connections[using])
@@ -0,0 +1,161 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+from .categorizer import categorize, invalidate_rules
+from .columnar import append_expenses, invalidate_columns
+from .duplicates import fingerprint_of
+from .models import CategoryRule, CategorySpendingStats, Expense, ExpenseCategory, MonthlyExpenseRollup
+from .rollups import apply_expense_delta, month_start
+from .stats import add_value, merge, remove_value, update_stats
+
+# Sent after expenses are written with bulk_create, which skips the model signals; provides user_id
+expenses_bulk_created = Signal()
+
+# Sent after expenses of several users are changed with QuerySet.update(), which skips the model signals; provides user_ids
+expenses_bulk_updated = Signal()
+
+
+@receiver(pre_save, sender=Expense)
+def categorize_new_expense(sender, instance, raw=False, **kwargs):
+    """Give a new expense without a category the one assigned by the category rules."""
+    if raw or instance.pk is not None or instance.category_id is not None:
+        return
+
+    instance.category_id = categorize(instance.description, Decimal(str(instance.amount)), instance.user_id)
+
+
+@receiver(pre_save, sender=Expense)
+def store_expense_fingerprint(sender, instance, **kwargs):
+    """Keep the duplicate-detection fingerprint in step with the date, amount and description."""
+    instance.fingerprint = fingerprint_of(instance)
+
+
+@receiver(pre_save, sender=Expense)
+def remember_previous_expense(sender, instance, raw=False, **kwargs):
+    """Keep the stored bucket of an expense so an edit can be moved between rollups."""
+    instance._rollup_previous = None
+
+    if raw or instance.pk is None:
+        return
+
+    instance._rollup_previous = (
+        Expense.objects
+        .filter(pk=instance.pk)
+        .values_list('user_id', 'date', 'category_id', 'amount')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Expense)
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    """Apply an expense create/edit to the monthly rollups."""
+    if raw:
+        return
+
+    previous = getattr(instance, '_rollup_previous', None)
+    current = (instance.user_id, month_start(instance.date), instance.category_id)
+
+    if previous is not None:
+        user_id, date, category_id, amount = previous
+        if (user_id, month_start(date), category_id) == current:
+            # Same bucket, only the amount may have changed
+            delta = Decimal(str(instance.amount)) - amount
+            if delta:
+                apply_expense_delta(*current, delta, 0)
+            return
+
+        apply_expense_delta(user_id, date, category_id, -amount, -1)
+
+    apply_expense_delta(*current, instance.amount, 1)
+
+
+@receiver(post_save, sender=Expense)
+def update_spending_stats_on_save(sender, instance, raw=False, **kwargs):
+    """Move an expense's amount into the running statistics of its (user, category)."""
+    if raw:
+        return
+
+    previous = getattr(instance, '_rollup_previous', None)
+    amount = Decimal(str(instance.amount))
+
+    if previous is not None:
+        user_id, date, category_id, previous_amount = previous
+        if (user_id, category_id, date, previous_amount) == (instance.user_id, instance.category_id, instance.date, amount):
+            return
+        update_stats(user_id, category_id, lambda stats: remove_value(stats, previous_amount, date))
+
+    update_stats(instance.user_id, instance.category_id, lambda stats: add_value(stats, amount, instance.date))
+
+
+@receiver(post_save, sender=Expense)
+def update_columns_on_save(sender, instance, created, raw=False, **kwargs):
+    """Append a new expense to the analytics columns once committed; drop them when an edit changes stored values."""
+    if raw:
+        return
+
+    if created:
+        row = (instance.pk, instance.date, Decimal(str(instance.amount)), instance.category_id)
+        transaction.on_commit(lambda: append_expenses(instance.user_id, [row]))
+        return
+
+    previous = getattr(instance, '_rollup_previous', None)
+    current = (instance.user_id, instance.date, instance.category_id, Decimal(str(instance.amount)))
+    if previous == current:
+        return
+
+    for user_id in {instance.user_id, previous[0] if previous else instance.user_id}:
+        transaction.on_commit(lambda user_id=user_id: invalidate_columns(user_id))
+
+
+@receiver(post_delete, sender=Expense)
+def update_columns_on_delete(sender, instance, **kwargs):
+    """Drop the owner's analytics columns so the deleted expense disappears from them."""
+    transaction.on_commit(lambda: invalidate_columns(instance.user_id))
+
+
+@receiver(expenses_bulk_created)
+def update_columns_on_bulk_create(sender, user_id, **kwargs):
+    """Rebuild a user's analytics columns after a bulk import rather than appending row by row."""
+    transaction.on_commit(lambda: invalidate_columns(user_id))
+
+
+@receiver(post_delete, sender=Expense)
+def update_spending_stats_on_delete(sender, instance, **kwargs):
+    """Remove a deleted expense from the running statistics."""
+    update_stats(instance.user_id, instance.category_id, lambda stats: remove_value(stats, instance.amount, instance.date))
+
+
+@receiver(post_delete, sender=Expense)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    """Remove a deleted expense from the monthly rollups."""
+    apply_expense_delta(instance.user_id, instance.date, instance.category_id, -Decimal(str(instance.amount)), -1)
+
+
+@receiver(pre_delete, sender=ExpenseCategory)
+def fold_category_rollups(sender, instance, **kwargs):
+    """Move a deleted category's totals to the uncategorized bucket, mirroring SET_NULL on expenses."""
+    for rollup in MonthlyExpenseRollup.objects.filter(category=instance):
+        apply_expense_delta(rollup.user_id, rollup.month, None, rollup.total, rollup.expense_count)
+
+
+@receiver(pre_delete, sender=ExpenseCategory)
+def invalidate_category_columns(sender, instance, **kwargs):
+    """Drop the analytics columns of users whose expenses lose the deleted category."""
+    user_ids = list(Expense.objects.filter(category=instance).values_list('user_id', flat=True).distinct())
+    transaction.on_commit(lambda: [invalidate_columns(user_id) for user_id in user_ids])
+
+
+@receiver(pre_delete, sender=ExpenseCategory)
+def fold_category_spending_stats(sender, instance, **kwargs):
+    """Merge a deleted category's statistics into the uncategorized bucket."""
+    for stats in CategorySpendingStats.objects.filter(category=instance):
+        update_stats(stats.user_id, None, lambda uncategorized: merge(uncategorized, stats))
+
+
+@receiver(post_save, sender=CategoryRule)
+@receiver(post_delete, sender=CategoryRule)
+def invalidate_rules_on_change(sender, **kwargs):
+    """Rebuild the rule automaton now in this process, and in every process once the change is committed."""
+    invalidate_rules()
+    transaction.on_commit(invalidate_rules)
@@ -0,0 +1,216 @@
+"""
+Running amount statistics per (user, category).
+
+Each CategorySpendingStats row holds Welford's count/mean/M2 over all of the
+category's expenses plus exponentially decayed counterparts (half-life
+HALF_LIFE_DAYS) that favour recent spending. Writes update a row in constant
+time, so anomaly checks read one row instead of the expense history.
+
+Removing a value is exact for the Welford statistics; for the decayed ones
+it is exact up to floating point error, which rebuild_spending_stats clears.
+Expenses dated after today are weighted as if dated today, so a mistyped
+far-future date cannot move the decay reference and wipe out every weight.
+"""
+from copy import copy
+import numpy as np
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import CategorySpendingStats, Expense
+
+HALF_LIFE_DAYS = 60
+
+# Weight below which a decayed accumulator is treated as empty
+MIN_WEIGHT = 1e-9
+
+
+def _reference_date(date):
+    """Date an expense is weighted at, never later than today."""
+    return min(date, timezone.now().date())
+
+
+def _decay(stats, to_date):
+    """Move the decay reference date forward, down-weighting what is stored."""
+    if stats.decay_date is None or stats.decayed_weight <= 0:
+        stats.decay_date = to_date
+        return
+    if to_date > stats.decay_date:
+        factor = 0.5 ** ((to_date - stats.decay_date).days / HALF_LIFE_DAYS)
+        stats.decayed_weight *= factor
+        stats.decayed_m2 *= factor
+        stats.decay_date = to_date
+
+
+def _weight(stats, date):
+    return 0.5 ** ((stats.decay_date - date).days / HALF_LIFE_DAYS)
+
+
+def add_value(stats, amount, date):
+    """Add one expense amount to the running statistics."""
+    x = float(amount)
+
+    stats.count += 1
+    delta = x - stats.mean
+    stats.mean += delta / stats.count
+    stats.m2 += delta * (x - stats.mean)
+
+    date = _reference_date(date)
+    _decay(stats, date)
+    weight = _weight(stats, date)
+    stats.decayed_weight += weight
+    delta = x - stats.decayed_mean
+    stats.decayed_mean += weight * delta / stats.decayed_weight
+    stats.decayed_m2 += weight * delta * (x - stats.decayed_mean)
+
+
+def remove_value(stats, amount, date):
+    """Remove one previously added expense amount from the running statistics."""
+    x = float(amount)
+
+    if stats.count <= 1:
+        reset(stats)
+        return
+
+    mean = (stats.count * stats.mean - x) / (stats.count - 1)
+    stats.m2 = max(stats.m2 - (x - mean) * (x - stats.mean), 0.0)
+    stats.mean = mean
+    stats.count -= 1
+
+    weight = _weight(stats, _reference_date(date))
+    remaining = stats.decayed_weight - weight
+    if remaining <= MIN_WEIGHT:
+        stats.decayed_weight = stats.decayed_mean = stats.decayed_m2 = 0.0
+        return
+    mean = (stats.decayed_weight * stats.decayed_mean - weight * x) / remaining
+    stats.decayed_m2 = max(stats.decayed_m2 - weight * (x - mean) * (x - stats.decayed_mean), 0.0)
+    stats.decayed_mean = mean
+    stats.decayed_weight = remaining
+
+
+def merge(stats, other):
+    """Fold another set of statistics into stats (Chan et al. parallel update)."""
+    if not other.count:
+        return
+    if not stats.count:
+        for name in ('count', 'mean', 'm2', 'decayed_weight', 'decayed_mean', 'decayed_m2', 'decay_date'):
+            setattr(stats, name, getattr(other, name))
+        return
+
+    count = stats.count + other.count
+    delta = other.mean - stats.mean
+    stats.m2 += other.m2 + delta * delta * stats.count * other.count / count
+    stats.mean += delta * other.count / count
+    stats.count = count
+
+    # Bring both decayed accumulators to the later reference date first
+    other = copy(other)
+    later = max(stats.decay_date, other.decay_date)
+    _decay(stats, later)
+    _decay(other, later)
+    weight = stats.decayed_weight + other.decayed_weight
+    if weight <= MIN_WEIGHT:
+        return
+    delta = other.decayed_mean - stats.decayed_mean
+    stats.decayed_m2 += other.decayed_m2 + delta * delta * stats.decayed_weight * other.decayed_weight / weight
+    stats.decayed_mean += delta * other.decayed_weight / weight
+    stats.decayed_weight = weight
+
+
+def reset(stats):
+    stats.count = 0
+    stats.mean = stats.m2 = 0.0
+    stats.decayed_weight = stats.decayed_mean = stats.decayed_m2 = 0.0
+    stats.decay_date = None
+
+
+def update_stats(user_id, category_id, change):
+    """Apply change(stats) to the stored row of a (user, category) under a row lock."""
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                stats, _ = CategorySpendingStats.objects.select_for_update().get_or_create(
+                    user_id=user_id, category_id=category_id
+                )
+                change(stats)
+                stats.save()
+            return
+        except IntegrityError:
+            # A missing row cannot be locked, so another writer may create it first; lock theirs instead
+            if attempt:
+                raise
+
+
+def baseline_for(expense):
+    """
+    Return the statistics of the expense's category without the expense itself.
+
+    One indexed lookup; the expense's own contribution is removed in memory.
+    """
+    stats = CategorySpendingStats.objects.filter(user_id=expense.user_id, category_id=expense.category_id).first()
+    if stats is None:
+        return CategorySpendingStats(user_id=expense.user_id, category_id=expense.category_id)
+
+    remove_value(stats, expense.amount, expense.date)
+    return stats
+
+
+def baselines(stats, amounts, dates):
+    """
+    baseline_for over many expenses of one category at once.
+
+    Returns (counts, decayed means, decayed standard deviations) of the
+    category's statistics without each expense, as arrays aligned with
+    amounts.
+    """
+    x = np.asarray(amounts, dtype=np.float64)
+    if stats.count <= 1 or stats.decay_date is None:
+        zeros = np.zeros(len(x))
+        return np.zeros(len(x), dtype=np.int64), zeros, zeros
+
+    days = np.array([(stats.decay_date - _reference_date(date)).days for date in dates], dtype=np.float64)
+    weights = 0.5 ** (days / HALF_LIFE_DAYS)
+    remaining = stats.decayed_weight - weights
+    empty = remaining <= MIN_WEIGHT
+    remaining = np.where(empty, 1.0, remaining)
+
+    means = (stats.decayed_weight * stats.decayed_mean - weights * x) / remaining
+    m2 = np.maximum(stats.decayed_m2 - weights * (x - means) * (x - stats.decayed_mean), 0.0)
+    stds = np.where(empty, 0.0, np.sqrt(m2 / remaining))
+    return np.full(len(x), stats.count - 1), np.where(empty, 0.0, means), stds
+
+
+def rebuild_spending_stats(user_ids=None, batch_size=1000):
+    """Recompute all statistics exactly from raw expenses, oldest first per bucket."""
+    expenses = Expense.objects.all()
+    stored = CategorySpendingStats.objects.all()
+
+    if user_ids is not None:
+        expenses = expenses.filter(user_id__in=user_ids)
+        stored = stored.filter(user_id__in=user_ids)
+
+    rows = (
+        expenses
+        .order_by('user_id', 'category_id', 'date', 'pk')
+        .values_list('user_id', 'category_id', 'date', 'amount')
+    )
+
+    created = 0
+    with transaction.atomic():
+        stored.delete()
+
+        batch = []
+        current = None
+        for user_id, category_id, date, amount in rows.iterator(chunk_size=batch_size):
+            if current is None or (current.user_id, current.category_id) != (user_id, category_id):
+                current = CategorySpendingStats(user_id=user_id, category_id=category_id)
+                batch.append(current)
+                # Only flush completed buckets
+                if len(batch) > batch_size:
+                    CategorySpendingStats.objects.bulk_create(batch[:-1])
+                    created += len(batch) - 1
+                    batch = batch[-1:]
+            add_value(current, amount, date)
+
+        CategorySpendingStats.objects.bulk_create(batch)
+        created += len(batch)
+
+    return created
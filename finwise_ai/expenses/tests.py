@@ -0,0 +1,888 @@
+import csv
+import json
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+from xml.etree import ElementTree
+from decimal import Decimal
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import QuerySet
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+import numpy as np
+import pandas as pd
+from dashboard.cache import get_data_version
+from .anomalies import MAD_SCALE, detect_anomalies_batch, rescan_partition, rolling_median_mad
+from . import categorizer
+from .categorizer import categorize, categorize_many, compile_rules, invalidate_rules
+from .columnar import expense_analytics_data, load_columns
+from .duplicates import expense_fingerprint, find_duplicate, near_duplicate_groups
+from .forms import ExpenseForm
+from .importers import import_expenses
+from .pagination import MAX_PAGE_SIZE, keyset_page, page_size_from
+from .models import (
+    AnomalyDetection, AnomalyRescan, CategoryRule, CategorySpendingStats, Expense, ExpenseCategory,
+    MonthlyExpenseRollup, RecurringExpense,
+)
+from .recurrence import occurrence_dates, occurrences
+from .rollups import apply_expense_delta
+from .stats import add_value, update_stats
+from .search import search_expenses
+from .views import detect_anomalies, expense_export, expense_feed
+
+
+class MonthlyExpenseRollupTests(TestCase):
+    """Tests for the incrementally maintained monthly expense rollups."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='rollup@example.com', password='StrongPass123')
+        self.rent = ExpenseCategory.objects.create(name='Rent')
+        self.food = ExpenseCategory.objects.create(name='Groceries')
+
+    def rollups(self):
+        return {
+            (rollup.month, rollup.category_id): (rollup.total, rollup.expense_count)
+            for rollup in MonthlyExpenseRollup.objects.filter(user=self.user)
+            if rollup.expense_count
+        }
+
+    def test_rollups_follow_create_edit_and_delete(self):
+        expense = Expense.objects.create(
+            user=self.user, category=self.rent, amount=Decimal('100.00'),
+            description='Rent', date=date(2025, 4, 3)
+        )
+        Expense.objects.create(
+            user=self.user, category=self.rent, amount=Decimal('50.00'),
+            description='Rent top-up', date=date(2025, 4, 20)
+        )
+        self.assertEqual(self.rollups(), {(date(2025, 4, 1), self.rent.pk): (Decimal('150.00'), 2)})
+
+        # Move the expense to another month and category with a new amount
+        expense.category = self.food
+        expense.date = date(2025, 5, 2)
+        expense.amount = Decimal('80.00')
+        expense.save()
+        self.assertEqual(self.rollups(), {
+            (date(2025, 4, 1), self.rent.pk): (Decimal('50.00'), 1),
+            (date(2025, 5, 1), self.food.pk): (Decimal('80.00'), 1),
+        })
+
+        expense.delete()
+        self.assertEqual(self.rollups(), {(date(2025, 4, 1), self.rent.pk): (Decimal('50.00'), 1)})
+
+    def test_rebuild_command_matches_incremental_rollups(self):
+        for day, category, amount in [(1, self.rent, '10.00'), (2, self.food, '5.50'), (3, None, '7.25')]:
+            Expense.objects.create(
+                user=self.user, category=category, amount=Decimal(amount),
+                description='Expense', date=date(2025, 3, day)
+            )
+        incremental = self.rollups()
+
+        MonthlyExpenseRollup.objects.all().delete()
+        call_command('rebuild_expense_rollups', stdout=StringIO())
+
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_uncategorized_bucket_is_unique(self):
+        Expense.objects.create(user=self.user, amount=Decimal('5.00'), description='Expense', date=date(2025, 3, 1))
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            MonthlyExpenseRollup.objects.create(user=self.user, month=date(2025, 3, 1), total=1, expense_count=1)
+
+        # A writer that lost the race to create the row adds to the winner's row instead
+        update = QuerySet.update
+        lost = []
+
+        def lose_first_update(queryset, **kwargs):
+            if not lost:
+                lost.append(True)
+                return 0
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', lose_first_update):
+            apply_expense_delta(self.user.pk, date(2025, 3, 9), None, Decimal('2.00'), 1)
+        self.assertEqual(self.rollups(), {(date(2025, 3, 1), None): (Decimal('7.00'), 2)})
+
+
+class ExpenseImportTests(TestCase):
+    """Tests for streaming CSV/OFX imports."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='import@example.com', password='StrongPass123')
+        self.food = ExpenseCategory.objects.create(name='Groceries')
+
+    def test_csv_import_maps_categories_and_updates_rollups(self):
+        today = date.today()
+        lines = ['Date,Description,Amount,Category']
+        for i in range(10):
+            lines.append(f'{today - timedelta(days=20 - i):%Y-%m-%d},Market,"1,0{i % 2 * 2}0.00",groceries')
+        lines += [f'{today:%m/%d/%Y},Market,9000.00,GROCERIES', 'not-a-date,Broken,1.00,', f'{today},Fee,0.00,']
+        file = BytesIO('\n'.join(lines).encode())
+
+        result = import_expenses(self.user, file, 'csv', chunk_size=4)
+
+        self.assertEqual((result.created, result.skipped, result.flagged), (11, 2, 1))
+        self.assertEqual(Expense.objects.filter(user=self.user, category=self.food).count(), 11)
+        self.assertEqual(AnomalyDetection.objects.get().expense.amount, Decimal('9000.00'))
+        self.assertTrue(Expense.objects.get(amount=Decimal('9000.00')).is_flagged)
+
+        incremental = set(MonthlyExpenseRollup.objects.values_list('month', 'category_id', 'total', 'expense_count'))
+        call_command('rebuild_expense_rollups', stdout=StringIO())
+        self.assertEqual(
+            set(MonthlyExpenseRollup.objects.values_list('month', 'category_id', 'total', 'expense_count')), incremental
+        )
+
+        merged = CategorySpendingStats.objects.get(category=self.food)
+        call_command('rebuild_spending_stats', stdout=StringIO())
+        rebuilt = CategorySpendingStats.objects.get(category=self.food)
+        self.assertEqual(merged.count, rebuilt.count)
+        for name in ('mean', 'm2', 'decayed_weight', 'decayed_mean', 'decayed_m2'):
+            self.assertAlmostEqual(getattr(merged, name), getattr(rebuilt, name), places=4)
+
+    def test_signed_csv_import_keeps_debits_only(self):
+        today = date.today()
+        lines = [
+            'Date,Description,Amount', f'{today},Salary,2500.00', f'{today},Bakery,-5.00',
+            f'{today},Refund,12.00', f'{today},Rent,"(900.00)"', f'{today},Fee,0.00',
+        ]
+
+        result = import_expenses(self.user, BytesIO('\n'.join(lines).encode()), 'csv')
+
+        self.assertEqual((result.created, result.credits, result.skipped), (2, 2, 1))
+        self.assertEqual(
+            dict(Expense.objects.filter(user=self.user).values_list('description', 'amount')),
+            {'Bakery': Decimal('5.00'), 'Rent': Decimal('900.00')}
+        )
+
+    def test_ofx_import_keeps_debits_only(self):
+        statement = (
+            'OFXHEADER:100\nDATA:OFXSGML\n<OFX><BANKTRANLIST>'
+            '<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250403120000<TRNAMT>-42.10<NAME>Coffee Shop<MEMO>Card 1234</STMTTRN>'
+            '<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20250404<TRNAMT>1500.00<NAME>Salary</STMTTRN>\n'
+            '<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>20250405\n<TRNAMT>-8.00\n<NAME>Bakery\n</STMTTRN>\n'
+            '</BANKTRANLIST></OFX>'
+        )
+
+        result = import_expenses(self.user, BytesIO(statement.encode()), 'ofx')
+
+        self.assertEqual(result.created, 2)
+        self.assertEqual(
+            sorted(Expense.objects.values_list('description', 'amount', 'date')),
+            [('Bakery', Decimal('8.00'), date(2025, 4, 5)), ('Coffee Shop', Decimal('42.10'), date(2025, 4, 3))]
+        )
+
+
+class CategorySpendingStatsTests(TestCase):
+    """Tests for the running per-category statistics used by anomaly detection."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='stats@example.com', password='StrongPass123')
+        self.food = ExpenseCategory.objects.create(name='Groceries')
+        self.other = ExpenseCategory.objects.create(name='Other')
+
+    def stats(self, category):
+        stats = CategorySpendingStats.objects.get(user=self.user, category=category)
+        return (stats.count, round(stats.mean, 6), round(stats.std, 6),
+                round(stats.decayed_mean, 6), round(stats.decayed_std, 6))
+
+    def test_uncategorized_stats_are_unique(self):
+        Expense.objects.create(user=self.user, amount=Decimal('5.00'), description='Expense', date=date(2025, 3, 1))
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CategorySpendingStats.objects.create(user=self.user)
+
+        # A writer that lost the race to insert the row updates the winner's row instead
+        get_or_create = QuerySet.get_or_create
+        lost = []
+
+        def lose_first_insert(queryset, **kwargs):
+            if not lost:
+                lost.append(True)
+                raise IntegrityError('duplicate key')
+            return get_or_create(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'get_or_create', lose_first_insert):
+            update_stats(self.user.pk, None, lambda stats: add_value(stats, Decimal('7.00'), date(2025, 3, 2)))
+        self.assertEqual(self.stats(None)[:2], (2, 6.0))
+
+    def test_incremental_stats_match_rebuild(self):
+        start = date(2025, 1, 1)
+        expenses = [
+            Expense.objects.create(
+                user=self.user, category=self.food, amount=Decimal(amount),
+                description='Market', date=start + timedelta(days=offset)
+            )
+            for offset, amount in [(40, '12.50'), (0, '30.00'), (75, '8.25'), (10, '19.99'), (120, '55.00')]
+        ]
+        expenses[1].amount = Decimal('31.00')
+        expenses[1].save()
+        expenses[2].category = self.other
+        expenses[2].save()
+        expenses[3].delete()
+
+        incremental = self.stats(self.food)
+        self.assertEqual(incremental[0], 3)
+        self.assertAlmostEqual(incremental[1], (12.50 + 31.00 + 55.00) / 3, places=5)
+
+        call_command('rebuild_spending_stats', stdout=StringIO())
+        self.assertEqual(self.stats(self.food), incremental)
+        self.assertEqual(self.stats(self.other)[:2], (1, 8.25))
+
+    def test_detect_anomalies_reads_one_stats_row(self):
+        for day in range(1, 7):
+            Expense.objects.create(
+                user=self.user, category=self.food, amount=Decimal('100.00') + day,
+                description='Market', date=date(2025, 3, day)
+            )
+        spike = Expense.objects.create(
+            user=self.user, category=self.food, amount=Decimal('400.00'), description='Market', date=date(2025, 3, 7)
+        )
+        normal = Expense.objects.create(
+            user=self.user, category=self.food, amount=Decimal('103.00'), description='Market', date=date(2025, 3, 8)
+        )
+
+        with self.assertNumQueries(1):
+            detect_anomalies(normal)
+        detect_anomalies(spike)
+
+        self.assertEqual(list(AnomalyDetection.objects.values_list('expense_id', flat=True)), [spike.pk])
+        self.assertTrue(Expense.objects.get(pk=spike.pk).is_flagged)
+
+    def test_batch_detection_matches_detect_anomalies(self):
+        amounts = ['20.00', '22.00', '19.00', '90.00', '21.00', '23.00', '18.00', '60.00', '20.50', '150.00']
+        expenses = [
+            Expense.objects.create(
+                user=self.user, category=self.food, amount=Decimal(amount), description='Market',
+                date=date(2025, 1, 1) + timedelta(days=9 * index)
+            )
+            for index, amount in enumerate(amounts)
+        ]
+
+        for expense in expenses:
+            detect_anomalies(expense)
+        single = dict(AnomalyDetection.objects.values_list('expense_id', 'confidence_score'))
+        self.assertTrue(single)
+        AnomalyDetection.objects.all().delete()
+
+        self.assertEqual(detect_anomalies_batch(self.user, [expense.pk for expense in expenses]), len(single))
+        batch = dict(AnomalyDetection.objects.values_list('expense_id', 'confidence_score'))
+        self.assertEqual(set(batch), set(single))
+        for expense_id, confidence in single.items():
+            self.assertAlmostEqual(batch[expense_id], confidence, places=6)
+
+    def test_far_future_dates_do_not_decay_the_history_away(self):
+        for day in range(1, 7):
+            Expense.objects.create(
+                user=self.user, category=self.food, amount=Decimal('100.00'), description='Market',
+                date=date.today() - timedelta(days=day)
+            )
+        Expense.objects.create(
+            user=self.user, category=self.food, amount=Decimal('100.00'), description='Typo', date=date(2999, 1, 1)
+        )
+
+        stats = CategorySpendingStats.objects.get(user=self.user, category=self.food)
+        self.assertLessEqual(stats.decay_date, date.today())
+        self.assertGreater(stats.decayed_weight, 6)
+        self.assertAlmostEqual(stats.decayed_mean, 100.0)
+
+
+class AnomalyRescanTests(TestCase):
+    """Tests for the vectorized anomaly rescan command."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.food = ExpenseCategory.objects.create(name='Groceries')
+        self.users = [
+            User.objects.create_user(email=f'rescan{i}@example.com', password='StrongPass123') for i in range(3)
+        ]
+        self.spikes = []
+        for user in self.users:
+            for day in range(1, 11):
+                Expense.objects.create(
+                    user=user, category=self.food, amount=Decimal('50.00') + day % 3,
+                    description='Market', date=date(2025, 1, day)
+                )
+            self.spikes.append(Expense.objects.create(
+                user=user, category=self.food, amount=Decimal('500.00'), description='TV', date=date(2025, 1, 20)
+            ))
+        # An expense with too little history in its category is never scored
+        Expense.objects.create(user=self.users[0], amount=Decimal('900.00'), description='Flight', date=date(2025, 1, 21))
+
+    def test_rescan_flags_spikes_and_respects_reviews(self):
+        AnomalyDetection.objects.create(
+            user=self.users[1], expense=self.spikes[1], anomaly_type='spike', confidence_score=1.0,
+            description='Reviewed', is_reviewed=True, is_false_positive=True
+        )
+        stale = Expense.objects.filter(user=self.users[2], amount=Decimal('50.00')).first()
+        stale.is_flagged = True
+        stale.save()
+
+        out = StringIO()
+        call_command('rescan_anomalies', '--partition-size', '2', stdout=out)
+
+        self.assertIn('rows/s', out.getvalue())
+        self.assertEqual(
+            set(AnomalyDetection.objects.filter(is_reviewed=False).values_list('expense_id', flat=True)),
+            {self.spikes[0].pk, self.spikes[2].pk}
+        )
+        self.assertEqual(
+            set(Expense.objects.filter(is_flagged=True).values_list('pk', flat=True)),
+            {self.spikes[0].pk, self.spikes[2].pk}
+        )
+        rescan = AnomalyRescan.objects.get()
+        self.assertEqual((rescan.rows_scanned, rescan.last_user_id), (34, self.users[-1].pk))
+        self.assertIsNotNone(rescan.finished_at)
+
+    def test_rescan_keeps_other_flags_and_bumps_dashboard_versions(self):
+        fraud = Expense.objects.filter(user=self.users[0], amount=Decimal('51.00')).first()
+        AnomalyDetection.objects.create(
+            user=self.users[0], expense=fraud, anomaly_type='fraud_flag', confidence_score=0.9, description='Fraud'
+        )
+        fraud.is_flagged = True
+        fraud.save()
+        versions = [get_data_version(user.pk) for user in self.users]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rescan_partition([user.pk for user in self.users])
+
+        self.assertTrue(Expense.objects.get(pk=fraud.pk).is_flagged)
+        self.assertTrue(AnomalyDetection.objects.filter(anomaly_type='fraud_flag').exists())
+        for user, version in zip(self.users, versions):
+            self.assertNotEqual(get_data_version(user.pk), version)
+
+    def test_vectorized_mad_matches_a_rolling_apply(self):
+        rng = np.random.default_rng(7)
+        frame = pd.DataFrame({
+            'user_id': np.repeat([1, 2], 150),
+            'category_id': np.tile(np.repeat([-1, 4, 9], 50), 2),
+            'date': pd.to_datetime('2024-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 400, 300)) % 400, 'D'),
+            'amount': rng.gamma(2.0, 30.0, 300).round(2),
+        }).sort_values(['user_id', 'category_id', 'date'], kind='stable').reset_index(drop=True)
+
+        windows = frame.groupby(['user_id', 'category_id'], sort=False).rolling('60D', on='date', closed='left')['amount']
+        expected_medians = windows.median().to_numpy()
+        expected_spreads = windows.apply(
+            lambda values: np.median(np.abs(values - np.median(values))) / MAD_SCALE, raw=True
+        ).to_numpy()
+
+        medians, spreads = rolling_median_mad(frame, 60, max_cells=500)
+        np.testing.assert_allclose(medians, expected_medians, equal_nan=True)
+        np.testing.assert_allclose(spreads, expected_spreads, equal_nan=True)
+
+    def test_resume_continues_after_checkpoint(self):
+        AnomalyRescan.objects.create(threshold=2, window_days=180, min_history=5, last_user_id=self.users[1].pk)
+
+        call_command('rescan_anomalies', '--resume', stdout=StringIO())
+
+        self.assertEqual(
+            list(AnomalyDetection.objects.values_list('expense_id', flat=True)), [self.spikes[2].pk]
+        )
+        self.assertIsNotNone(AnomalyRescan.objects.get().finished_at)
+
+
+class RecurringOccurrenceTests(TestCase):
+    """Tests for on-demand recurring expense occurrences."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='recurring@example.com', password='StrongPass123')
+
+    def test_dates_are_generated_for_the_window_only(self):
+        rent = Expense.objects.create(
+            user=self.user, amount=Decimal('900.00'), description='Rent',
+            date=date(2025, 1, 31), recurrence='monthly'
+        )
+        self.assertEqual(
+            list(occurrence_dates(rent, date(2025, 2, 1), date(2025, 5, 31))),
+            [date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30), date(2025, 5, 31)]
+        )
+
+        coffee = Expense.objects.create(
+            user=self.user, amount=Decimal('3.00'), description='Coffee',
+            date=date(2020, 1, 1), recurrence='daily', recurrence_end_date=date(2030, 1, 1)
+        )
+        self.assertEqual(list(occurrence_dates(coffee, date(2025, 6, 1), date(2025, 6, 3))),
+                         [date(2025, 6, 1), date(2025, 6, 2), date(2025, 6, 3)])
+        # Nothing is stored for a rule spanning a decade
+        self.assertFalse(RecurringExpense.objects.exists())
+
+    def test_stored_exceptions_replace_generated_occurrences(self):
+        gym = Expense.objects.create(
+            user=self.user, amount=Decimal('40.00'), description='Gym',
+            date=date(2025, 3, 3), recurrence='weekly', recurrence_end_date=date(2025, 4, 30)
+        )
+        RecurringExpense.objects.create(
+            parent_expense=gym, occurrence_date=date(2025, 3, 17), date=date(2025, 3, 18),
+            amount=Decimal('45.00'), is_paid=True
+        )
+        # Moved out of the window
+        RecurringExpense.objects.create(
+            parent_expense=gym, occurrence_date=date(2025, 3, 24), date=date(2025, 4, 2),
+            amount=Decimal('40.00'), is_modified=True
+        )
+
+        with self.assertNumQueries(2):
+            window = occurrences(self.user, date(2025, 3, 1), date(2025, 3, 31))
+
+        self.assertEqual(
+            [(occurrence.date, occurrence.amount, occurrence.is_virtual) for occurrence in window],
+            [(date(2025, 3, 10), Decimal('40.00'), True), (date(2025, 3, 18), Decimal('45.00'), False),
+             (date(2025, 3, 31), Decimal('40.00'), True)]
+        )
+
+
+class KeysetPaginationTests(TestCase):
+    """Tests for keyset-paginated expense pages and the JSON feed."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='pages@example.com', password='StrongPass123')
+        # Several expenses share each date so pages must break ties on id
+        for i in range(25):
+            Expense.objects.create(
+                user=self.user, amount=Decimal(i + 1), description=f'Expense {i}', date=date(2025, 1, 1 + i // 3)
+            )
+
+    def walk(self, page_size):
+        expenses = Expense.objects.filter(user=self.user)
+        seen, cursor = [], None
+        while True:
+            page = keyset_page(expenses, after=cursor, page_size=page_size)
+            seen.extend(expense.pk for expense in page.items)
+            if page.next_cursor is None:
+                return seen
+            cursor = page.next_cursor
+
+    def test_pages_cover_every_expense_once_in_order(self):
+        expected = list(Expense.objects.filter(user=self.user).order_by('-date', '-pk').values_list('pk', flat=True))
+        self.assertEqual(self.walk(page_size=4), expected)
+
+    def test_every_page_costs_one_query(self):
+        expenses = Expense.objects.filter(user=self.user)
+        page = keyset_page(expenses, page_size=5)
+        for _ in range(3):
+            with self.assertNumQueries(1):
+                page = keyset_page(expenses, after=page.next_cursor, page_size=5)
+
+    def test_cursors_are_stable_under_concurrent_inserts(self):
+        expenses = Expense.objects.filter(user=self.user)
+        first = keyset_page(expenses, page_size=5)
+        expected = keyset_page(expenses, after=first.next_cursor, page_size=5).items
+
+        # Newer expenses arrive while the user reads page one
+        for i in range(3):
+            Expense.objects.create(user=self.user, amount=Decimal('9.00'), description='New', date=date(2025, 2, 1))
+
+        self.assertEqual(keyset_page(expenses, after=first.next_cursor, page_size=5).items, expected)
+
+    def test_previous_page_returns_to_the_same_rows(self):
+        expenses = Expense.objects.filter(user=self.user)
+        first = keyset_page(expenses, page_size=5)
+        second = keyset_page(expenses, after=first.next_cursor, page_size=5)
+
+        back = keyset_page(expenses, before=second.previous_cursor, page_size=5)
+        self.assertEqual(back.items, first.items)
+        self.assertIsNone(back.previous_cursor)
+
+    def test_feed_returns_cursors_and_bounds_page_size(self):
+        request = RequestFactory().get('/expenses/feed/', {'page_size': 10000})
+        request.user = self.user
+        data = json.loads(expense_feed(request).content)
+
+        self.assertEqual(len(data['results']), 25)
+        self.assertIsNone(data['next'])
+        self.assertEqual(page_size_from('10000'), MAX_PAGE_SIZE)
+
+        request = RequestFactory().get('/expenses/feed/', {'page_size': 10, 'after': 'not-a-cursor'})
+        request.user = self.user
+        self.assertEqual(expense_feed(request).status_code, 400)
+
+
+class ExpenseSearchTests(TestCase):
+    """Tests for the full-text expense search index."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='search@example.com', password='StrongPass123')
+        self.other = User.objects.create_user(email='other-search@example.com', password='StrongPass123')
+
+    def add(self, description, user=None, notes=None, day=1):
+        return Expense.objects.create(
+            user=user or self.user, amount=Decimal('10.00'), description=description, notes=notes,
+            date=date(2025, 1, day)
+        )
+
+    def search(self, text, **kwargs):
+        return list(search_expenses(Expense.objects.filter(user=self.user), text, user=self.user, **kwargs))
+
+    def test_matches_word_prefixes_in_description_and_notes(self):
+        groceries = self.add('Grocery supplies')
+        dinner = self.add('Dinner', notes='groceries were out')
+        self.add('Fuel')
+        self.add('Grocery supplies', user=self.other)
+
+        self.assertEqual(set(self.search('groc')), {groceries, dinner})
+        self.assertEqual(self.search('groc sup'), [groceries])
+        self.assertEqual(self.search('ocery'), [])
+
+    def test_index_follows_updates_deletes_and_bulk_creates(self):
+        expense = self.add('Cinema tickets')
+        expense.description = 'Theatre tickets'
+        expense.save()
+        self.assertEqual(self.search('cinema'), [])
+        self.assertEqual(self.search('theatre'), [expense])
+
+        Expense.objects.filter(pk=expense.pk).update(description='Concert tickets')
+        self.assertEqual(self.search('concert'), [expense])
+
+        expense.delete()
+        self.assertEqual(self.search('tickets'), [])
+
+        Expense.objects.bulk_create([
+            Expense(user=self.user, amount=Decimal('5.00'), description='Bakery', date=date(2025, 1, 2))
+        ])
+        self.assertEqual(len(self.search('bakery')), 1)
+
+    def test_ranked_results_prefer_description_matches(self):
+        in_notes = self.add('Dinner', notes='pizza', day=5)
+        in_description = self.add('Pizza night', day=1)
+
+        self.assertEqual(self.search('pizza', ranked=True), [in_description, in_notes])
+
+    def test_filter_form_uses_the_index(self):
+        self.add('Coffee beans')
+        request = RequestFactory().get('/expenses/feed/', {'description': 'coff'})
+        request.user = self.user
+
+        with CaptureQueriesContext(connection) as queries:
+            data = json.loads(expense_feed(request).content)
+
+        self.assertEqual([row['description'] for row in data['results']], ['Coffee beans'])
+        self.assertTrue(any('MATCH' in query['sql'] for query in queries))
+
+
+class ColumnarAnalyticsTests(TestCase):
+    """Tests for the per-user columnar expense store behind expense analytics."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(EXPENSE_COLUMNS_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        User = get_user_model()
+        self.user = User.objects.create_user(email='columns@example.com', password='StrongPass123')
+        self.food = ExpenseCategory.objects.create(name='Food')
+        self.rent = ExpenseCategory.objects.create(name='Rent')
+        with self.captureOnCommitCallbacks(execute=True):
+            for day, amount, category in [
+                (date(2025, 1, 6), '12.50', self.food), (date(2025, 1, 31), '900.00', self.rent),
+                (date(2025, 2, 3), '7.25', self.food), (date(2025, 2, 4), '3.10', None),
+            ]:
+                Expense.objects.create(user=self.user, amount=Decimal(amount), description='x', date=day, category=category)
+
+    def test_analytics_are_computed_from_the_columns(self):
+        data = expense_analytics_data(self.user.pk)
+
+        self.assertEqual(data['monthly_trend'], [
+            {'date': '2025-01', 'amount': Decimal('912.50')}, {'date': '2025-02', 'amount': Decimal('10.35')}
+        ])
+        self.assertEqual(data['category_breakdown'], [
+            {'category__name': 'Rent', 'amount': Decimal('900.00')},
+            {'category__name': 'Food', 'amount': Decimal('19.75')},
+        ])
+        self.assertEqual(data['day_of_week'], [
+            {'day_of_week': 'Friday', 'amount': Decimal('900.00')},
+            {'day_of_week': 'Monday', 'amount': Decimal('19.75')},
+            {'day_of_week': 'Tuesday', 'amount': Decimal('3.10')},
+        ])
+        self.assertEqual(data['largest_expenses'][0]['amount'], Decimal('900.00'))
+        self.assertEqual(data['total_expenses'], Decimal('922.85'))
+        self.assertEqual(data['avg_monthly'], Decimal('461.425'))
+        self.assertEqual(data['num_transactions'], 4)
+
+    def test_new_expenses_are_appended_after_commit(self):
+        self.assertEqual(len(load_columns(self.user.pk)), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            expense = Expense.objects.create(user=self.user, amount=Decimal('1.00'), description='x', date=date(2025, 3, 1))
+
+        # Served from the files without rebuilding from the database
+        with self.assertNumQueries(0):
+            columns = load_columns(self.user.pk)
+        self.assertEqual(len(columns), 5)
+        self.assertEqual(int(columns.pk[-1]), expense.pk)
+        self.assertEqual(int(columns.cents[-1]), 100)
+
+    def test_edits_and_deletes_rebuild_the_columns(self):
+        load_columns(self.user.pk)
+        expense = Expense.objects.get(amount=Decimal('900.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            expense.amount = Decimal('950.00')
+            expense.save()
+        self.assertEqual(expense_analytics_data(self.user.pk)['total_expenses'], Decimal('972.85'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            expense.delete()
+        self.assertEqual(expense_analytics_data(self.user.pk)['num_transactions'], 3)
+
+    def test_flagging_an_expense_keeps_the_columns(self):
+        load_columns(self.user.pk)
+        expense = Expense.objects.first()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            expense.is_flagged = True
+            expense.save()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(len(load_columns(self.user.pk)), 4)
+
+
+class StreamingExportTests(TestCase):
+    """Tests for the streaming CSV and XLSX exports."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='export@example.com', password='StrongPass123')
+        food = ExpenseCategory.objects.create(name='Food')
+        for day, description in [(3, 'Bread, "sourdough"'), (1, 'Milk & eggs'), (20, 'Cheese')]:
+            Expense.objects.create(
+                user=self.user, amount=Decimal('4.50'), description=description, date=date(2025, 1, day), category=food
+            )
+
+    def export(self, **params):
+        request = RequestFactory().get('/expenses/export/', params)
+        request.user = self.user
+        return expense_export(request)
+
+    def test_csv_is_streamed_in_date_order_within_the_range(self):
+        response = self.export(start_date='2025-01-02')
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="expenses-from-2025-01-02.csv"')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode('utf-8-sig').splitlines()))
+        self.assertEqual(rows[0], ['Date', 'Description', 'Category', 'Amount', 'Recurrence', 'Flagged', 'Notes'])
+        self.assertEqual(rows[1:], [
+            ['2025-01-03', 'Bread, "sourdough"', 'Food', '4.50', 'none', 'False', ''],
+            ['2025-01-20', 'Cheese', 'Food', '4.50', 'none', 'False', ''],
+        ])
+
+    def test_xlsx_is_a_valid_workbook(self):
+        response = self.export(format='xlsx', end_date='2025-01-10')
+        archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+
+        self.assertIn('xl/workbook.xml', archive.namelist())
+        sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        ns = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        rows = sheet.findall('.//x:row', ns)
+        self.assertEqual(len(rows), 3)
+        # Dates are Excel serials with the date style, text is inline
+        first = rows[1].findall('x:c', ns)
+        self.assertEqual((first[0].get('s'), first[0].find('x:v', ns).text), ('1', '45658'))
+        self.assertEqual(first[1].find('.//x:t', ns).text, 'Milk & eggs')
+
+    def test_rows_are_read_only_while_streaming(self):
+        with self.assertNumQueries(0):
+            response = self.export()
+        with self.assertNumQueries(1):
+            content = b''.join(response.streaming_content)
+        self.assertEqual(content.count(b'\n'), 4)
+
+    def test_invalid_range_is_rejected(self):
+        self.assertEqual(self.export(start_date='2025-02-01', end_date='2025-01-01').status_code, 400)
+        self.assertEqual(self.export(format='pdf').status_code, 400)
+
+
+class CategoryRuleTests(TestCase):
+    """Tests for rule-based automatic categorization."""
+
+    def setUp(self):
+        # Rules rolled back by earlier tests send no signals
+        invalidate_rules()
+        self.addCleanup(invalidate_rules)
+
+        User = get_user_model()
+        self.user = User.objects.create_user(email='rules@example.com', password='StrongPass123')
+        self.other = User.objects.create_user(email='other-rules@example.com', password='StrongPass123')
+        self.food = ExpenseCategory.objects.create(name='Food')
+        self.coffee = ExpenseCategory.objects.create(name='Coffee')
+        self.travel = ExpenseCategory.objects.create(name='Travel')
+        self.big = ExpenseCategory.objects.create(name='Big ticket')
+
+        CategoryRule.objects.create(pattern='market', category=self.food)
+        CategoryRule.objects.create(pattern='coffee', category=self.coffee, priority=5)
+        CategoryRule.objects.create(pattern='air france', category=self.travel, match_type='merchant')
+        CategoryRule.objects.create(pattern='', category=self.big, min_amount=Decimal('1000.00'), priority=-1)
+
+    def test_rules_match_whole_words_by_precedence(self):
+        self.assertEqual(categorize('Farmers MARKET, stall 4', Decimal('12.00'), self.user.pk), self.food.pk)
+        self.assertEqual(categorize('Supermarket', Decimal('12.00'), self.user.pk), None)
+        # Higher priority wins when several patterns occur
+        self.assertEqual(categorize('Market coffee stand', Decimal('4.00'), self.user.pk), self.coffee.pk)
+        # Amount-only rules apply when no pattern matches
+        self.assertEqual(categorize('Jeweller', Decimal('2500.00'), self.user.pk), self.big.pk)
+
+    def test_merchant_rules_are_anchored_at_the_start(self):
+        self.assertEqual(categorize('Air France AF1234 CDG', Decimal('300.00'), self.user.pk), self.travel.pk)
+        self.assertEqual(categorize('Refund from Air France', Decimal('300.00'), self.user.pk), None)
+
+    def test_user_rules_override_global_rules_for_their_owner_only(self):
+        CategoryRule.objects.create(user=self.user, pattern='market', category=self.coffee, max_amount=Decimal('50'))
+
+        self.assertEqual(categorize('Market', Decimal('20.00'), self.user.pk), self.coffee.pk)
+        self.assertEqual(categorize('Market', Decimal('80.00'), self.user.pk), self.food.pk)
+        self.assertEqual(categorize('Market', Decimal('20.00'), self.other.pk), self.food.pk)
+
+    def test_rule_changes_rebuild_the_automaton(self):
+        self.assertEqual(categorize('Bakery', Decimal('5.00'), self.user.pk), None)
+
+        rule = CategoryRule.objects.create(pattern='bakery', category=self.food)
+        self.assertEqual(categorize('Bakery', Decimal('5.00'), self.user.pk), self.food.pk)
+
+        rule.delete()
+        self.assertEqual(categorize('Bakery', Decimal('5.00'), self.user.pk), None)
+
+    def test_rules_written_elsewhere_reach_this_process(self):
+        self.assertEqual(categorize('Bakery', Decimal('5.00'), self.user.pk), None)
+
+        # bulk_create sends no signals, like a write made by another process
+        CategoryRule.objects.bulk_create([CategoryRule(pattern='bakery', category=self.food)])
+        self.assertEqual(categorize('Bakery', Decimal('5.00'), self.user.pk), None)
+
+        categorizer._checked_at -= categorizer.RULES_CHECK_INTERVAL
+        self.assertEqual(categorize('Bakery', Decimal('5.00'), self.user.pk), self.food.pk)
+
+    def test_overlapping_patterns_are_all_found(self):
+        automaton = compile_rules([
+            CategoryRule(pk=1, pattern='a b c', category_id=1),
+            CategoryRule(pk=2, pattern='b c d', category_id=2),
+            CategoryRule(pk=3, pattern='c', category_id=3),
+        ])
+
+        self.assertEqual([automaton.rules[i].pk for i in automaton.candidates('a b c d')], [1, 2, 3])
+        self.assertEqual([automaton.rules[i].pk for i in automaton.candidates('x b c d')], [2, 3])
+
+    def test_new_expenses_and_imports_are_categorized(self):
+        expense = Expense.objects.create(user=self.user, amount=Decimal('3.50'), description='Coffee', date=date.today())
+        chosen = Expense.objects.create(
+            user=self.user, amount=Decimal('3.50'), description='Coffee', date=date.today(), category=self.food
+        )
+        self.assertEqual(expense.category, self.coffee)
+        self.assertEqual(chosen.category, self.food)
+
+        lines = ['Date,Description,Amount,Category', f'{date.today()},Night market,20.00,', f'{date.today()},Other,5.00,']
+        import_expenses(self.user, BytesIO('\n'.join(lines).encode()), 'csv')
+
+        self.assertEqual(Expense.objects.get(description='Night market').category, self.food)
+        self.assertIsNone(Expense.objects.get(description='Other').category)
+        self.assertEqual(
+            MonthlyExpenseRollup.objects.get(user=self.user, category=self.food, month__lte=date.today()).expense_count,
+            2
+        )
+
+    def test_backfill_categorizes_existing_expenses(self):
+        expense = Expense.objects.create(user=self.user, amount=Decimal('9.00'), description='Lunch', date=date.today())
+        self.assertIsNone(expense.category)
+        CategoryRule.objects.create(user=self.user, pattern='lunch', category=self.food)
+        version = get_data_version(self.user.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('categorize_expenses', stdout=StringIO())
+
+        expense.refresh_from_db()
+        self.assertEqual(expense.category, self.food)
+        self.assertEqual(MonthlyExpenseRollup.objects.get(user=self.user).category, self.food)
+        self.assertNotEqual(get_data_version(self.user.pk), version)
+        self.assertEqual(categorize_many(self.user.pk, [('lunch', Decimal('1')), ('Dinner', Decimal('1'))]), [self.food.pk, None])
+
+
+class DuplicateExpenseTests(TestCase):
+    """Tests for fingerprint-based duplicate detection."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='dupes@example.com', password='StrongPass123')
+        self.other = User.objects.create_user(email='other-dupes@example.com', password='StrongPass123')
+        self.expense = Expense.objects.create(
+            user=self.user, amount=Decimal('42.10'), description='Coffee Shop #12', date=date(2025, 4, 3)
+        )
+
+    def test_fingerprint_ignores_case_punctuation_and_spacing(self):
+        self.assertEqual(
+            self.expense.fingerprint, expense_fingerprint(date(2025, 4, 3), '42.1', '  coffee   shop 12.')
+        )
+        self.assertNotEqual(self.expense.fingerprint, expense_fingerprint(date(2025, 4, 4), '42.10', 'Coffee Shop 12'))
+
+        self.expense.amount = Decimal('40.00')
+        self.expense.save()
+        self.assertEqual(self.expense.fingerprint, expense_fingerprint(date(2025, 4, 3), '40', 'coffee shop 12'))
+
+    def test_single_insert_check_is_one_indexed_lookup(self):
+        with self.assertNumQueries(1) as captured:
+            duplicate = find_duplicate(self.user.pk, date(2025, 4, 3), Decimal('42.10'), 'COFFEE SHOP 12')
+        self.assertEqual(duplicate, self.expense)
+        self.assertIsNone(find_duplicate(self.other.pk, date(2025, 4, 3), Decimal('42.10'), 'Coffee Shop 12'))
+        self.assertIsNone(find_duplicate(self.user.pk, date(2025, 4, 3), '42.10', 'Coffee Shop 12', self.expense.pk))
+
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + captured.captured_queries[0]['sql'].replace('%s', "''"))
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        if connection.vendor == 'sqlite':
+            self.assertIn('expense_user_fingerprint_idx', plan)
+
+    def test_expense_form_rejects_a_double_submit(self):
+        category = ExpenseCategory.objects.create(name='Coffee')
+        data = {
+            'category': category.pk, 'amount': '42.10', 'description': 'Coffee shop 12', 'date': '2025-04-03',
+            'recurrence': 'none',
+        }
+
+        form = ExpenseForm(data, user=self.user)
+        self.assertFalse(form.is_valid())
+        self.assertIn('already recorded', form.non_field_errors()[0])
+
+        self.assertTrue(ExpenseForm(dict(data, allow_duplicate='on'), user=self.user).is_valid())
+        self.assertTrue(ExpenseForm(data, user=self.other).is_valid())
+        self.assertTrue(ExpenseForm(data, instance=self.expense, user=self.user).is_valid())
+
+    def test_reimporting_a_statement_skips_stored_rows(self):
+        lines = ['Date,Description,Amount', '2025-04-03,Coffee shop 12,42.10', '2025-04-05,Bakery,8.00',
+                 '2025-04-05,Bakery,8.00']
+        statement = '\n'.join(lines).encode()
+
+        first = import_expenses(self.user, BytesIO(statement), 'csv', chunk_size=2)
+        second = import_expenses(self.user, BytesIO(statement), 'csv', chunk_size=2)
+
+        # Identical rows within one file are separate purchases
+        self.assertEqual((first.created, first.duplicates), (2, 1))
+        self.assertEqual((second.created, second.duplicates), (0, 3))
+        self.assertEqual(Expense.objects.filter(user=self.user, description='Bakery').count(), 2)
+        self.assertEqual(MonthlyExpenseRollup.objects.get(user=self.user).expense_count, 3)
+
+    def test_near_duplicates_are_grouped_within_the_window(self):
+        for day, amount, description in [
+            (5, '42.10', 'coffee shop 12'), (20, '42.10', 'Coffee Shop 12'), (4, '42.10', 'Tea room'),
+            (1, '9.99', 'Streaming'), (3, '9.99', 'streaming!'), (6, '9.99', 'Streaming'),
+        ]:
+            Expense.objects.create(user=self.user, amount=Decimal(amount), description=description, date=date(2025, 4, day))
+        Expense.objects.create(user=self.other, amount=Decimal('42.10'), description='Coffee Shop 12', date=date(2025, 4, 3))
+
+        groups = near_duplicate_groups(self.user.pk, days=3)
+
+        self.assertEqual([(group.amount, group.description, len(group.pks)) for group in groups], [
+            (Decimal('9.99'), 'streaming', 3), (Decimal('42.10'), 'coffee shop 12', 2),
+        ])
+        self.assertEqual(groups[1].pks[0], self.expense.pk)
+
+        output = StringIO()
+        call_command('find_duplicate_expenses', user_ids=[self.user.pk], days=0, stdout=output)
+        self.assertIn('Found 0 groups', output.getvalue())
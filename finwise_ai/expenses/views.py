@@ -1,15 +1,29 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.db.models import Sum, Avg
 from django.utils import timezone
+from django.views.decorators.http import require_GET
 from datetime import datetime, timedelta
+from finwise.exports import export_queryset
 from .models import Expense, ExpenseCategory, RecurringExpense, AnomalyDetection
-from .forms import ExpenseForm, ExpenseCategoryForm, ExpenseFilterForm, RecurringExpenseForm
+from .anomalies import MIN_HISTORY, SPIKE_STD_DEVIATIONS
+from .columnar import expense_analytics_data
+from .forms import ExpenseForm, ExpenseCategoryForm, ExpenseFilterForm, ExpenseImportForm, RecurringExpenseForm
+from .importers import ImportFormatError, import_expenses
+from .pagination import InvalidCursor, keyset_page, page_size_from
+from .search import rank_expenses, search_expenses
+from .recurrence import is_scheduled, occurrences, totals_by_month
+from .rollups import category_totals, expense_total, month_start, monthly_totals
+from .stats import baseline_for
 import json
-import pandas as pd
-import numpy as np
+
+# Filters that cannot be answered from monthly rollups
+ROW_LEVEL_FILTERS = ('start_date', 'end_date', 'min_amount', 'max_amount', 'description')
+
+# How far ahead upcoming recurring occurrences are listed
+RECURRING_WINDOW_DAYS = 90
 
 @login_required
 def expense_home(request):
@@ -17,48 +31,52 @@ def expense_home(request):
     # Get filter parameters
     form = ExpenseFilterForm(request.GET, user=request.user)
     
-    # Base queryset
-    expenses = Expense.objects.filter(user=request.user)
+    expenses = filter_expenses(Expense.objects.filter(user=request.user), form, request.user)
     
-    # Apply filters if form is valid
-    if form.is_valid():
-        if form.cleaned_data.get('start_date'):
-            expenses = expenses.filter(date__gte=form.cleaned_data['start_date'])
-        if form.cleaned_data.get('end_date'):
-            expenses = expenses.filter(date__lte=form.cleaned_data['end_date'])
-        if form.cleaned_data.get('category'):
-            expenses = expenses.filter(category=form.cleaned_data['category'])
-        if form.cleaned_data.get('min_amount'):
-            expenses = expenses.filter(amount__gte=form.cleaned_data['min_amount'])
-        if form.cleaned_data.get('max_amount'):
-            expenses = expenses.filter(amount__lte=form.cleaned_data['max_amount'])
-        if form.cleaned_data.get('description'):
-            expenses = expenses.filter(description__icontains=form.cleaned_data['description'])
+    # Rollups are exact only when no row-level filter narrows the expenses
+    filters = form.cleaned_data if form.is_valid() else {}
+    use_rollups = not any(filters.get(field) for field in ROW_LEVEL_FILTERS)
+    
+    today = timezone.now().date()
+    six_months_ago = today - timedelta(days=180)
+    # The line chart shows whole months, so both paths start on the first of a month
+    chart_start = month_start(six_months_ago)
     
     # Get expense categories for the pie chart
-    categories = ExpenseCategory.objects.all()
-    category_data = []
+    if use_rollups:
+        category_rows = category_totals(request.user, category=filters.get('category'))
+    else:
+        category_rows = (
+            expenses
+            .filter(category__isnull=False)
+            .values('category_id', 'category__name', 'category__color')
+            .annotate(amount=Sum('amount'))
+            .order_by('-amount')
+        )
     
-    for category in categories:
-        category_sum = expenses.filter(category=category).aggregate(Sum('amount'))['amount__sum'] or 0
-        if category_sum > 0:
+    category_data = []
+    for row in category_rows:
+        if row['amount'] > 0:
             category_data.append({
-                'name': category.name,
-                'amount': float(category_sum),
-                'color': category.color or '#1DE9B6'
+                'name': row['category__name'],
+                'amount': float(row['amount']),
+                'color': row['category__color'] or '#1DE9B6'
             })
     
     # Get monthly totals for the line chart
-    today = timezone.now().date()
-    six_months_ago = today - timedelta(days=180)
-    
-    monthly_expenses = (
-        expenses
-        .filter(date__gte=six_months_ago)
-        .values('date__year', 'date__month')
-        .annotate(total=Sum('amount'))
-        .order_by('date__year', 'date__month')
-    )
+    if use_rollups:
+        monthly_expenses = [
+            {'date__year': month.year, 'date__month': month.month, 'total': total}
+            for month, total in monthly_totals(request.user, chart_start, today, category=filters.get('category')).items()
+        ]
+    else:
+        monthly_expenses = (
+            expenses
+            .filter(date__gte=chart_start)
+            .values('date__year', 'date__month')
+            .annotate(total=Sum('amount'))
+            .order_by('date__year', 'date__month')
+        )
     
     monthly_data = []
     for entry in monthly_expenses:
@@ -68,35 +86,38 @@ def expense_home(request):
             'amount': float(entry['total'])
         })
     
+    if use_rollups:
+        total_expenses = expense_total(request.user, category=filters.get('category'))
+    else:
+        total_expenses = expenses.aggregate(Sum('amount'))['amount__sum'] or 0
+    
     # Get flagged expenses (anomalies)
     flagged_expenses = expenses.filter(is_flagged=True).order_by('-date')[:5]
     
     # Get recurring expenses
     recurring_expenses = expenses.filter(recurrence__in=['daily', 'weekly', 'monthly', 'yearly']).order_by('-date')[:5]
     
+    # Searches list the best matches, otherwise the latest expenses
+    if filters.get('description'):
+        latest = rank_expenses(expenses, filters['description'], user=request.user)[:10]
+    else:
+        latest = expenses.order_by('-date')[:10]
+    
     context = {
-        'expenses': expenses.order_by('-date')[:10],
+        'expenses': latest,
         'filter_form': form,
         'category_data': json.dumps(category_data),
         'monthly_data': json.dumps(monthly_data),
         'flagged_expenses': flagged_expenses,
         'recurring_expenses': recurring_expenses,
-        'total_expenses': expenses.aggregate(Sum('amount'))['amount__sum'] or 0,
+        'total_expenses': total_expenses,
         'avg_monthly': expenses.filter(date__gte=six_months_ago).aggregate(Avg('amount'))['amount__avg'] or 0,
     }
     
     return render(request, 'expenses/expense_home.html', context)
 
-@login_required
-def expense_list(request):
-    """View for listing all expenses."""
-    # Get filter parameters
-    form = ExpenseFilterForm(request.GET, user=request.user)
-    
-    # Base queryset
-    expenses = Expense.objects.filter(user=request.user)
-    
-    # Apply filters if form is valid
+def filter_expenses(expenses, form, user=None):
+    """Apply a valid ExpenseFilterForm to an expense queryset, searching the full-text index for the description."""
     if form.is_valid():
         if form.cleaned_data.get('start_date'):
             expenses = expenses.filter(date__gte=form.cleaned_data['start_date'])
@@ -109,15 +130,69 @@ def expense_list(request):
         if form.cleaned_data.get('max_amount'):
             expenses = expenses.filter(amount__lte=form.cleaned_data['max_amount'])
         if form.cleaned_data.get('description'):
-            expenses = expenses.filter(description__icontains=form.cleaned_data['description'])
+            expenses = search_expenses(expenses, form.cleaned_data['description'], user=user)
+    return expenses
+
+@login_required
+def expense_list(request):
+    """View for listing expenses, one keyset page at a time."""
+    # Get filter parameters
+    form = ExpenseFilterForm(request.GET, user=request.user)
+    expenses = filter_expenses(Expense.objects.filter(user=request.user).select_related('category'), form, request.user)
+    
+    try:
+        page = keyset_page(
+            expenses,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+            page_size=page_size_from(request.GET.get('page_size'))
+        )
+    except InvalidCursor:
+        # Stale or tampered links fall back to the first page
+        page = keyset_page(expenses, page_size=page_size_from(request.GET.get('page_size')))
     
     context = {
-        'expenses': expenses.order_by('-date'),
+        'expenses': page.items,
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
         'filter_form': form,
     }
     
     return render(request, 'expenses/expense_list.html', context)
 
+@login_required
+@require_GET
+def expense_feed(request):
+    """JSON feed of expenses, newest first, paginated with opaque cursors."""
+    form = ExpenseFilterForm(request.GET, user=request.user)
+    expenses = filter_expenses(Expense.objects.filter(user=request.user).select_related('category'), form, request.user)
+    
+    try:
+        page = keyset_page(
+            expenses,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+            page_size=page_size_from(request.GET.get('page_size'))
+        )
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'results': [
+            {
+                'id': expense.pk,
+                'date': expense.date.isoformat(),
+                'amount': str(expense.amount),
+                'description': expense.description,
+                'category': expense.category.name if expense.category else None,
+                'is_flagged': expense.is_flagged,
+            }
+            for expense in page.items
+        ],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
 @login_required
 def expense_create(request):
     """View for creating a new expense."""
@@ -128,10 +203,6 @@ def expense_create(request):
             expense.user = request.user
             expense.save()
             
-            # Handle recurring expenses
-            if expense.recurrence != 'none' and expense.recurrence_end_date:
-                create_recurring_expenses(expense)
-            
             # Check for anomalies
             detect_anomalies(expense)
             
@@ -147,6 +218,35 @@ def expense_create(request):
     
     return render(request, 'expenses/expense_form.html', context)
 
+@login_required
+def expense_import(request):
+    """View for importing expenses in bulk from a CSV or OFX statement."""
+    if request.method == 'POST':
+        form = ExpenseImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                result = import_expenses(request.user, form.cleaned_data['file'], form.cleaned_data['file_format'])
+            except ImportFormatError as e:
+                form.add_error('file', str(e))
+            else:
+                messages.success(request, f'Imported {result.created} expenses ({result.flagged} flagged for review).')
+                if result.skipped:
+                    messages.warning(request, f'Skipped {result.skipped} rows: ' + '; '.join(result.errors[:5]))
+                if result.duplicates:
+                    messages.info(request, f'Skipped {result.duplicates} expenses that were already recorded.')
+                if result.credits:
+                    messages.info(request, f'Skipped {result.credits} incoming payments (positive amounts in a signed statement).')
+                return redirect('expense_list')
+    else:
+        form = ExpenseImportForm()
+    
+    context = {
+        'form': form,
+        'title': 'Import Expenses',
+    }
+    
+    return render(request, 'expenses/expense_import.html', context)
+
 @login_required
 def expense_edit(request, pk):
     """View for editing an existing expense."""
@@ -157,9 +257,8 @@ def expense_edit(request, pk):
         if form.is_valid():
             expense = form.save()
             
-            # Update recurring expenses if needed
-            if expense.recurrence != 'none':
-                update_recurring_expenses(expense)
+            # Drop stored occurrences the new rule makes obsolete
+            update_recurring_expenses(expense)
             
             messages.success(request, 'Expense updated successfully!')
             return redirect('expense_list')
@@ -249,20 +348,24 @@ def category_edit(request, pk):
 @login_required
 def recurring_expenses(request):
     """View for managing recurring expenses."""
-    recurring = RecurringExpense.objects.filter(
-        parent_expense__user=request.user,
-        date__gte=timezone.now().date()
-    ).order_by('date')
+    today = timezone.now().date()
+    window_end = today + timedelta(days=RECURRING_WINDOW_DAYS)
+    
+    # Generated from the recurrence rules and merged with stored paid/edited occurrences
+    upcoming = occurrences(request.user, today, window_end)
     
     context = {
-        'recurring_expenses': recurring,
+        'recurring_expenses': upcoming,
+        'upcoming_total': sum((occurrence.amount for occurrence in upcoming), 0),
+        'upcoming_by_month': totals_by_month(upcoming),
+        'window_end': window_end,
     }
     
     return render(request, 'expenses/recurring_expenses.html', context)
 
 @login_required
 def recurring_expense_edit(request, pk):
-    """View for editing a recurring expense instance."""
+    """View for editing a stored recurring expense instance."""
     recurring = get_object_or_404(RecurringExpense, pk=pk, parent_expense__user=request.user)
     
     if request.method == 'POST':
@@ -283,6 +386,44 @@ def recurring_expense_edit(request, pk):
     
     return render(request, 'expenses/recurring_expense_form.html', context)
 
+@login_required
+def recurring_occurrence_edit(request, pk, occurrence_date):
+    """View for editing a generated occurrence, which is stored once it is changed."""
+    expense = get_object_or_404(Expense, pk=pk, user=request.user)
+    
+    try:
+        scheduled_date = datetime.strptime(occurrence_date, '%Y-%m-%d').date()
+    except ValueError:
+        raise Http404('Invalid occurrence date')
+    if not is_scheduled(expense, scheduled_date):
+        raise Http404('No such occurrence')
+    
+    recurring = RecurringExpense.objects.filter(parent_expense=expense, occurrence_date=scheduled_date).first()
+    if recurring is not None:
+        return redirect('recurring_expense_edit', pk=recurring.pk)
+    
+    recurring = RecurringExpense(
+        parent_expense=expense, occurrence_date=scheduled_date, amount=expense.amount, date=scheduled_date
+    )
+    
+    if request.method == 'POST':
+        form = RecurringExpenseForm(request.POST, instance=recurring)
+        if form.is_valid():
+            recurring = form.save(commit=False)
+            recurring.is_modified = True
+            recurring.save()
+            messages.success(request, 'Recurring expense updated successfully!')
+            return redirect('recurring_expenses')
+    else:
+        form = RecurringExpenseForm(instance=recurring)
+    
+    context = {
+        'form': form,
+        'recurring': recurring,
+    }
+    
+    return render(request, 'expenses/recurring_expense_form.html', context)
+
 @login_required
 def anomaly_detection(request):
     """View for displaying expense anomalies."""
@@ -323,122 +464,82 @@ def mark_anomaly_reviewed(request, pk):
 @login_required
 def expense_analytics(request):
     """View for advanced expense analytics."""
-    # Get all expenses for the user
-    expenses = Expense.objects.filter(user=request.user)
-    
-    # Convert to pandas DataFrame for analysis
-    expense_data = list(expenses.values('date', 'amount', 'category__name', 'description'))
-    df = pd.DataFrame(expense_data)
-    
-    if not df.empty:
-        # Convert date to datetime
-        df['date'] = pd.to_datetime(df['date'])
-        
-        # Monthly trend
-        monthly_trend = df.groupby(df['date'].dt.strftime('%Y-%m')).agg({
-            'amount': 'sum'
-        }).reset_index()
-        monthly_trend = monthly_trend.sort_values('date')
-        
-        # Category breakdown
-        category_breakdown = df.groupby('category__name').agg({
-            'amount': 'sum'
-        }).reset_index()
-        category_breakdown = category_breakdown.sort_values('amount', ascending=False)
-        
-        # Day of week analysis
-        df['day_of_week'] = df['date'].dt.day_name()
-        day_of_week = df.groupby('day_of_week').agg({
-            'amount': 'sum'
-        }).reset_index()
-        
-        # Largest expenses
-        largest_expenses = df.sort_values('amount', ascending=False).head(10)
-        
-        context = {
-            'monthly_trend': monthly_trend.to_dict('records'),
-            'category_breakdown': category_breakdown.to_dict('records'),
-            'day_of_week': day_of_week.to_dict('records'),
-            'largest_expenses': largest_expenses.to_dict('records'),
-            'total_expenses': df['amount'].sum(),
-            'avg_monthly': df.groupby(df['date'].dt.strftime('%Y-%m'))['amount'].sum().mean(),
-            'num_transactions': len(df),
-        }
-    else:
-        context = {
-            'no_data': True
-        }
+    # Computed over the user's memory-mapped expense columns rather than model rows
+    context = expense_analytics_data(request.user.pk) or {'no_data': True}
     
     return render(request, 'expenses/expense_analytics.html', context)
 
-# Helper functions
+@login_required
+@require_GET
+def expense_export(request):
+    """Stream the user's expenses as CSV or XLSX, optionally within a date range."""
+    return export_queryset(
+        request,
+        Expense.objects.filter(user=request.user),
+        [
+            ('Date', 'date'),
+            ('Description', 'description'),
+            ('Category', 'category__name'),
+            ('Amount', 'amount'),
+            ('Recurrence', 'recurrence'),
+            ('Flagged', 'is_flagged'),
+            ('Notes', 'notes'),
+        ],
+        'expenses'
+    )
 
-def create_recurring_expenses(expense):
-    """Create recurring expense instances based on the recurrence pattern."""
-    from dateutil.relativedelta import relativedelta
-    
-    start_date = expense.date
-    end_date = expense.recurrence_end_date
-    
-    current_date = start_date
-    
-    while current_date <= end_date:
-        if current_date > start_date:  # Skip the first one (it's the original expense)
-            RecurringExpense.objects.create(
-                parent_expense=expense,
-                amount=expense.amount,
-                date=current_date,
-                is_paid=False
-            )
-        
-        # Calculate next date based on recurrence pattern
-        if expense.recurrence == 'daily':
-            current_date += timedelta(days=1)
-        elif expense.recurrence == 'weekly':
-            current_date += timedelta(weeks=1)
-        elif expense.recurrence == 'monthly':
-            current_date += relativedelta(months=1)
-        elif expense.recurrence == 'yearly':
-            current_date += relativedelta(years=1)
+@login_required
+@require_GET
+def recurring_expense_export(request):
+    """Stream the user's paid or edited recurring expense occurrences as CSV or XLSX."""
+    return export_queryset(
+        request,
+        RecurringExpense.objects.filter(parent_expense__user=request.user),
+        [
+            ('Date', 'date'),
+            ('Scheduled date', 'occurrence_date'),
+            ('Description', 'parent_expense__description'),
+            ('Category', 'parent_expense__category__name'),
+            ('Amount', 'amount'),
+            ('Paid', 'is_paid'),
+            ('Modified', 'is_modified'),
+        ],
+        'recurring-expenses'
+    )
+
+# Helper functions
 
 def update_recurring_expenses(expense):
-    """Update recurring expense instances after the parent expense is modified."""
-    # Delete future recurring instances that haven't been modified
-    RecurringExpense.objects.filter(
+    """Remove stored occurrences that the parent expense's current rule no longer schedules."""
+    # Paid and edited occurrences are kept; only untouched future ones can become obsolete
+    for recurring in RecurringExpense.objects.filter(
         parent_expense=expense,
         date__gt=timezone.now().date(),
+        is_paid=False,
         is_modified=False
-    ).delete()
-    
-    # Create new recurring instances
-    if expense.recurrence != 'none' and expense.recurrence_end_date:
-        create_recurring_expenses(expense)
+    ):
+        if not is_scheduled(expense, recurring.occurrence_date or recurring.date):
+            recurring.delete()
 
 def detect_anomalies(expense):
-    """Detect anomalies in expenses using simple statistical methods."""
-    # Get user's expenses in the same category from the last 6 months
-    six_months_ago = timezone.now().date() - timedelta(days=180)
-    category_expenses = Expense.objects.filter(
-        user=expense.user,
-        category=expense.category,
-        date__gte=six_months_ago,
-        date__lt=expense.date  # Exclude the current expense
-    )
-    
-    if category_expenses.count() >= 5:  # Need enough data for meaningful analysis
-        # Calculate mean and standard deviation
-        amounts = [e.amount for e in category_expenses]
-        mean = np.mean(amounts)
-        std_dev = np.std(amounts)
+    """Detect anomalies in expenses by comparing them with the category's running statistics."""
+    # One stats row lookup, however long the category's history is
+    stats = baseline_for(expense)
+    
+    if stats.count >= MIN_HISTORY:  # Need enough data for meaningful analysis
+        # Recency-weighted mean and standard deviation
+        mean = stats.decayed_mean
+        std_dev = stats.decayed_std
+        amount = float(expense.amount)
         
         # Check if current expense is an outlier (> 2 standard deviations from mean)
-        if expense.amount > mean + (2 * std_dev):
+        if amount > mean + (SPIKE_STD_DEVIATIONS * std_dev):
             # Create anomaly detection record
             AnomalyDetection.objects.create(
                 user=expense.user,
                 expense=expense,
                 anomaly_type='spike',
-                confidence_score=min(1.0, (expense.amount - mean) / (3 * std_dev)),
+                confidence_score=min(1.0, (amount - mean) / (3 * std_dev)) if std_dev > 0 else 1.0,
                 description=f"This expense is significantly higher than your usual spending in this category. Average: {mean:.2f}, This expense: {expense.amount:.2f}"
             )
             
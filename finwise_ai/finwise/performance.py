@@ -0,0 +1,120 @@
+"""
+Query-count and latency budgets for views.
+
+Views declare a budget with the @query_budget decorator; views without one
+fall back to settings.QUERY_BUDGET_DEFAULT. QueryBudgetMiddleware measures
+every request (queries, SQL time, wall time), logs budget violations to the
+'finwise.performance' logger and, when settings.QUERY_BUDGET_STRICT is on,
+raises QueryBudgetExceeded so the offending request fails. Tests opt into
+strict mode with finwise.testing.QueryBudgetTestMixin.
+"""
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('finwise.performance')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict mode when a request goes over its view's budget."""
+
+
+@dataclass(frozen=True)
+class QueryBudget:
+    queries: int = None
+    sql_ms: float = None
+    wall_ms: float = None
+
+    def violations(self, stats):
+        """Return a description of each limit the measured stats exceed."""
+        problems = []
+        if self.queries is not None and stats.queries > self.queries:
+            problems.append(f'{stats.queries} queries > {self.queries}')
+        if self.sql_ms is not None and stats.sql_ms > self.sql_ms:
+            problems.append(f'{stats.sql_ms:.1f}ms SQL > {self.sql_ms}ms')
+        if self.wall_ms is not None and stats.wall_ms > self.wall_ms:
+            problems.append(f'{stats.wall_ms:.1f}ms wall > {self.wall_ms}ms')
+        return problems
+
+
+class QueryStats:
+    """Counts queries and SQL time on every database connection while active."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.wall_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_ms += (time.perf_counter() - start) * 1000
+
+    @contextmanager
+    def record(self):
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            try:
+                yield self
+            finally:
+                self.wall_ms = (time.perf_counter() - start) * 1000
+
+
+def query_budget(queries=None, sql_ms=None, wall_ms=None):
+    """Declare the query and latency budget of a view."""
+    budget = QueryBudget(queries=queries, sql_ms=sql_ms, wall_ms=wall_ms)
+
+    def decorator(view_func):
+        # Decorators built on functools.wraps copy the attribute outwards
+        view_func.query_budget = budget
+        return view_func
+
+    return decorator
+
+
+def default_budget():
+    return QueryBudget(**getattr(settings, 'QUERY_BUDGET_DEFAULT', {}))
+
+
+def check_budget(view_name, budget, stats):
+    """Log a budget violation and, in strict mode, raise it."""
+    problems = budget.violations(stats)
+    if not problems:
+        return
+
+    message = f'{view_name} over budget: {", ".join(problems)}'
+    logger.warning(message, extra={
+        'view': view_name, 'queries': stats.queries, 'sql_ms': stats.sql_ms, 'wall_ms': stats.wall_ms
+    })
+    if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+        raise QueryBudgetExceeded(message)
+
+
+class QueryBudgetMiddleware:
+    """Measures each request and checks it against the resolved view's budget."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        with stats.record():
+            response = self.get_response(request)
+
+        budget = getattr(request, '_query_budget', None)
+        if budget is not None:
+            request.query_stats = stats
+            check_budget(request.resolver_match.view_name, budget, stats)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = getattr(view_func, 'query_budget', None) or default_budget()
@@ -0,0 +1,191 @@
+"""
+Catalog of hot per-user querysets and an audit of their query plans.
+
+Apps list the querysets their views run on every request in a hot_queries
+module. Each builder takes a user and today's date:
+
+    @hot_query('loans.upcoming_payments', allow=('temp_sort',))
+    def upcoming_payments(user, today):
+        return LoanPayment.objects.filter(loan__user=user, payment_date__gte=today)
+
+audit_query_plans explains every registered queryset on the current
+database, flags full table scans and temporary sorts, and proposes the
+composite index that would serve each flagged query. `allow` accepts
+findings a catalog entry cannot avoid, such as sorting rows gathered from
+several parents of a join.
+"""
+import re
+from dataclasses import dataclass, field
+from django.db import connections
+from django.db.models.expressions import Col
+from django.db.models.sql.datastructures import Join
+from django.db.models.sql.where import AND
+from django.utils.module_loading import autodiscover_modules
+
+FULL_SCAN = 'full_scan'
+TEMP_SORT = 'temp_sort'
+
+# Lookups that pin a column to one value, so it can lead a composite index
+EQUALITY_LOOKUPS = ('exact', 'iexact', 'isnull')
+
+_PLAN_PATTERNS = {
+    'sqlite': {
+        FULL_SCAN: re.compile(r'^(?!.*\bVIRTUAL TABLE\b).*\bSCAN (?!CONSTANT ROW)\w+'),
+        TEMP_SORT: re.compile(r'\bUSE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)'),
+    },
+    'postgresql': {
+        FULL_SCAN: re.compile(r'\bSeq Scan on (\w+)'),
+        TEMP_SORT: re.compile(r'(?:^|->)\s*(Sort)\b'),
+    },
+}
+
+_registry = {}
+
+
+@dataclass
+class HotQuery:
+    name: str
+    build: object
+    allow: tuple = ()
+
+
+@dataclass
+class PlanAudit:
+    """Outcome of explaining one catalogued queryset."""
+
+    name: str
+    model: object
+    plan: str
+    findings: list = field(default_factory=list)
+    allowed: list = field(default_factory=list)
+    proposed_index: list = None
+
+    @property
+    def ok(self):
+        return not self.findings
+
+
+def hot_query(name, allow=()):
+    """Register a queryset builder in the catalog under a dotted name."""
+    def decorator(build):
+        _registry[name] = HotQuery(name, build, tuple(allow))
+        return build
+    return decorator
+
+
+def hot_queries():
+    """Return the catalog, importing every installed app's hot_queries module first."""
+    autodiscover_modules('hot_queries')
+    return dict(sorted(_registry.items()))
+
+
+def plan_findings(plan, vendor):
+    """Return [(kind, plan line)] for the full scans and temporary sorts in an EXPLAIN output."""
+    patterns = _PLAN_PATTERNS.get(vendor, {})
+    findings = []
+    for line in plan.splitlines():
+        for kind, pattern in patterns.items():
+            if pattern.search(line):
+                findings.append((kind, line.strip()))
+    return findings
+
+
+def _and_lookups(node):
+    """Yield the lookups ANDed together at the top of a where tree."""
+    if node.connector != AND or node.negated:
+        return
+    for child in node.children:
+        if hasattr(child, 'children'):
+            yield from _and_lookups(child)
+        elif hasattr(child, 'lookup_name'):
+            yield child
+
+
+def _existing_indexes(model):
+    """Column lists (field names, no direction) the model's table is already indexed on."""
+    opts = model._meta
+    existing = [[opts.pk.name]]
+    existing += [[name.lstrip('-') for name in index.fields] for index in opts.indexes]
+    existing += [list(fields) for fields in opts.unique_together]
+    existing += [[f.name] for f in opts.concrete_fields if f.db_index or f.unique]
+    return existing
+
+
+def _unique(names):
+    seen = set()
+    return [name for name in names if not (name.lstrip('-') in seen or seen.add(name.lstrip('-')))]
+
+
+def suggest_index(queryset):
+    """
+    Propose a composite index for a queryset, or None if an existing one covers it.
+
+    Columns pinned by equality come first, foreign keys leading (including
+    the foreign key a related filter joins through), then the ordering, so
+    rows can be read in order without a sort; a range column follows when
+    there is no ordering.
+    """
+    query = queryset.query
+    model = queryset.model
+    base = query.get_initial_alias()
+
+    equality, ranges = [], []
+    for lookup in _and_lookups(query.where):
+        col = lookup.lhs
+        if not isinstance(col, Col):
+            continue
+        if col.alias == base:
+            # Boolean filters compile to bare column tests that SQLite cannot seek on
+            if col.target.get_internal_type() == 'BooleanField':
+                continue
+            name = col.target.name
+        else:
+            # Filters on a joined table are served by the foreign key leading to it
+            join = query.alias_map.get(col.alias)
+            if not isinstance(join, Join) or join.parent_alias != base or join.join_field.model is not model:
+                continue
+            name = join.join_field.name
+        (equality if lookup.lookup_name in EQUALITY_LOOKUPS or col.alias != base else ranges).append(name)
+
+    # Foreign keys lead, so indexes of one table share the (user, ...) prefix
+    equality.sort(key=lambda name: not model._meta.get_field(name).is_relation)
+
+    ordering = query.order_by or (model._meta.ordering if query.default_ordering else [])
+    local_fields = {f.name for f in model._meta.concrete_fields} | {'pk', 'id'}
+    order = []
+    for name in ordering:
+        if not isinstance(name, str) or name.lstrip('-') not in local_fields:
+            break
+        order.append(name[:-2] + model._meta.pk.name if name.lstrip('-') == 'pk' else name)
+
+    fields = _unique(equality + (order or ranges[:1]))
+    if not fields:
+        return None
+
+    plain = [name.lstrip('-') for name in fields]
+    if any(existing[:len(plain)] == plain for existing in _existing_indexes(model)):
+        return None
+    return fields
+
+
+def audit_query(hot, user, today, using='default'):
+    """Explain one catalogued queryset and collect its findings."""
+    queryset = hot.build(user, today).using(using)
+    vendor = connections[using].vendor
+    plan = queryset.explain()
+
+    audit = PlanAudit(name=hot.name, model=queryset.model, plan=plan)
+    for kind, line in plan_findings(plan, vendor):
+        (audit.allowed if kind in hot.allow else audit.findings).append((kind, line))
+    if audit.findings:
+        audit.proposed_index = suggest_index(queryset)
+    return audit
+
+
+def audit_query_plans(user, today, using='default', names=None):
+    """Audit every catalogued queryset, or those whose names start with one of names."""
+    return [
+        audit_query(hot, user, today, using)
+        for name, hot in hot_queries().items()
+        if not names or any(name.startswith(prefix) for prefix in names)
+    ]
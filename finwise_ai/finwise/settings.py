@@ -8,6 +8,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -56,6 +57,7 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'accounts.User'
 
 MIDDLEWARE = [
+    'finwise.performance.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -96,6 +98,35 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Local-memory cache by default; set CACHE_LOCATION to share a file-based cache between processes.
+# Per-user data versions live in this cache, so it must be shared
+# whenever workers (precompute_widgets, imports, backfills) run alongside the web processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache' if os.getenv('CACHE_LOCATION')
+        else 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', 'finwise-default'),
+    }
+}
+
+# Lifetime of cached dashboard results; invalidation is driven by per-user data versions
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', 86400))
+
+# Per-user columnar expense files read by the analytics page; safe to delete, they are rebuilt on demand
+EXPENSE_COLUMNS_DIR = os.getenv('EXPENSE_COLUMNS_DIR', str(Path(tempfile.gettempdir()) / 'finwise-expense-columns'))
+
+# Loan payments stored ahead of today; later ones are computed from the loan terms (None stores whole schedules)
+LOAN_SCHEDULE_HORIZON_DAYS = 31
+
+# Per-request budgets checked by QueryBudgetMiddleware; views declare their own with @query_budget
+QUERY_BUDGET_DEFAULT = {'queries': 30}
+
+# Raise instead of only logging when a request goes over budget (tests enable this)
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', 'False') == 'True'
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,29 @@
+"""Test helpers shared by the apps' test suites."""
+from contextlib import contextmanager
+from django.test import override_settings
+from .performance import QueryBudget, QueryStats
+
+
+class QueryBudgetTestMixin:
+    """
+    Test case mixin that makes budget violations fail the test.
+
+    Requests made through the test client raise QueryBudgetExceeded when over
+    budget; assertWithinBudget checks code that does not go through a view.
+    """
+
+    def setUp(self):
+        super().setUp()
+        strict = override_settings(QUERY_BUDGET_STRICT=True)
+        strict.enable()
+        self.addCleanup(strict.disable)
+
+    @contextmanager
+    def assertWithinBudget(self, queries=None, sql_ms=None, wall_ms=None):
+        stats = QueryStats()
+        with stats.record():
+            yield stats
+
+        problems = QueryBudget(queries=queries, sql_ms=sql_ms, wall_ms=wall_ms).violations(stats)
+        if problems:
+            self.fail(f'Over budget: {", ".join(problems)}')
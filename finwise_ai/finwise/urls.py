@@ -21,5 +21,6 @@ from dashboard.views import dashboard_home
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('accounts.urls')),
+    path('dashboard/', include('dashboard.urls')),
     path('', dashboard_home, name='dashboard'),
 ]
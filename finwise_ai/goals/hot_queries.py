@@ -0,0 +1,37 @@
+from datetime import timedelta
+from finwise.query_plans import TEMP_SORT, hot_query
+from .models import GoalContribution, GoalMilestone, SavingsGoal
+
+
+@hot_query('goals.active')
+def active(user, today):
+    return SavingsGoal.objects.filter(user=user, status='active').order_by('target_date')
+
+
+@hot_query('goals.completed')
+def completed(user, today):
+    return SavingsGoal.objects.filter(user=user, status='completed').order_by('-target_date')[:5]
+
+
+@hot_query('goals.list')
+def goal_list(user, today):
+    return SavingsGoal.objects.filter(user=user).order_by('-created_at')
+
+
+# Rows come from several goals, so ordering them needs a sort
+@hot_query('goals.upcoming_milestones', allow=(TEMP_SORT,))
+def upcoming_milestones(user, today):
+    return GoalMilestone.objects.filter(
+        goal__user=user, goal__status='active', target_date__gte=today,
+        target_date__lte=today + timedelta(days=30), is_reached=False
+    ).order_by('target_date')
+
+
+@hot_query('goals.recent_contributions', allow=(TEMP_SORT,))
+def recent_contributions(user, today):
+    return GoalContribution.objects.filter(goal__user=user).order_by('-date')[:5]
+
+
+@hot_query('goals.contributions')
+def contributions(user, today):
+    return GoalContribution.objects.filter(goal_id=1).order_by('-date')
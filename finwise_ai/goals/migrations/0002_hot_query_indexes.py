@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='goalcontribution',
+            index=models.Index(fields=['goal', '-date'], name='contribution_goal_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savingsgoal',
+            index=models.Index(fields=['user', 'status', 'target_date'], name='goal_user_status_target_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savingsgoal',
+            index=models.Index(fields=['user', '-created_at'], name='goal_user_created_idx'),
+        ),
+    ]
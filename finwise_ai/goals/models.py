@@ -58,6 +58,10 @@ class SavingsGoal(models.Model):
     
     class Meta:
         ordering = ['target_date']
+        indexes = [
+            models.Index(fields=['user', 'status', 'target_date'], name='goal_user_status_target_idx'),
+            models.Index(fields=['user', '-created_at'], name='goal_user_created_idx'),
+        ]
 
 
 class GoalContribution(models.Model):
@@ -89,6 +93,9 @@ class GoalContribution(models.Model):
     
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['goal', '-date'], name='contribution_goal_date_idx'),
+        ]
 
 
 class GoalMilestone(models.Model):
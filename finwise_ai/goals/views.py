@@ -5,6 +5,8 @@ from django.http import JsonResponse
 from django.utils import timezone
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
+from django.views.decorators.http import require_GET
+from finwise.exports import export_queryset
 from .models import SavingsGoal, GoalContribution, GoalMilestone
 from .forms import SavingsGoalForm, GoalContributionForm, GoalMilestoneForm, SavingsPlanForm
 import json
@@ -510,3 +512,19 @@ def generate_savings_plan(current_savings, target_amount, months_remaining, disp
         'will_reach_target': final_balance >= target_amount,
         'months_to_target': next((m['month'] for m in monthly_projection if m['balance'] >= target_amount), months_remaining)
     }
+
+@login_required
+@require_GET
+def goal_contribution_export(request):
+    """Stream the user's savings goal contributions as CSV or XLSX, optionally within a date range."""
+    return export_queryset(
+        request,
+        GoalContribution.objects.filter(goal__user=request.user),
+        [
+            ('Date', 'date'),
+            ('Goal', 'goal__name'),
+            ('Amount', 'amount'),
+            ('Notes', 'notes'),
+        ],
+        'goal-contributions'
+    )
@@ -0,0 +1,23 @@
+from finwise.query_plans import TEMP_SORT, hot_query
+from .models import Investment, InvestmentTransaction
+
+
+@hot_query('investments.active')
+def active(user, today):
+    return Investment.objects.filter(user=user, status='active', is_simulation=False).order_by('-purchase_date')
+
+
+@hot_query('investments.simulated')
+def simulated(user, today):
+    return Investment.objects.filter(user=user, is_simulation=True).order_by('-created_at')[:5]
+
+
+# Rows come from several investments, so ordering them needs a sort
+@hot_query('investments.recent_transactions', allow=(TEMP_SORT,))
+def recent_transactions(user, today):
+    return InvestmentTransaction.objects.filter(investment__user=user).order_by('-date')[:5]
+
+
+@hot_query('investments.transactions')
+def transactions(user, today):
+    return InvestmentTransaction.objects.filter(investment_id=1).order_by('-date')
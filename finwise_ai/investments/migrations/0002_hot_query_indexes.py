@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='investment',
+            index=models.Index(fields=['user', 'status', '-purchase_date'], name='investment_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='investment',
+            index=models.Index(fields=['user', '-created_at'], name='investment_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='investmenttransaction',
+            index=models.Index(fields=['investment', '-date'], name='invtransaction_inv_date_idx'),
+        ),
+    ]
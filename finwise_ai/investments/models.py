@@ -79,6 +79,10 @@ class Investment(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'status', '-purchase_date'], name='investment_user_status_idx'),
+            models.Index(fields=['user', '-created_at'], name='investment_user_created_idx'),
+        ]
 
 
 class InvestmentTransaction(models.Model):
@@ -105,6 +109,9 @@ class InvestmentTransaction(models.Model):
     
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['investment', '-date'], name='invtransaction_inv_date_idx'),
+        ]
 
 
 class InvestmentSimulation(models.Model):
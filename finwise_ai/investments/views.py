@@ -5,6 +5,8 @@ from django.http import JsonResponse
 from django.utils import timezone
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
+from django.views.decorators.http import require_GET
+from finwise.exports import export_queryset
 from .models import InvestmentType, Investment, InvestmentSimulation, InvestmentTransaction
 from .forms import InvestmentTypeForm, InvestmentForm, InvestmentTransactionForm, InvestmentSimulationForm
 import json
@@ -640,3 +642,22 @@ def calculate_interest_rate(investment_type, credit_score, employment_years):
     
     # Ensure rate is within reasonable bounds
     return max(2.0, min(final_rate, 18.0))
+
+@login_required
+@require_GET
+def investment_transaction_export(request):
+    """Stream the user's investment transactions as CSV or XLSX, optionally within a date range."""
+    return export_queryset(
+        request,
+        InvestmentTransaction.objects.filter(investment__user=request.user),
+        [
+            ('Date', 'date'),
+            ('Investment', 'investment__name'),
+            ('Type', 'transaction_type'),
+            ('Price', 'price'),
+            ('Quantity', 'quantity'),
+            ('Fees', 'fees'),
+            ('Notes', 'notes'),
+        ],
+        'investment-transactions'
+    )
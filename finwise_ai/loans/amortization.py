@@ -0,0 +1,298 @@
+"""
+Amortization schedules computed in closed form.
+
+The balance after k payments of a level-payment loan is
+
+    B_k = P (1 + r)^k - A ((1 + r)^k - 1) / r
+
+so a whole schedule is a handful of vector operations instead of a loop
+over months. Balances are rounded to cents once; principal is the drop in
+rounded balance and interest the rest of the payment, so every column is
+in whole cents and principal sums exactly to the amount borrowed. The last
+payment settles whatever remains, which absorbs the rounding of the
+payment itself.
+"""
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+import numpy as np
+
+CENT = Decimal('0.01')
+
+
+def _cents(value):
+    return int((Decimal(str(value)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def _amount(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def _monthly_rate(annual_rate):
+    """Monthly rate from an annual percentage rate."""
+    return float(annual_rate) / 1200
+
+
+def monthly_payment(principal, annual_rate, term_months):
+    """Level monthly payment, in cents rounded half up, that repays a loan over its term."""
+    if term_months <= 0:
+        raise ValueError('term_months must be positive')
+
+    principal = Decimal(str(principal))
+    rate = Decimal(str(annual_rate)) / 1200
+    if not rate:
+        payment = principal / term_months
+    else:
+        payment = rate * principal / (1 - (1 + rate) ** -term_months)
+    return payment.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def present_value(payment, annual_rate, term_months):
+    """Amount a level monthly payment repays over a term; the inverse of monthly_payment."""
+    payment = Decimal(str(payment))
+    rate = Decimal(str(annual_rate)) / 1200
+    if not rate:
+        return payment * term_months
+    return payment * (1 - (1 + rate) ** -term_months) / rate
+
+
+@dataclass(frozen=True)
+class AmortizationSchedule:
+    """
+    A schedule as parallel int64 arrays of cents, one element per payment.
+
+    Iterating yields one dict per month with Decimal amounts, the shape the
+    loan templates render.
+    """
+
+    payment: np.ndarray
+    principal: np.ndarray
+    interest: np.ndarray
+    balance: np.ndarray
+
+    def __len__(self):
+        return len(self.payment)
+
+    def __iter__(self):
+        for month, values in enumerate(
+            zip(self.payment.tolist(), self.principal.tolist(), self.interest.tolist(), self.balance.tolist()), start=1
+        ):
+            yield {
+                'month': month,
+                'payment': _amount(values[0]),
+                'principal': _amount(values[1]),
+                'interest': _amount(values[2]),
+                'balance': _amount(values[3]),
+            }
+
+    @property
+    def monthly_payment(self):
+        return _amount(self.payment[0]) if len(self) else Decimal('0.00')
+
+    @property
+    def total_interest(self):
+        return _amount(self.interest.sum())
+
+    @property
+    def total_principal(self):
+        return _amount(self.principal.sum())
+
+    @property
+    def total_cost(self):
+        return _amount(self.payment.sum())
+
+
+def _one_off_cents(one_off, term_months):
+    """Extra lump sums as a float array of cents by month, from a {month number: amount} mapping."""
+    column = np.zeros(term_months, dtype=np.float64)
+    for month, amount in (one_off or {}).items():
+        if not 1 <= month <= term_months:
+            raise ValueError(f'one-off payment month {month} is outside the term')
+        column[month - 1] += _cents(amount)
+    return column
+
+
+def _balances(principal_cents, rate, payments_cents, one_off_cents):
+    """
+    Balances in cents after each month, one row per level payment.
+
+    Lump sums reduce the balance like payments made in their month, so
+    their effect is the running sum of each lump sum grown at the loan rate.
+    """
+    months = len(one_off_cents)
+    k = np.arange(1, months + 1, dtype=np.float64)
+    payments_cents = np.asarray(payments_cents, dtype=np.float64)[:, None]
+    if rate:
+        growth = np.power(1 + rate, k)
+        balance = principal_cents * growth - payments_cents * (growth - 1) / rate
+        lump_sums = growth * np.cumsum(one_off_cents / growth)
+    else:
+        balance = principal_cents - payments_cents * k
+        lump_sums = np.cumsum(one_off_cents)
+    return np.rint(balance - lump_sums).astype(np.int64)
+
+
+def _repaid_in(balance):
+    """Number of payments until the first that takes the balance to zero, or all of them."""
+    paid_off = np.flatnonzero(balance <= 0)
+    return int(paid_off[0]) + 1 if len(paid_off) else len(balance)
+
+
+def schedule_length(principal, annual_rate, term_months, payment=None):
+    """Number of payments in amortize's schedule, without computing its columns."""
+    if term_months <= 0:
+        raise ValueError('term_months must be positive')
+
+    payment_cents = _cents(payment) if payment is not None else _cents(
+        monthly_payment(principal, annual_rate, term_months)
+    )
+    balance = _balances(_cents(principal), _monthly_rate(annual_rate), [payment_cents], _one_off_cents(None, term_months))[0]
+    return _repaid_in(balance)
+
+
+def amortize(principal, annual_rate, term_months, payment=None, extra=0, one_off=None):
+    """
+    Compute the schedule of a loan with monthly payments.
+
+    The payment defaults to monthly_payment for the term. A larger payment
+    ends the schedule early; a smaller one leaves a balloon in the last
+    month of the term. extra is added to every payment and one_off maps
+    month numbers (1 for the first payment) to lump sums paid with them.
+    """
+    if term_months <= 0:
+        raise ValueError('term_months must be positive')
+
+    principal_cents = _cents(principal)
+    payment_cents = _cents(payment) if payment is not None else _cents(
+        monthly_payment(principal, annual_rate, term_months)
+    )
+    payment_cents += _cents(extra)
+    one_off_cents = _one_off_cents(one_off, term_months)
+    rate = _monthly_rate(annual_rate)
+
+    balance = _balances(principal_cents, rate, [payment_cents], one_off_cents)[0]
+    months = _repaid_in(balance)
+    balance = balance[:months]
+    balance[-1] = 0
+
+    previous = np.empty(months, dtype=np.int64)
+    previous[0] = principal_cents
+    previous[1:] = balance[:-1]
+
+    principal_paid = previous - balance
+    interest = payment_cents + one_off_cents[:months].astype(np.int64) - principal_paid
+    # The final payment is whatever is left plus its month's interest
+    interest[-1] = round(previous[-1] * rate)
+    payment_column = principal_paid + interest
+
+    return AmortizationSchedule(payment=payment_column, principal=principal_paid, interest=interest, balance=balance)
+
+
+@dataclass(frozen=True)
+class PrepaymentScenarios:
+    """Outcome of paying a loan with each of several recurring extras, as arrays indexed by scenario."""
+
+    extra: np.ndarray  # Cents added to every payment
+    months: np.ndarray  # Payments until the loan is repaid
+    total_interest: np.ndarray  # Cents
+    baseline_months: int
+    baseline_interest: int
+
+    @property
+    def months_saved(self):
+        return self.baseline_months - self.months
+
+    @property
+    def interest_saved(self):
+        return self.baseline_interest - self.total_interest
+
+
+def prepayment_scenarios(principal, annual_rate, term_months, payment=None, extras=(0,), one_off=None):
+    """
+    Compare repaying a loan with each recurring extra payment, plus the same lump sums, in one pass.
+
+    Every scenario's balances come from one closed-form matrix, and its
+    interest from the telescoping sum of its payments, so no scenario is
+    stepped month by month. The baseline is the plain schedule without
+    extras or lump sums. Totals match amortize for the same inputs.
+    """
+    if term_months <= 0:
+        raise ValueError('term_months must be positive')
+
+    principal_cents = _cents(principal)
+    payment_cents = _cents(payment) if payment is not None else _cents(
+        monthly_payment(principal, annual_rate, term_months)
+    )
+    extra_cents = np.asarray([_cents(extra) for extra in extras], dtype=np.int64)
+    one_off_cents = _one_off_cents(one_off, term_months)
+    rate = _monthly_rate(annual_rate)
+
+    # Row 0 is the baseline
+    payments = np.concatenate(([payment_cents], payment_cents + extra_cents))
+    lump_sums = np.vstack((np.zeros(term_months), np.broadcast_to(one_off_cents, (len(extra_cents), term_months))))
+    balance = np.vstack((
+        _balances(principal_cents, rate, payments[:1], np.zeros(term_months)),
+        _balances(principal_cents, rate, payments[1:], one_off_cents),
+    ))
+
+    # First month each scenario's balance reaches zero, or the end of the term
+    paid_off = balance <= 0
+    months = np.where(paid_off.any(axis=1), paid_off.argmax(axis=1) + 1, term_months)
+
+    # Payments before the last, then the last one settling the balance with its interest
+    rows = np.arange(len(payments))
+    before_last = np.hstack((np.full((len(payments), 1), principal_cents), balance))[rows, months - 1]
+    paid_lump_sums = np.hstack((np.zeros((len(payments), 1)), np.cumsum(lump_sums, axis=1)))[rows, months - 1]
+    total_interest = (
+        (months - 1) * payments + paid_lump_sums.astype(np.int64) - principal_cents + before_last
+        + np.rint(before_last * rate).astype(np.int64)
+    )
+
+    return PrepaymentScenarios(
+        extra=extra_cents,
+        months=months[1:],
+        total_interest=total_interest[1:],
+        baseline_months=int(months[0]),
+        baseline_interest=int(total_interest[0]),
+    )
+
+
+@dataclass(frozen=True)
+class PaymentGrid:
+    """Level-payment figures for every (amount, rate, term) combination, as arrays indexed [amount, rate, term]."""
+
+    amounts: np.ndarray
+    rates: np.ndarray
+    terms: np.ndarray
+    monthly_payment: np.ndarray
+    total_interest: np.ndarray
+
+
+def payment_grid(amounts, annual_rates, terms_months):
+    """
+    Compute monthly payments and total interest for a grid of loan offers in one pass.
+
+    Payments are rounded to cents as monthly_payment rounds them; total
+    interest is the level payment over the term less the amount, which
+    leaves out the final payment's rounding adjustment.
+    """
+    amounts = np.asarray([float(amount) for amount in amounts], dtype=np.float64)
+    rates = np.asarray([float(rate) for rate in annual_rates], dtype=np.float64)
+    terms = np.asarray(terms_months, dtype=np.int64)
+    if (terms <= 0).any():
+        raise ValueError('terms must be positive')
+
+    principal = amounts[:, None, None]
+    rate = (rates / 1200)[None, :, None]
+    n = terms[None, None, :].astype(np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payment = np.where(rate > 0, principal * rate / -np.expm1(-n * np.log1p(rate)), principal / n)
+    payment = np.floor(payment * 100 + 0.5) / 100
+
+    return PaymentGrid(
+        amounts=amounts,
+        rates=rates,
+        terms=terms,
+        monthly_payment=payment,
+        total_interest=payment * n - principal,
+    )
@@ -1,6 +1,12 @@
+from datetime import date
+from decimal import Decimal, InvalidOperation
 from django import forms
 from .models import LoanType, Loan, LoanEligibility
 
+# Amounts are stored with 12 digits, 2 of them decimals, like Loan.amount
+AMOUNT_DIGITS = 12
+MAX_AMOUNT = Decimal('9999999999.99')
+
 class LoanTypeForm(forms.ModelForm):
     """Form for creating and editing loan types."""
     
@@ -69,6 +75,8 @@ class LoanSimulatorForm(forms.Form):
         widget=forms.NumberInput(attrs={'class': 'form-control', 'min': '1', 'max': '30'})
     )
     monthly_income = forms.DecimalField(
+        max_digits=AMOUNT_DIGITS,
+        decimal_places=2,
         widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'})
     )
     existing_debt = forms.DecimalField(
@@ -91,6 +99,8 @@ class LoanEligibilityForm(forms.ModelForm):
     
     # Additional fields for eligibility calculation
     monthly_income = forms.DecimalField(
+        max_digits=AMOUNT_DIGITS,
+        decimal_places=2,
         widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'})
     )
     existing_monthly_debt = forms.DecimalField(
@@ -102,3 +112,170 @@ class LoanEligibilityForm(forms.ModelForm):
     employment_years = forms.DecimalField(
         widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.1'})
     )
+
+
+class NumberListField(forms.CharField):
+    """Comma-separated numbers, or an inclusive start:stop:step range, as a sorted list of Decimals."""
+    
+    def __init__(self, *args, max_values=60, max_value=MAX_AMOUNT, **kwargs):
+        self.max_values = max_values
+        self.max_value = max_value
+        super().__init__(*args, **kwargs)
+    
+    def to_python(self, value):
+        value = super().to_python(value)
+        if not value:
+            return []
+        
+        try:
+            if ':' in value:
+                start, stop, step = (self.to_number(part) for part in value.split(':'))
+                if step <= 0 or stop < start:
+                    raise forms.ValidationError('Enter a range as start:stop:step with a positive step.')
+                if (stop - start) / step >= self.max_values:
+                    raise forms.ValidationError(f'Enter at most {self.max_values} values.')
+                numbers = []
+                while start <= stop:
+                    numbers.append(start)
+                    start += step
+            else:
+                numbers = [self.to_number(part) for part in value.split(',') if part.strip()]
+        except (InvalidOperation, ValueError):
+            raise forms.ValidationError('Enter numbers separated by commas, or a start:stop:step range.')
+        
+        if len(numbers) > self.max_values:
+            raise forms.ValidationError(f'Enter at most {self.max_values} values.')
+        return sorted(set(numbers))
+    
+    def to_number(self, part):
+        number = Decimal(part)
+        # NaN cannot be compared or sorted and infinities break the calculations
+        if not number.is_finite():
+            raise forms.ValidationError(f'"{part.strip()}" is not a finite number.')
+        # Larger values overflow the integer cents the schedules are computed in
+        if abs(number) > self.max_value:
+            raise forms.ValidationError(f'Enter numbers no larger than {self.max_value}.')
+        return number
+
+
+class LoanGridForm(forms.Form):
+    """Form for comparing loan offers over a grid of amounts, rates and terms."""
+    
+    amounts = NumberListField(
+        max_values=20,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': '200000, 250000, 300000'})
+    )
+    interest_rates = NumberListField(
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': '3:7:0.25'})
+    )
+    term_years = NumberListField(
+        max_values=30,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': '15, 20, 30'})
+    )
+    monthly_income = forms.DecimalField(
+        min_value=Decimal('0.01'),
+        max_digits=AMOUNT_DIGITS,
+        decimal_places=2,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'})
+    )
+    existing_debt = forms.DecimalField(
+        required=False,
+        min_value=0,
+        max_digits=AMOUNT_DIGITS,
+        decimal_places=2,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'})
+    )
+    
+    def clean_amounts(self):
+        amounts = self.cleaned_data['amounts']
+        if any(amount <= 0 for amount in amounts):
+            raise forms.ValidationError('Amounts must be positive.')
+        return amounts
+    
+    def clean_interest_rates(self):
+        rates = self.cleaned_data['interest_rates']
+        if any(rate < 0 or rate > 100 for rate in rates):
+            raise forms.ValidationError('Interest rates must be between 0 and 100.')
+        return rates
+    
+    def clean_term_years(self):
+        terms = self.cleaned_data['term_years']
+        if any(term != term.to_integral_value() or not 1 <= term <= 40 for term in terms):
+            raise forms.ValidationError('Terms must be whole numbers of years between 1 and 40.')
+        return [int(term) for term in terms]
+
+
+class LoanPrepaymentForm(forms.Form):
+    """Form for comparing extra payments on a loan."""
+    
+    extra_payments = NumberListField(
+        required=False,
+        max_values=200,
+        help_text='Amounts added to every payment, e.g. 0:1000:50.',
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': '0:1000:50'})
+    )
+    lump_sums = forms.CharField(
+        required=False,
+        help_text='One-off payments as date:amount, e.g. 2026-12-01:5000.',
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': '2026-12-01:5000'})
+    )
+    schedule_extra = forms.DecimalField(
+        required=False,
+        min_value=0,
+        max_digits=AMOUNT_DIGITS,
+        decimal_places=2,
+        help_text='Extra payment whose revised schedule is returned.',
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'})
+    )
+    
+    def clean_extra_payments(self):
+        extras = self.cleaned_data['extra_payments'] or [Decimal('0')]
+        if any(extra < 0 for extra in extras):
+            raise forms.ValidationError('Extra payments must not be negative.')
+        return extras
+    
+    def clean_lump_sums(self):
+        lump_sums = {}
+        for entry in self.cleaned_data['lump_sums'].split(','):
+            if not entry.strip():
+                continue
+            try:
+                paid_on, amount = entry.split(':')
+                paid_on = date.fromisoformat(paid_on.strip())
+                amount = Decimal(amount.strip())
+            except ValueError:
+                raise forms.ValidationError('Enter lump sums as date:amount pairs separated by commas.')
+            except InvalidOperation:
+                raise forms.ValidationError(f'"{entry.strip()}" does not have a valid amount.')
+            if not amount.is_finite():
+                raise forms.ValidationError(f'"{entry.strip()}" does not have a finite amount.')
+            if amount <= 0:
+                raise forms.ValidationError('Lump sums must be positive.')
+            if amount > MAX_AMOUNT:
+                raise forms.ValidationError(f'Lump sums must be no larger than {MAX_AMOUNT}.')
+            lump_sums[paid_on] = lump_sums.get(paid_on, 0) + amount
+        return lump_sums
+
+
+class LoanPayoffForm(forms.Form):
+    """Form for planning the payoff of all active loans from one monthly budget."""
+    
+    monthly_budget = forms.DecimalField(
+        required=False,
+        min_value=0,
+        max_digits=AMOUNT_DIGITS,
+        decimal_places=2,
+        help_text='Defaults to the sum of the minimum payments.',
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'})
+    )
+    custom_order = forms.CharField(
+        required=False,
+        help_text='Loan ids to pay off first, separated by commas.',
+        widget=forms.TextInput(attrs={'class': 'form-control'})
+    )
+    
+    def clean_custom_order(self):
+        try:
+            return [int(part) for part in self.cleaned_data['custom_order'].split(',') if part.strip()]
+        except ValueError:
+            raise forms.ValidationError('Enter loan ids separated by commas.')
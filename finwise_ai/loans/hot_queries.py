@@ -0,0 +1,36 @@
+from datetime import timedelta
+from finwise.query_plans import TEMP_SORT, hot_query
+from .models import Loan, LoanPayment
+
+
+@hot_query('loans.active')
+def active(user, today):
+    return Loan.objects.filter(user=user, status='active').order_by('end_date')
+
+
+@hot_query('loans.simulated')
+def simulated(user, today):
+    return Loan.objects.filter(user=user, is_simulation=True).order_by('-created_at')[:5]
+
+
+@hot_query('loans.list')
+def loan_list(user, today):
+    return Loan.objects.filter(user=user).order_by('-created_at')
+
+
+# Rows come from several loans, so ordering them needs a sort
+@hot_query('loans.upcoming_payments', allow=(TEMP_SORT,))
+def upcoming_payments(user, today):
+    return LoanPayment.objects.filter(
+        loan__user=user, payment_date__gte=today, payment_date__lte=today + timedelta(days=30), is_paid=False
+    ).order_by('payment_date')
+
+
+@hot_query('loans.payments')
+def payments(user, today):
+    return LoanPayment.objects.filter(loan_id=1).order_by('payment_date')
+
+
+@hot_query('loans.remaining_payments')
+def remaining_payments(user, today):
+    return LoanPayment.objects.filter(loan_id=1, payment_date__gte=today).order_by('payment_date')
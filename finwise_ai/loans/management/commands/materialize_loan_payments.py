@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from loans.models import Loan
+from loans.schedules import extend_schedules
+
+
+class Command(BaseCommand):
+    help = 'Stores the loan payments that came within the schedule horizon; run daily'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only extend schedules of this user id (can be repeated)')
+
+    def handle(self, *args, **options):
+        loans = Loan.objects.all()
+        if options['user_ids']:
+            loans = loans.filter(user_id__in=options['user_ids'])
+        
+        written = extend_schedules(loans)
+        
+        self.stdout.write(self.style.SUCCESS(f'Stored {written} loan payments'))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['user', 'status', 'end_date'], name='loan_user_status_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['user', '-created_at'], name='loan_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loanpayment',
+            index=models.Index(fields=['loan', 'payment_date'], name='loanpayment_loan_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0002_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='schedule_through',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0003_loan_schedule_through'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loanpayment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -41,6 +41,7 @@ class Loan(models.Model):
     remaining_balance = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='simulated')
     is_simulation = models.BooleanField(default=True)
+    schedule_through = models.DateField(null=True, blank=True, editable=False)  # Payments up to this date are stored
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -49,6 +50,10 @@ class Loan(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'status', 'end_date'], name='loan_user_status_end_idx'),
+            models.Index(fields=['user', '-created_at'], name='loan_user_created_idx'),
+        ]
 
 
 class LoanPayment(models.Model):
@@ -61,12 +66,16 @@ class LoanPayment(models.Model):
     interest_amount = models.DecimalField(max_digits=12, decimal_places=2)
     remaining_balance = models.DecimalField(max_digits=12, decimal_places=2)
     is_paid = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)  # Marks net worth snapshots read from paid rows as stale
     
     def __str__(self):
         return f"Payment for {self.loan} on {self.payment_date}"
     
     class Meta:
         ordering = ['payment_date']
+        indexes = [
+            models.Index(fields=['loan', 'payment_date'], name='loanpayment_loan_date_idx'),
+        ]
 
 
 class LoanEligibility(models.Model):
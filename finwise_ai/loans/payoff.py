@@ -0,0 +1,163 @@
+"""
+Debt payoff plans across several loans sharing one monthly budget.
+
+Every loan receives its minimum payment and the rest of the budget goes to
+the first unpaid loan in the strategy's order; when a loan is repaid its
+minimum rolls over to the next one. Between two payoffs every payment is
+constant, so each balance follows the closed form
+
+    B(k) = B (1 + r)^k - p ((1 + r)^k - 1) / r
+
+and the months until a loan is repaid solve B(n) = 0. The simulation jumps
+from one payoff to the next instead of stepping through months, so a plan
+costs one small vector step per loan whatever its length.
+
+The budget left over in the month a loan is repaid is not moved to another
+loan until the following month. A loan with a known term is repaid by its
+last scheduled payment at the latest, as in its amortization.
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal
+import numpy as np
+
+AVALANCHE = 'avalanche'
+SNOWBALL = 'snowball'
+CUSTOM = 'custom'
+STRATEGIES = (AVALANCHE, SNOWBALL, CUSTOM)
+
+# Plans still running after this many months are reported as not paying off
+MAX_MONTHS = 1200
+
+
+class BudgetTooLow(ValueError):
+    """Raised when the budget cannot cover the minimum payments or ever repay the debts."""
+
+
+@dataclass(frozen=True)
+class Debt:
+    key: object  # Identifies the debt in the results, e.g. a loan id
+    balance: Decimal
+    annual_rate: Decimal  # Percentage
+    minimum_payment: Decimal
+    # Payments left on the debt's schedule, whose last one settles any
+    # remainder (such as the rounding of the minimum payment); None if open-ended
+    term_months: int = None
+
+
+@dataclass
+class PayoffPlan:
+    """Outcome of repaying a set of debts in one order."""
+
+    strategy: str
+    order: list
+    months: int = 0
+    total_interest: Decimal = Decimal('0.00')
+    payoff_months: dict = field(default_factory=dict)  # key -> month the debt is repaid, 1 being next month
+    interest: dict = field(default_factory=dict)  # key -> interest paid on the debt
+
+
+def order_debts(debts, strategy, custom_order=None):
+    """
+    Return the keys of debts in the order a strategy pays them.
+
+    Avalanche targets the highest rate first, snowball the smallest balance.
+    A custom order lists keys first; debts it leaves out follow in
+    avalanche order.
+    """
+    avalanche = sorted(debts, key=lambda debt: (-debt.annual_rate, debt.balance))
+    if strategy == AVALANCHE:
+        return [debt.key for debt in avalanche]
+    if strategy == SNOWBALL:
+        return [debt.key for debt in sorted(debts, key=lambda debt: (debt.balance, -debt.annual_rate))]
+    if strategy == CUSTOM:
+        keys = {debt.key for debt in debts}
+        first = [key for key in dict.fromkeys(custom_order or []) if key in keys]
+        return first + [debt.key for debt in avalanche if debt.key not in first]
+    raise ValueError(f'Unknown strategy: {strategy}')
+
+
+def _months_to_repay(balance, rate, payment):
+    """Months for constant payments to repay each balance; inf where they never do."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        compound = -np.log1p(-rate * balance / payment) / np.log1p(rate)
+        months = np.where(rate > 0, compound, balance / payment)
+        months = np.where((payment > 0) & (payment > rate * balance), months, np.inf)
+    # Tolerate float noise on an exact number of months
+    return np.ceil(months - 1e-9)
+
+
+def _balance_after(balance, rate, payment, months):
+    with np.errstate(invalid='ignore'):
+        growth = np.power(1 + rate, months)
+        annuity = np.where(rate > 0, (growth - 1) / np.where(rate > 0, rate, 1), months)
+    return balance * growth - payment * annuity
+
+
+def simulate_payoff(debts, budget, order, strategy=CUSTOM, rollover=True):
+    """
+    Repay debts from a monthly budget, targeting them in order, and return the PayoffPlan.
+
+    Without rollover each debt only ever gets its minimum payment, which is
+    the baseline the strategies are compared with.
+    """
+    plan = PayoffPlan(strategy=strategy, order=list(order))
+    if not debts:
+        return plan
+
+    by_key = {debt.key: debt for debt in debts}
+    debts = [by_key[key] for key in order]
+    balance = np.array([float(debt.balance) * 100 for debt in debts])
+    rate = np.array([float(debt.annual_rate) / 1200 for debt in debts])
+    minimum = np.array([float(debt.minimum_payment) * 100 for debt in debts])
+    term = np.array([np.inf if debt.term_months is None else debt.term_months for debt in debts], dtype=np.float64)
+    budget = float(budget) * 100
+    if budget + 0.5 < minimum.sum():
+        raise BudgetTooLow('The budget does not cover the minimum payments')
+
+    active = balance > 0
+    interest = np.zeros(len(debts))
+    month = 0
+    while active.any():
+        # Minimums everywhere, the rest of the budget on the first active debt
+        payment = np.where(active, minimum, 0.0)
+        if rollover:
+            target = int(np.argmax(active))
+            payment[target] += budget - payment.sum()
+
+        # Paying at least the minimum, no debt outlasts its schedule
+        months = np.minimum(_months_to_repay(balance, rate, payment), term - month)
+        months = np.where(active, months, np.inf)
+        step = months.min()
+        if not np.isfinite(step) or month + step > MAX_MONTHS:
+            raise BudgetTooLow('The payments do not repay the debts')
+
+        repaid = active & (months == step)
+        before = balance.copy()
+        # Repaid debts make their last payment, the balance plus a month's interest, in the final month
+        last = _balance_after(before, rate, payment, step - 1)
+        balance = np.where(repaid, 0.0, _balance_after(before, rate, payment, step))
+        paid = np.where(repaid, payment * (step - 1) + last * (1 + rate), payment * step)
+        interest += np.where(active, paid - (before - balance), 0.0)
+
+        month += int(step)
+        for index in np.flatnonzero(repaid):
+            plan.payoff_months[debts[index].key] = month
+        active &= ~repaid
+
+    plan.months = month
+    for debt, cents in zip(debts, interest.tolist()):
+        plan.interest[debt.key] = Decimal(round(cents)).scaleb(-2)
+    plan.total_interest = sum(plan.interest.values(), Decimal('0.00'))
+    return plan
+
+
+def compare_strategies(debts, budget, custom_order=None):
+    """Plans for the minimum-payments baseline, avalanche, snowball and (if given) a custom order."""
+    plans = {
+        'minimum': simulate_payoff(debts, budget, order_debts(debts, AVALANCHE), 'minimum', rollover=False),
+        AVALANCHE: simulate_payoff(debts, budget, order_debts(debts, AVALANCHE), AVALANCHE),
+        SNOWBALL: simulate_payoff(debts, budget, order_debts(debts, SNOWBALL), SNOWBALL),
+    }
+    if custom_order:
+        plans[CUSTOM] = simulate_payoff(debts, budget, order_debts(debts, CUSTOM, custom_order), CUSTOM)
+    return plans
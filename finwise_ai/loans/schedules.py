@@ -0,0 +1,250 @@
+"""
+Stored loan payment schedules.
+
+A loan's schedule is fully determined by its terms, so rows only need to be
+stored once they matter: payments already due (which can be marked paid)
+and those falling within LOAN_SCHEDULE_HORIZON_DAYS, which the upcoming
+payments lists read. Later payments are computed on demand from the
+amortization. Rows are written with chunked bulk_create in one transaction,
+so creating a loan costs the same few queries whatever its term. With the
+setting set to None the whole schedule is stored up front.
+
+Stored rows are extended lazily when a user's loans are shown and daily by
+the materialize_loan_payments command.
+
+Prepayment scenarios restart the amortization from the loan's remaining
+balance over the payments not yet made, so extra payments only affect the
+future.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, OuterRef, Q, Subquery
+from django.utils import timezone
+from .amortization import amortize, prepayment_scenarios, schedule_length
+from .models import Loan, LoanPayment
+from .signals import loan_payments_bulk_created
+
+# Payment rows inserted per statement
+SCHEDULE_CHUNK_SIZE = 500
+
+
+def schedule_horizon(today=None):
+    """Last date whose payments are stored, or None to store whole schedules."""
+    days = getattr(settings, 'LOAN_SCHEDULE_HORIZON_DAYS', None)
+    if days is None:
+        return None
+    return (today or timezone.now().date()) + timedelta(days=days)
+
+
+def loan_schedule(loan):
+    """The amortization of a loan at its recorded monthly payment."""
+    return amortize(loan.amount, loan.interest_rate, loan.term_months, payment=loan.monthly_payment or None)
+
+
+def payment_date(loan, index):
+    """Date of the payment at a zero-based position in the schedule."""
+    return loan.start_date + relativedelta(months=index)
+
+
+def payments_through(loan, through, count):
+    """Number of a schedule's first count payments that fall on or before a date."""
+    start = loan.start_date
+    due = (through.year - start.year) * 12 + through.month - start.month + 1
+    due = max(0, min(due, count))
+    # Within the last month the payment day may still be ahead
+    if due and payment_date(loan, due - 1) > through:
+        due -= 1
+    return due
+
+
+def _stored_count(loan):
+    last = LoanPayment.objects.filter(loan=loan).aggregate(last=Max('payment_date'))['last']
+    if last is None:
+        return 0
+    return payments_through(loan, last, loan.term_months)
+
+
+def _payments(loan, schedule, start, stop, today, offset=0):
+    columns = (
+        schedule.payment[start:stop].tolist(), schedule.principal[start:stop].tolist(),
+        schedule.interest[start:stop].tolist(), schedule.balance[start:stop].tolist(),
+    )
+    for index, (payment, principal, interest, balance) in enumerate(zip(*columns), start=start):
+        due = payment_date(loan, offset + index)
+        yield LoanPayment(
+            loan=loan,
+            payment_date=due,
+            amount=_amount(payment),
+            principal_amount=_amount(principal),
+            interest_amount=_amount(interest),
+            remaining_balance=_amount(balance),
+            is_paid=due < today  # Past payments count as paid
+        )
+
+
+def _amount(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def materialize_payments(loan, through=None, today=None):
+    """
+    Store the payments of a loan falling on or before a date that are not stored yet.
+
+    Defaults to the schedule horizon. The loan row is locked while the stored
+    rows are counted and extended, so concurrent calls (a page view and the
+    daily command) cannot both write the same payments. Returns the number
+    of rows written.
+    """
+    today = today or timezone.now().date()
+    through = through or schedule_horizon(today)
+    if loan.start_date is None:
+        return 0
+
+    schedule = loan_schedule(loan)
+    stop = len(schedule) if through is None else payments_through(loan, through, len(schedule))
+
+    with transaction.atomic():
+        Loan.objects.select_for_update().only('pk').get(pk=loan.pk)
+        start = _stored_count(loan)
+        rows = list(_payments(loan, schedule, start, stop, today)) if stop > start else []
+        LoanPayment.objects.bulk_create(rows, batch_size=SCHEDULE_CHUNK_SIZE)
+        loan.schedule_through = through or payment_date(loan, len(schedule) - 1)
+        Loan.objects.filter(pk=loan.pk).update(schedule_through=loan.schedule_through)
+        if rows:
+            loan_payments_bulk_created.send(sender=LoanPayment, user_id=loan.user_id)
+    return len(rows)
+
+
+def projected_payments(loan, today=None):
+    """Unsaved payments of a loan beyond its stored rows, computed from its terms."""
+    if loan.start_date is None:
+        return []
+
+    schedule = loan_schedule(loan)
+    start = _stored_count(loan)
+    return list(_payments(loan, schedule, start, len(schedule), today or timezone.now().date()))
+
+
+def extend_schedules(loans, today=None):
+    """Store the payments that came within the horizon for loans not extended since; returns rows written."""
+    today = today or timezone.now().date()
+    through = schedule_horizon(today)
+    if through is None:
+        return 0
+
+    written = 0
+    for loan in (
+        loans
+        .filter(status='active', is_simulation=False, start_date__isnull=False)
+        .filter(Q(schedule_through__isnull=True) | Q(schedule_through__lt=through))
+    ):
+        written += materialize_payments(loan, through, today)
+    return written
+
+
+def with_last_paid(loans):
+    """Annotate loans with the date and balance of their last paid payment (last_paid_date, last_paid_balance)."""
+    last_paid = LoanPayment.objects.filter(loan=OuterRef('pk'), is_paid=True).order_by('-payment_date')
+    return loans.annotate(
+        last_paid_date=Subquery(last_paid.values('payment_date')[:1]),
+        last_paid_balance=Subquery(last_paid.values('remaining_balance')[:1]),
+    )
+
+
+def last_paid_of(loan):
+    """(date, balance) of a loan's last paid payment, or None; read from with_last_paid if annotated."""
+    if hasattr(loan, 'last_paid_date'):
+        return (loan.last_paid_date, loan.last_paid_balance) if loan.last_paid_date else None
+    return (
+        LoanPayment.objects
+        .filter(loan=loan, is_paid=True)
+        .order_by('-payment_date')
+        .values_list('payment_date', 'remaining_balance')
+        .first()
+    )
+
+
+def outstanding(loan):
+    """
+    (payments made, balance left, payments remaining) of a loan.
+
+    Payments made run up to the last one marked paid, so every payment still
+    unpaid, a missed one included, remains. The balance is the loan's
+    remaining_balance, which marking payments paid reduces; without one it
+    is the balance after the last paid payment, or the amount borrowed.
+    Loans from with_last_paid need no query.
+    """
+    if loan.start_date is None:
+        return 0, loan.amount, loan.term_months
+
+    payments = schedule_length(loan.amount, loan.interest_rate, loan.term_months, payment=loan.monthly_payment or None)
+    last_paid = last_paid_of(loan)
+    due = payments_through(loan, last_paid[0], payments) if last_paid else 0
+
+    if loan.remaining_balance is not None:
+        balance = loan.remaining_balance
+    elif last_paid:
+        balance = last_paid[1]
+    else:
+        balance = loan.amount
+    return due, balance, payments - due
+
+
+def lump_sum_months(loan, lump_sums, due):
+    """
+    Map {date: amount} lump sums to remaining-payment numbers (1 is the next payment).
+
+    A lump sum is paid with the first payment on or after its date.
+    """
+    if lump_sums and loan.start_date is None:
+        raise ValueError('Lump sums need a loan with a start date')
+
+    months = {}
+    for paid_on, amount in lump_sums.items():
+        month = payments_through(loan, paid_on - timedelta(days=1), loan.term_months) - due + 1
+        if month < 1:
+            raise ValueError(f'{paid_on} is not after the payments already made')
+        months[month] = months.get(month, 0) + amount
+    return months
+
+
+def loan_prepayment_scenarios(loan, extras, lump_sums=None):
+    """
+    Compare recurring extra payments, plus the same lump sums, on the rest of a loan.
+
+    Returns (payments made, PrepaymentScenarios); dates of payoff are
+    payment_date(loan, due + months - 1).
+    """
+    due, balance, remaining = outstanding(loan)
+    if not remaining:
+        raise ValueError('The loan has no payments left')
+
+    return due, prepayment_scenarios(
+        balance, loan.interest_rate, remaining, payment=loan.monthly_payment or None, extras=extras,
+        one_off=lump_sum_months(loan, lump_sums or {}, due)
+    )
+
+
+def revised_payments(loan, extra=0, lump_sums=None, today=None):
+    """Unsaved payments of the rest of a loan with a recurring extra payment and lump sums."""
+    today = today or timezone.now().date()
+    due, balance, remaining = outstanding(loan)
+    if not remaining:
+        return []
+
+    schedule = amortize(
+        balance, loan.interest_rate, remaining, payment=loan.monthly_payment or None, extra=extra,
+        one_off=lump_sum_months(loan, lump_sums or {}, due)
+    )
+    if loan.start_date is None:
+        return [
+            LoanPayment(
+                loan=loan, amount=row['payment'], principal_amount=row['principal'],
+                interest_amount=row['interest'], remaining_balance=row['balance']
+            )
+            for row in schedule
+        ]
+    return list(_payments(loan, schedule, 0, len(schedule), today, offset=due))
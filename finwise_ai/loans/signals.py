@@ -0,0 +1,4 @@
+from django.dispatch import Signal
+
+# Sent after a loan's payments are written with bulk_create, which skips the model signals; provides user_id
+loan_payments_bulk_created = Signal()
@@ -0,0 +1,465 @@
+import json
+from unittest import mock
+from datetime import date, timedelta
+from decimal import Decimal
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from dashboard.cache import get_data_version
+from .amortization import amortize, monthly_payment, payment_grid, prepayment_scenarios, present_value
+from .models import Loan, LoanPayment
+from .payoff import AVALANCHE, SNOWBALL, BudgetTooLow, Debt, compare_strategies, order_debts, simulate_payoff
+from .schedules import extend_schedules, outstanding, projected_payments, revised_payments, with_last_paid
+from .views import (
+    active_debts, generate_payment_schedule, loan_home, loan_payoff_plan, loan_prepayment_scenarios, loan_simulator_grid
+)
+
+
+class AmortizationTests(TestCase):
+    """Tests for closed-form amortization schedules."""
+
+    def test_schedule_matches_month_by_month_amortization(self):
+        schedule = amortize(Decimal('300000.00'), Decimal('6.50'), 360)
+
+        self.assertEqual(monthly_payment(Decimal('300000.00'), Decimal('6.50'), 360), Decimal('1896.20'))
+        self.assertEqual(len(schedule), 360)
+        self.assertEqual(schedule.total_principal, Decimal('300000.00'))
+        self.assertEqual(schedule.total_cost, schedule.total_principal + schedule.total_interest)
+
+        rate = Decimal('6.50') / 1200
+        balance = Decimal('300000.00')
+        for row in schedule:
+            interest = balance * rate
+            balance -= row['principal']
+            self.assertEqual(row['principal'] + row['interest'], row['payment'])
+            self.assertLessEqual(abs(row['interest'] - interest), Decimal('0.01'))
+            self.assertEqual(row['balance'], balance)
+        self.assertEqual(balance, 0)
+        # Only the final payment differs, by the compounded rounding of the level payment
+        self.assertEqual(set(schedule.payment[:-1].tolist()), {189620})
+        self.assertLess(abs(int(schedule.payment[-1]) - 189620), 1000)
+
+    def test_zero_rate_and_payment_overrides(self):
+        interest_free = amortize(Decimal('1000.00'), 0, 3)
+        self.assertEqual([row['payment'] for row in interest_free], [Decimal('333.33'), Decimal('333.33'), Decimal('333.34')])
+        self.assertEqual(interest_free.total_interest, 0)
+
+        early = amortize(Decimal('1000.00'), Decimal('12'), 12, payment=Decimal('400.00'))
+        self.assertEqual(len(early), 3)
+        self.assertEqual(early.balance[-1], 0)
+        self.assertEqual(early.total_principal, Decimal('1000.00'))
+
+        balloon = amortize(Decimal('1000.00'), Decimal('12'), 3, payment=Decimal('100.00'))
+        self.assertEqual(len(balloon), 3)
+        self.assertGreater(balloon.payment[-1], 80000)
+        self.assertEqual(balloon.total_principal, Decimal('1000.00'))
+
+        self.assertAlmostEqual(present_value(Decimal('1896.20'), Decimal('6.50'), 360), Decimal('300000'), delta=1)
+
+    def test_payment_schedule_is_stored_from_the_amortization(self):
+        user = get_user_model().objects.create_user(email='amortize@example.com', password='StrongPass123')
+        loan = Loan.objects.create(
+            user=user, amount=Decimal('12000.00'), interest_rate=Decimal('5.00'), term_months=24,
+            start_date=date(2023, 1, 15), monthly_payment=0, status='active', is_simulation=False
+        )
+
+        generate_payment_schedule(loan)
+
+        payments = list(LoanPayment.objects.filter(loan=loan).order_by('payment_date'))
+        self.assertEqual(len(payments), 24)
+        self.assertEqual(loan.monthly_payment, Decimal('526.46'))
+        self.assertEqual(sum(payment.principal_amount for payment in payments), Decimal('12000.00'))
+        self.assertEqual((payments[1].payment_date, payments[-1].remaining_balance), (date(2023, 2, 15), 0))
+
+
+class LoanScheduleStorageTests(TestCase):
+    """Tests for bulk and lazy storage of loan payment schedules."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='schedules@example.com', password='StrongPass123')
+        self.today = timezone.now().date()
+
+    def create_loan(self, term_months, start_date):
+        return Loan.objects.create(
+            user=self.user, amount=Decimal('250000.00'), interest_rate=Decimal('6.00'), term_months=term_months,
+            start_date=start_date, monthly_payment=0, status='active', is_simulation=False
+        )
+
+    @override_settings(LOAN_SCHEDULE_HORIZON_DAYS=31)
+    def test_query_count_does_not_depend_on_term(self):
+        short = self.create_loan(12, self.today)
+        long = self.create_loan(360, self.today)
+
+        with CaptureQueriesContext(connection) as short_queries:
+            generate_payment_schedule(short)
+        with CaptureQueriesContext(connection) as long_queries:
+            generate_payment_schedule(long)
+
+        self.assertEqual(len(short_queries), len(long_queries))
+        self.assertEqual(LoanPayment.objects.filter(loan=long).count(), 2)
+
+    @override_settings(LOAN_SCHEDULE_HORIZON_DAYS=None)
+    def test_whole_schedule_is_stored_in_bulk(self):
+        loan = self.create_loan(360, date(2020, 1, 1))
+
+        with CaptureQueriesContext(connection) as queries:
+            generate_payment_schedule(loan)
+
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "loans_loanpayment"')]
+        self.assertLessEqual(len(inserts), 3)
+        self.assertEqual(LoanPayment.objects.filter(loan=loan).count(), 360)
+        self.assertEqual(projected_payments(loan), [])
+
+    @override_settings(LOAN_SCHEDULE_HORIZON_DAYS=31)
+    def test_only_due_payments_are_stored_and_the_rest_projected(self):
+        start = self.today - relativedelta(months=3)
+        loan = self.create_loan(360, start)
+
+        generate_payment_schedule(loan)
+
+        stored = list(LoanPayment.objects.filter(loan=loan).order_by('payment_date'))
+        self.assertEqual([payment.payment_date for payment in stored], [start + relativedelta(months=i) for i in range(5)])
+        self.assertEqual([payment.is_paid for payment in stored], [True, True, True, False, False])
+
+        projected = projected_payments(loan)
+        self.assertEqual(len(stored) + len(projected), 360)
+        self.assertIsNone(projected[0].pk)
+        self.assertEqual(projected[0].payment_date, start + relativedelta(months=5))
+        self.assertEqual(sum(p.principal_amount for p in stored + projected), Decimal('250000.00'))
+
+        # A month later the next payment is stored, once
+        later = self.today + relativedelta(months=1)
+        self.assertEqual(extend_schedules(Loan.objects.filter(user=self.user), later), 1)
+        self.assertEqual(extend_schedules(Loan.objects.filter(user=self.user), later), 0)
+        self.assertEqual(LoanPayment.objects.filter(loan=loan).count(), 6)
+
+    @override_settings(LOAN_SCHEDULE_HORIZON_DAYS=31)
+    def test_extending_a_schedule_bumps_the_dashboard_version(self):
+        loan = self.create_loan(360, self.today - relativedelta(months=3))
+        generate_payment_schedule(loan)
+        version = get_data_version(self.user.pk)
+
+        # bulk_create skips the LoanPayment signals
+        with self.captureOnCommitCallbacks(execute=True):
+            extend_schedules(Loan.objects.filter(user=self.user), self.today + relativedelta(months=1))
+        self.assertNotEqual(get_data_version(self.user.pk), version)
+
+
+class LoanSimulatorGridTests(TestCase):
+    """Tests for comparing loan offers over a rate, term and amount grid."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='grid@example.com', password='StrongPass123')
+
+    def get(self, params):
+        request = RequestFactory().get('/loans/simulator/grid/', params)
+        request.user = self.user
+        return loan_simulator_grid(request)
+
+    def test_grid_matches_single_offer_figures(self):
+        grid = payment_grid([Decimal('300000'), Decimal('12000')], [Decimal('0'), Decimal('6.5')], [24, 360])
+
+        for i, amount in enumerate(grid.amounts):
+            for j, rate in enumerate(grid.rates):
+                for k, term in enumerate(grid.terms):
+                    expected = monthly_payment(Decimal(str(amount)), Decimal(str(rate)), int(term))
+                    self.assertEqual(Decimal(str(grid.monthly_payment[i, j, k])), expected)
+                    self.assertAlmostEqual(grid.total_interest[i, j, k], float(expected * int(term)) - amount, places=6)
+
+    def test_view_returns_heatmap_payload_without_saving(self):
+        with self.assertNumQueries(0):
+            response = self.get({
+                'amounts': '250000, 200000', 'interest_rates': '5:6:0.5', 'term_years': '15,30',
+                'monthly_income': '5000', 'existing_debt': '400',
+            })
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data['amounts'], ['200000', '250000'])
+        self.assertEqual(data['interest_rates'], ['5', '5.5', '6.0'])
+        self.assertEqual(data['term_years'], [15, 30])
+        self.assertEqual(data['monthly_payment'][1][2][1], float(monthly_payment(250000, 6, 360)))
+        self.assertEqual(data['is_eligible'][1][2], [False, True])
+        self.assertEqual(Loan.objects.count(), 0)
+
+    def test_invalid_grid_is_rejected(self):
+        response = self.get({'amounts': '100000', 'interest_rates': '1:100:0.01', 'term_years': '2.5',
+                             'monthly_income': '5000'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(json.loads(response.content)['errors']), {'interest_rates', 'term_years'})
+
+    def test_non_finite_values_are_rejected(self):
+        response = self.get({'amounts': 'nan', 'interest_rates': '5:inf:1', 'term_years': 'Infinity, 30',
+                             'monthly_income': '5000'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(json.loads(response.content)['errors']), {'amounts', 'interest_rates', 'term_years'})
+
+    def test_oversized_values_are_rejected(self):
+        response = self.get({'amounts': '1e400', 'interest_rates': '5', 'term_years': '30',
+                             'monthly_income': '1e400', 'existing_debt': '1e13'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(json.loads(response.content)['errors']), {'amounts', 'monthly_income', 'existing_debt'})
+
+    def test_non_finite_results_are_rejected(self):
+        params = {'amounts': '100000', 'interest_rates': '5', 'term_years': '30', 'monthly_income': '5000'}
+        with mock.patch('loans.views.payment_grid') as grid:
+            grid.return_value.monthly_payment = np.array([[[np.inf]]])
+            grid.return_value.total_interest = np.array([[[np.nan]]])
+            response = self.get(params)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('__all__', json.loads(response.content)['errors'])
+
+
+class PrepaymentScenarioTests(TestCase):
+    """Tests for extra-payment and early-payoff scenarios."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='prepay@example.com', password='StrongPass123')
+        self.today = timezone.now().date()
+        self.start = self.today - relativedelta(months=12) + timedelta(days=1)
+        self.loan = Loan.objects.create(
+            user=self.user, amount=Decimal('200000.00'), interest_rate=Decimal('6.00'), term_months=360,
+            start_date=self.start, monthly_payment=monthly_payment(200000, 6, 360), status='active',
+            is_simulation=False
+        )
+        # Stores the twelve past payments as paid
+        generate_payment_schedule(self.loan)
+
+    def get(self, params):
+        request = RequestFactory().get(f'/loans/{self.loan.pk}/prepayments/', params)
+        request.user = self.user
+        return loan_prepayment_scenarios(request, self.loan.pk)
+
+    def test_scenarios_match_stepping_each_schedule(self):
+        lump_sums = {6: Decimal('5000'), 100: Decimal('20000')}
+        scenarios = prepayment_scenarios(
+            Decimal('200000'), Decimal('6'), 360, extras=[Decimal('0'), Decimal('100'), Decimal('250.50')],
+            one_off=lump_sums
+        )
+
+        baseline = amortize(Decimal('200000'), Decimal('6'), 360)
+        self.assertEqual((scenarios.baseline_months, scenarios.baseline_interest), (360, int(baseline.interest.sum())))
+        for extra, months, interest in zip(['0', '100', '250.50'], scenarios.months, scenarios.total_interest):
+            schedule = amortize(Decimal('200000'), Decimal('6'), 360, extra=Decimal(extra), one_off=lump_sums)
+            self.assertEqual((months, interest), (len(schedule), int(schedule.interest.sum())))
+            self.assertEqual(schedule.total_principal, Decimal('200000.00'))
+        self.assertTrue((scenarios.interest_saved > 0).all())
+        self.assertEqual(list(scenarios.months_saved), sorted(scenarios.months_saved))
+
+    def test_view_compares_extras_from_the_outstanding_balance(self):
+        response = self.get({
+            'extra_payments': '0:200:100', 'lump_sums': f'{self.today + timedelta(days=20)}:10000',
+            'schedule_extra': '200',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        # Twelve payments are paid, so 348 remain
+        self.assertEqual(data['baseline']['months'], 348)
+        self.assertEqual(data['baseline']['payoff_date'], (self.start + relativedelta(months=359)).isoformat())
+        self.assertEqual([row['extra_payment'] for row in data['scenarios']], ['0', '100', '200'])
+        self.assertGreater(data['scenarios'][0]['months_saved'], 0)
+        self.assertLess(data['scenarios'][2]['months'], data['scenarios'][1]['months'])
+
+        schedule = data['schedule']
+        self.assertEqual(len(schedule), data['scenarios'][2]['months'])
+        self.assertEqual(schedule[0]['payment_date'], (self.start + relativedelta(months=12)).isoformat())
+        # The lump sum is paid with the second remaining payment
+        self.assertEqual(Decimal(schedule[1]['amount']), self.loan.monthly_payment + 200 + 10000)
+        self.assertEqual(schedule[-1]['payment_date'], data['scenarios'][2]['payoff_date'])
+        self.assertEqual(LoanPayment.objects.filter(payment_date__gt=self.today + timedelta(days=31)).count(), 0)
+
+        # Without the lump sum, principal still adds up to the outstanding balance
+        revised = revised_payments(self.loan, Decimal('200'), today=self.today)
+        self.assertEqual(
+            sum(payment.principal_amount for payment in revised),
+            Decimal(schedule[0]['remaining_balance']) + Decimal(schedule[0]['principal_amount'])
+        )
+
+    def test_scenarios_start_from_the_stored_balance_and_unpaid_payments(self):
+        last_paid = LoanPayment.objects.filter(loan=self.loan, is_paid=True).last()
+        self.assertEqual(outstanding(self.loan), (12, last_paid.remaining_balance, 348))
+
+        # A missed payment stays outstanding and the recorded balance wins over the schedule
+        last_paid.is_paid = False
+        last_paid.save()
+        self.loan.remaining_balance = Decimal('150000.00')
+        self.assertEqual(outstanding(self.loan), (11, Decimal('150000.00'), 349))
+
+        self.loan.save()
+        response = self.get({'extra_payments': '0', 'schedule_extra': '0'})
+        schedule = json.loads(response.content)['schedule']
+        self.assertEqual(sum(Decimal(row['principal_amount']) for row in schedule), Decimal('150000.00'))
+        self.assertEqual(schedule[0]['payment_date'], (self.start + relativedelta(months=11)).isoformat())
+
+    def test_lump_sums_before_the_next_payment_are_rejected(self):
+        response = self.get({'lump_sums': f'{self.start}:1000'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('not after the payments already made', json.loads(response.content)['errors']['__all__'][0])
+
+    def test_non_finite_amounts_are_rejected(self):
+        later = self.today + timedelta(days=20)
+        for params in [{'extra_payments': 'nan'}, {'lump_sums': f'{later}:nan'}, {'lump_sums': f'{later}:inf'}]:
+            response = self.get(params)
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(set(json.loads(response.content)['errors']), set(params))
+
+    def test_oversized_amounts_are_rejected(self):
+        later = self.today + timedelta(days=20)
+        for params in [{'extra_payments': '1e20'}, {'schedule_extra': '1e20'}, {'lump_sums': f'{later}:1e20'}]:
+            response = self.get(params)
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(set(json.loads(response.content)['errors']), set(params))
+
+
+class PayoffOptimizerTests(TestCase):
+    """Tests for the multi-loan debt payoff optimizer."""
+
+    debts = [
+        Debt('card', Decimal('4000.00'), Decimal('22.00'), Decimal('120.00')),
+        Debt('car', Decimal('15000.00'), Decimal('6.50'), Decimal('350.00')),
+        Debt('student', Decimal('2500.00'), Decimal('4.00'), Decimal('50.00')),
+        Debt('free', Decimal('900.00'), Decimal('0.00'), Decimal('75.00')),
+    ]
+
+    def step_months(self, budget, order, rollover=True):
+        """Reference plan stepping one month at a time: (months, payoff months, interest in cents)."""
+        debts = {debt.key: debt for debt in self.debts}
+        balance = {key: float(debts[key].balance) * 100 for key in order}
+        interest = dict.fromkeys(order, 0.0)
+        payoff = {}
+        month = 0
+        while len(payoff) < len(order):
+            month += 1
+            active = [key for key in order if key not in payoff]
+            payment = {key: float(debts[key].minimum_payment) * 100 for key in active}
+            if rollover:
+                payment[active[0]] += float(budget) * 100 - sum(payment.values())
+            for key in active:
+                accrued = balance[key] * float(debts[key].annual_rate) / 1200
+                interest[key] += accrued
+                balance[key] = balance[key] + accrued - payment[key]
+                if balance[key] <= 1e-6:
+                    payoff[key] = month
+        return month, payoff, interest
+
+    def test_plans_match_stepping_every_month(self):
+        budget = Decimal('800.00')
+        for strategy in (AVALANCHE, SNOWBALL):
+            order = order_debts(self.debts, strategy)
+            plan = simulate_payoff(self.debts, budget, order, strategy)
+            months, payoff, interest = self.step_months(budget, order)
+            self.assertEqual(plan.months, months)
+            self.assertEqual(plan.payoff_months, payoff)
+            for key in order:
+                self.assertAlmostEqual(float(plan.interest[key]) * 100, interest[key], delta=1)
+
+        plan = simulate_payoff(self.debts, budget, order_debts(self.debts, AVALANCHE), rollover=False)
+        months, payoff, interest = self.step_months(budget, order_debts(self.debts, AVALANCHE), rollover=False)
+        self.assertEqual((plan.months, plan.payoff_months), (months, payoff))
+
+    def test_strategy_orders(self):
+        self.assertEqual(order_debts(self.debts, AVALANCHE), ['card', 'car', 'student', 'free'])
+        self.assertEqual(order_debts(self.debts, SNOWBALL), ['free', 'student', 'card', 'car'])
+        plans = compare_strategies(self.debts, Decimal('800.00'), custom_order=['student', 'missing'])
+        self.assertEqual(plans['custom'].order, ['student', 'card', 'car', 'free'])
+        # Avalanche never pays more interest than the other orders
+        self.assertLessEqual(plans[AVALANCHE].total_interest, plans[SNOWBALL].total_interest)
+        self.assertLessEqual(plans[AVALANCHE].total_interest, plans['custom'].total_interest)
+        self.assertLess(plans[AVALANCHE].months, plans['minimum'].months)
+
+    def test_budgets_that_never_repay_are_rejected(self):
+        with self.assertRaises(BudgetTooLow):
+            compare_strategies(self.debts, Decimal('500.00'))
+        with self.assertRaises(BudgetTooLow):
+            compare_strategies([Debt('card', Decimal('10000'), Decimal('24'), Decimal('150'))], Decimal('150'))
+
+    def test_view_plans_the_users_active_loans(self):
+        user = get_user_model().objects.create_user(email='payoff@example.com', password='StrongPass123')
+        today = timezone.now().date()
+        loans = [
+            Loan.objects.create(
+                user=user, amount=amount, interest_rate=rate, term_months=term, start_date=today + timedelta(days=1),
+                monthly_payment=monthly_payment(amount, rate, term), status='active', is_simulation=False
+            )
+            for amount, rate, term in [(Decimal('20000'), Decimal('7'), 60), (Decimal('3000'), Decimal('18'), 24)]
+        ]
+        minimums = sum(loan.monthly_payment for loan in loans)
+
+        def get(params):
+            request = RequestFactory().get('/loans/payoff/', params)
+            request.user = user
+            return loan_payoff_plan(request)
+
+        data = json.loads(get({'monthly_budget': str(minimums + 200)}).content)
+        self.assertEqual(Decimal(data['minimum_payments']), minimums)
+        self.assertEqual(data['plans']['avalanche']['order'], [loans[1].pk, loans[0].pk])
+        self.assertEqual(data['plans']['minimum']['months'], 60)
+        self.assertEqual(data['plans']['minimum']['interest_saved'], '0.00')
+        avalanche = data['plans']['avalanche']
+        self.assertGreater(Decimal(avalanche['interest_saved']), 0)
+        self.assertEqual(avalanche['debt_free'], (today + relativedelta(months=avalanche['months'])).strftime('%Y-%m'))
+
+        data = json.loads(get({'custom_order': f'{loans[0].pk}'}).content)
+        self.assertEqual(data['plans']['custom']['order'], [loans[0].pk, loans[1].pk])
+
+        self.assertEqual(get({'monthly_budget': '10'}).status_code, 400)
+        self.assertIn('monthly_budget', json.loads(get({'monthly_budget': '1e400'}).content)['errors'])
+        self.assertEqual(get({'custom_order': 'first'}).status_code, 400)
+
+    def test_debts_use_the_recorded_balances(self):
+        user = get_user_model().objects.create_user(email='balances@example.com', password='StrongPass123')
+        today = timezone.now().date()
+        current = Loan.objects.create(
+            user=user, amount=Decimal('20000'), interest_rate=Decimal('7'), term_months=60,
+            start_date=today - relativedelta(months=6), monthly_payment=monthly_payment(20000, 7, 60),
+            remaining_balance=Decimal('19000.00'), status='active', is_simulation=False
+        )
+        generate_payment_schedule(current)
+        # Every scheduled payment is behind it, yet a balance is still recorded
+        overdue = Loan.objects.create(
+            user=user, amount=Decimal('3000'), interest_rate=Decimal('18'), term_months=2,
+            start_date=today - relativedelta(months=3), monthly_payment=monthly_payment(3000, 18, 2),
+            remaining_balance=Decimal('400.00'), status='active', is_simulation=False
+        )
+        generate_payment_schedule(overdue)
+
+        with self.assertNumQueries(1):
+            debts = {debt.key: debt for debt in active_debts(with_last_paid(Loan.objects.filter(user=user)))}
+        self.assertEqual(debts[current.pk].balance, Decimal('19000.00'))
+        self.assertEqual(debts[current.pk].term_months, 54)
+        self.assertEqual((debts[overdue.pk].balance, debts[overdue.pk].term_months), (Decimal('400.00'), None))
+        self.assertEqual(sum(debt.balance for debt in debts.values()), Decimal('19400.00'))
+
+        plans = compare_strategies(list(debts.values()), current.monthly_payment + overdue.monthly_payment)
+        self.assertEqual(set(plans['minimum'].payoff_months), {current.pk, overdue.pk})
+
+    def test_home_and_payoff_plan_compare_the_same_loans(self):
+        user = get_user_model().objects.create_user(email='home-plans@example.com', password='StrongPass123')
+        for is_simulation in (False, True):
+            Loan.objects.create(
+                user=user, amount=Decimal('20000'), interest_rate=Decimal('7'), term_months=60,
+                start_date=timezone.now().date() + timedelta(days=1), monthly_payment=monthly_payment(20000, 7, 60),
+                remaining_balance=Decimal('20000.00'), status='active', is_simulation=is_simulation
+            )
+        request = RequestFactory().get('/loans/')
+        request.user = user
+
+        with mock.patch('loans.views.render') as render:
+            loan_home(request)
+        context = render.call_args.args[2]
+        plan = json.loads(loan_payoff_plan(request).content)
+
+        self.assertEqual(context['total_debt'], Decimal('20000.00'))
+        self.assertEqual(context['payoff_plans']['minimum'].order, [loan['id'] for loan in plan['loans']])
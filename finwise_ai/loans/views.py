@@ -3,21 +3,33 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.utils import timezone
-from django.db import models
+from django.db import models, transaction
 from datetime import datetime, timedelta
+from decimal import ROUND_DOWN, Decimal
 from dateutil.relativedelta import relativedelta
+from django.views.decorators.http import require_GET
+from finwise.exports import export_queryset
+from .amortization import amortize, monthly_payment as calculate_monthly_payment, payment_grid, present_value
+from .payoff import BudgetTooLow, Debt, compare_strategies
+from .schedules import (
+    extend_schedules, loan_prepayment_scenarios as compare_prepayments, materialize_payments, outstanding,
+    payment_date, projected_payments, revised_payments, with_last_paid,
+)
 from .models import Loan, LoanType, LoanPayment, LoanEligibility
-from .forms import LoanForm, LoanTypeForm, LoanSimulatorForm, LoanEligibilityForm
-import json
+from .forms import LoanForm, LoanSimulatorForm, LoanEligibilityForm, LoanGridForm, LoanPayoffForm, LoanPrepaymentForm
 import numpy as np
 
+# Standard debt-to-income threshold, as a percentage
+MAX_DTI_RATIO = 43
+
 @login_required
 def loan_home(request):
     """View for the loans dashboard."""
     # Get user's active loans
     active_loans = Loan.objects.filter(
         user=request.user,
-        status='active'
+        status='active',
+        is_simulation=False
     ).order_by('end_date')
     
     # Get user's simulated loans
@@ -32,8 +44,9 @@ def loan_home(request):
     # Calculate monthly payments
     monthly_payments = active_loans.aggregate(total=models.Sum('monthly_payment'))['total'] or 0
     
-    # Get upcoming payments
+    # Get upcoming payments, storing any that came within the schedule horizon
     today = timezone.now().date()
+    extend_schedules(Loan.objects.filter(user=request.user), today)
     next_month = today + timedelta(days=30)
     upcoming_payments = LoanPayment.objects.filter(
         loan__user=request.user,
@@ -42,12 +55,19 @@ def loan_home(request):
         is_paid=False
     ).order_by('payment_date')
     
+    # Compare payoff strategies when freed minimum payments roll over
+    try:
+        payoff_plans = compare_strategies(active_debts(with_last_paid(active_loans)), monthly_payments)
+    except BudgetTooLow:
+        payoff_plans = None
+    
     context = {
         'active_loans': active_loans,
         'simulated_loans': simulated_loans,
         'total_debt': total_debt,
         'monthly_payments': monthly_payments,
         'upcoming_payments': upcoming_payments,
+        'payoff_plans': payoff_plans,
     }
     
     return render(request, 'loans/loans_home.html', context)
@@ -69,15 +89,18 @@ def loan_detail(request, pk):
     """View for displaying loan details."""
     loan = get_object_or_404(Loan, pk=pk, user=request.user)
     
-    # Get loan payments
-    payments = LoanPayment.objects.filter(loan=loan).order_by('payment_date')
+    # Get loan payments, followed by those not stored yet
+    payments = list(LoanPayment.objects.filter(loan=loan).order_by('payment_date'))
+    if not loan.is_simulation and loan.status == 'active':
+        payments += projected_payments(loan)
     
     # Calculate amortization schedule
     amortization_schedule = []
     
     if not loan.is_simulation and loan.status == 'active':
         # Calculate remaining payments
-        remaining_payments = payments.filter(payment_date__gte=timezone.now().date())
+        today = timezone.now().date()
+        remaining_payments = [payment for payment in payments if payment.payment_date >= today]
         
         # Calculate total interest to be paid
         total_interest = sum(payment.interest_amount for payment in remaining_payments)
@@ -86,33 +109,9 @@ def loan_detail(request, pk):
         total_principal = sum(payment.principal_amount for payment in remaining_payments)
     else:
         # For simulations, calculate theoretical amortization schedule
-        principal = loan.amount
-        rate = loan.interest_rate / 100 / 12  # Monthly interest rate
-        term = loan.term_months
-        
-        # Calculate monthly payment using the formula: P = (r * PV) / (1 - (1 + r)^-n)
-        monthly_payment = (rate * principal) / (1 - (1 + rate) ** -term)
-        
-        # Generate amortization schedule
-        balance = principal
-        total_interest = 0
-        
-        for month in range(1, term + 1):
-            interest_payment = balance * rate
-            principal_payment = monthly_payment - interest_payment
-            balance -= principal_payment
-            
-            amortization_schedule.append({
-                'month': month,
-                'payment': monthly_payment,
-                'principal': principal_payment,
-                'interest': interest_payment,
-                'balance': max(0, balance)
-            })
-            
-            total_interest += interest_payment
-        
-        total_principal = principal
+        amortization_schedule = amortize(loan.amount, loan.interest_rate, loan.term_months)
+        total_interest = amortization_schedule.total_interest
+        total_principal = amortization_schedule.total_principal
     
     context = {
         'loan': loan,
@@ -172,15 +171,15 @@ def loan_edit(request, pk):
             
             # Recalculate payment schedule if needed
             if loan.status == 'active' and not loan.is_simulation:
-                # Delete future unpaid payments
-                LoanPayment.objects.filter(
-                    loan=loan,
-                    payment_date__gt=timezone.now().date(),
-                    is_paid=False
-                ).delete()
-                
-                # Regenerate payment schedule
-                generate_payment_schedule(loan)
+                with transaction.atomic():
+                    # Delete future unpaid payments
+                    loan.payments.filter(
+                        payment_date__gt=timezone.now().date(),
+                        is_paid=False
+                    ).delete()
+                    
+                    # Regenerate payment schedule after the payments kept
+                    generate_payment_schedule(loan)
             
             messages.success(request, 'Loan updated successfully!')
             return redirect('loan_detail', pk=loan.pk)
@@ -201,9 +200,7 @@ def loan_delete(request, pk):
     loan = get_object_or_404(Loan, pk=pk, user=request.user)
     
     if request.method == 'POST':
-        # Delete associated payments
-        LoanPayment.objects.filter(loan=loan).delete()
-        
+        # Payments are deleted in cascade
         loan.delete()
         messages.success(request, 'Loan deleted successfully!')
         return redirect('loan_list')
@@ -230,14 +227,13 @@ def loan_simulator(request):
             
             # Calculate monthly payment
             term_months = term_years * 12
-            monthly_rate = interest_rate / 100 / 12
-            monthly_payment = (monthly_rate * amount) / (1 - (1 + monthly_rate) ** -term_months)
+            monthly_payment = calculate_monthly_payment(amount, interest_rate, term_months)
             
             # Calculate debt-to-income ratio
             dti_ratio = ((monthly_payment + existing_debt) / monthly_income) * 100
             
             # Determine eligibility
-            is_eligible = dti_ratio <= 43  # Standard DTI threshold
+            is_eligible = dti_ratio <= MAX_DTI_RATIO  # Standard DTI threshold
             
             # Create a simulated loan
             loan = Loan.objects.create(
@@ -276,53 +272,184 @@ def loan_simulator(request):
     
     return render(request, 'loans/loan_simulator.html', context)
 
+@login_required
+@require_GET
+def loan_simulator_grid(request):
+    """
+    Compare loan offers over a grid of amounts, rates and terms as JSON, without saving anything.
+    
+    Each matrix is indexed [amount][rate][term] following the axes, ready to
+    draw as heatmaps; a chosen cell is saved through the simulator form.
+    """
+    form = LoanGridForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    
+    term_years = form.cleaned_data['term_years']
+    grid = payment_grid(
+        form.cleaned_data['amounts'], form.cleaned_data['interest_rates'], [years * 12 for years in term_years]
+    )
+    
+    # Debt-to-income ratio of each offer on top of existing debt
+    existing_debt = float(form.cleaned_data.get('existing_debt') or 0)
+    dti_ratio = (grid.monthly_payment + existing_debt) / float(form.cleaned_data['monthly_income']) * 100
+    
+    # Infinity and NaN are not valid JSON
+    if not all(np.isfinite(matrix).all() for matrix in (grid.monthly_payment, grid.total_interest, dti_ratio)):
+        return JsonResponse({'errors': {'__all__': ['The grid is out of the range that can be computed.']}}, status=400)
+    
+    return JsonResponse({
+        'amounts': [str(amount) for amount in form.cleaned_data['amounts']],
+        'interest_rates': [str(rate) for rate in form.cleaned_data['interest_rates']],
+        'term_years': term_years,
+        'monthly_payment': grid.monthly_payment.round(2).tolist(),
+        'total_interest': grid.total_interest.round(2).tolist(),
+        'dti_ratio': dti_ratio.round(1).tolist(),
+        'is_eligible': (dti_ratio <= MAX_DTI_RATIO).tolist(),
+        'max_dti_ratio': MAX_DTI_RATIO,
+    })
+
 @login_required
 def loan_simulation_result(request, loan_id, eligibility_id):
     """View for displaying loan simulation results."""
     loan = get_object_or_404(Loan, pk=loan_id, user=request.user, is_simulation=True)
     eligibility = get_object_or_404(LoanEligibility, pk=eligibility_id, user=request.user)
     
-    # Calculate amortization schedule
-    principal = loan.amount
-    rate = loan.interest_rate / 100 / 12  # Monthly interest rate
-    term = loan.term_months
-    monthly_payment = loan.monthly_payment
-    
-    # Generate amortization schedule
-    amortization_schedule = []
-    balance = principal
-    total_interest = 0
-    
-    for month in range(1, term + 1):
-        interest_payment = balance * rate
-        principal_payment = monthly_payment - interest_payment
-        balance -= principal_payment
-        
-        amortization_schedule.append({
-            'month': month,
-            'payment': monthly_payment,
-            'principal': principal_payment,
-            'interest': interest_payment,
-            'balance': max(0, balance)
-        })
-        
-        total_interest += interest_payment
+    # Calculate amortization schedule at the payment offered
+    amortization_schedule = amortize(loan.amount, loan.interest_rate, loan.term_months, payment=loan.monthly_payment)
     
     context = {
         'loan': loan,
         'eligibility': eligibility,
         'amortization_schedule': amortization_schedule,
-        'total_interest': total_interest,
-        'total_cost': total_interest + principal,
-        'monthly_payment': monthly_payment,
+        'total_interest': amortization_schedule.total_interest,
+        'total_cost': amortization_schedule.total_cost,
+        'monthly_payment': loan.monthly_payment,
     }
     
     return render(request, 'loans/loan_simulation_result.html', context)
 
+@login_required
+@require_GET
+def loan_prepayment_scenarios(request, pk):
+    """Compare the payoff date and interest of a loan under extra payments, as JSON."""
+    loan = get_object_or_404(Loan, pk=pk, user=request.user)
+    
+    form = LoanPrepaymentForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    
+    today = timezone.now().date()
+    extras = form.cleaned_data['extra_payments']
+    lump_sums = form.cleaned_data['lump_sums']
+    try:
+        due, scenarios = compare_prepayments(loan, extras, lump_sums)
+    except ValueError as e:
+        return JsonResponse({'errors': {'__all__': [str(e)]}}, status=400)
+    
+    def payoff_date(months):
+        return payment_date(loan, due + int(months) - 1).isoformat() if loan.start_date else None
+    
+    data = {
+        'baseline': {
+            'payoff_date': payoff_date(scenarios.baseline_months),
+            'months': scenarios.baseline_months,
+            'total_interest': str(Decimal(scenarios.baseline_interest).scaleb(-2)),
+        },
+        'scenarios': [
+            {
+                'extra_payment': str(extra),
+                'payoff_date': payoff_date(months),
+                'months': int(months),
+                'months_saved': int(months_saved),
+                'total_interest': str(Decimal(int(interest)).scaleb(-2)),
+                'interest_saved': str(Decimal(int(saved)).scaleb(-2)),
+            }
+            for extra, months, months_saved, interest, saved in zip(
+                extras, scenarios.months, scenarios.months_saved, scenarios.total_interest, scenarios.interest_saved
+            )
+        ],
+    }
+    
+    if form.cleaned_data['schedule_extra'] is not None:
+        data['schedule'] = [
+            {
+                'payment_date': payment.payment_date.isoformat() if payment.payment_date else None,
+                'amount': str(payment.amount),
+                'principal_amount': str(payment.principal_amount),
+                'interest_amount': str(payment.interest_amount),
+                'remaining_balance': str(payment.remaining_balance),
+            }
+            for payment in revised_payments(loan, form.cleaned_data['schedule_extra'], lump_sums, today)
+        ]
+    
+    return JsonResponse(data)
+
+@login_required
+@require_GET
+def loan_payoff_plan(request):
+    """Compare avalanche, snowball and custom payoff orders of the user's active loans, as JSON."""
+    form = LoanPayoffForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    
+    today = timezone.now().date()
+    loans = list(with_last_paid(
+        Loan.objects.filter(user=request.user, status='active', is_simulation=False).select_related('loan_type')
+    ))
+    debts = active_debts(loans)
+    minimum_payments = sum((debt.minimum_payment for debt in debts), Decimal('0.00'))
+    budget = form.cleaned_data['monthly_budget']
+    if budget is None:
+        budget = minimum_payments
+    
+    try:
+        plans = compare_strategies(debts, budget, form.cleaned_data['custom_order'])
+    except BudgetTooLow as e:
+        return JsonResponse({'errors': {'monthly_budget': [str(e)]}}, status=400)
+    
+    def month_label(months):
+        return (today + relativedelta(months=months)).strftime('%Y-%m')
+    
+    baseline = plans['minimum'].total_interest
+    names = {loan.pk: loan.loan_type.name if loan.loan_type else 'Unknown' for loan in loans}
+    return JsonResponse({
+        'monthly_budget': str(budget),
+        'minimum_payments': str(minimum_payments),
+        'loans': [
+            {
+                'id': debt.key,
+                'name': names[debt.key],
+                'balance': str(debt.balance),
+                'interest_rate': str(debt.annual_rate),
+                'minimum_payment': str(debt.minimum_payment),
+            }
+            for debt in debts
+        ],
+        'plans': {
+            name: {
+                'order': plan.order,
+                'months': plan.months,
+                'debt_free': month_label(plan.months) if plan.months else None,
+                'total_interest': str(plan.total_interest),
+                'interest_saved': str(baseline - plan.total_interest),
+                'loans': [
+                    {
+                        'id': key,
+                        'payoff_month': month_label(plan.payoff_months[key]),
+                        'interest': str(plan.interest[key]),
+                    }
+                    for key in plan.order
+                ],
+            }
+            for name, plan in plans.items()
+        },
+    })
+
 @login_required
 def loan_payment_mark_paid(request, pk):
     """View for marking a loan payment as paid."""
-    payment = get_object_or_404(LoanPayment, pk=pk, loan__user=request.user)
+    payment = get_object_or_404(LoanPayment.objects.select_related('loan'), pk=pk, loan__user=request.user)
     
     if request.method == 'POST':
         payment.is_paid = True
@@ -368,15 +495,14 @@ def loan_eligibility_check(request):
             interest_rate = calculate_interest_rate(loan_type, credit_score, employment_years)
             
             # Calculate monthly payment
-            monthly_rate = interest_rate / 100 / 12
-            monthly_payment = (monthly_rate * requested_amount) / (1 - (1 + monthly_rate) ** -requested_term_months)
+            monthly_payment = calculate_monthly_payment(requested_amount, interest_rate, requested_term_months)
             
             # Calculate debt-to-income ratio
             dti_ratio = ((monthly_payment + existing_monthly_debt) / monthly_income) * 100
             
             # Determine eligibility
             is_eligible = (
-                dti_ratio <= 43 and  # Standard DTI threshold
+                dti_ratio <= MAX_DTI_RATIO and  # Standard DTI threshold
                 credit_score >= 620 and  # Minimum credit score
                 employment_years >= 1  # Minimum employment history
             )
@@ -416,8 +542,9 @@ def loan_eligibility_result(request, pk):
     # If eligible, calculate monthly payment
     monthly_payment = None
     if eligibility.is_eligible:
-        monthly_rate = eligibility.offered_interest_rate / 100 / 12
-        monthly_payment = (monthly_rate * eligibility.requested_amount) / (1 - (1 + monthly_rate) ** -eligibility.requested_term_months)
+        monthly_payment = calculate_monthly_payment(
+            eligibility.requested_amount, eligibility.offered_interest_rate, eligibility.requested_term_months
+        )
     
     context = {
         'eligibility': eligibility,
@@ -429,40 +556,30 @@ def loan_eligibility_result(request, pk):
 # Helper functions
 
 def generate_payment_schedule(loan):
-    """Generate payment schedule for a loan."""
-    principal = loan.amount
-    rate = loan.interest_rate / 100 / 12  # Monthly interest rate
-    term = loan.term_months
-    
-    # Calculate monthly payment using the formula: P = (r * PV) / (1 - (1 + r)^-n)
-    monthly_payment = (rate * principal) / (1 - (1 + rate) ** -term)
+    """Generate payment schedule for a loan, storing the payments due up to the schedule horizon."""
+    schedule = amortize(loan.amount, loan.interest_rate, loan.term_months)
     
     # Update loan's monthly payment
-    loan.monthly_payment = monthly_payment
+    loan.monthly_payment = schedule.monthly_payment
     loan.save()
     
-    # Generate payment schedule
-    balance = principal
-    payment_date = loan.start_date
-    
-    for month in range(1, term + 1):
-        interest_payment = balance * rate
-        principal_payment = monthly_payment - interest_payment
-        balance -= principal_payment
-        
-        # Create payment record
-        LoanPayment.objects.create(
-            loan=loan,
-            payment_date=payment_date,
-            amount=monthly_payment,
-            principal_amount=principal_payment,
-            interest_amount=interest_payment,
-            remaining_balance=max(0, balance),
-            is_paid=payment_date < timezone.now().date()  # Mark past payments as paid
-        )
-        
-        # Move to next month
-        payment_date = payment_date + relativedelta(months=1)
+    # Later payments are stored as they come within the horizon
+    materialize_payments(loan)
+
+def active_debts(loans):
+    """
+    Debts for the payoff optimizer from loans, at their recorded remaining balance.
+
+    A loan still owing money after its scheduled payments is kept as an
+    open-ended debt, so the plans cover the same balances as the total debt.
+    Pass loans from with_last_paid to avoid a query per loan.
+    """
+    debts = []
+    for loan in loans:
+        due, balance, remaining = outstanding(loan)
+        if balance > 0:
+            debts.append(Debt(loan.pk, balance, loan.interest_rate, loan.monthly_payment, remaining or None))
+    return debts
 
 def calculate_interest_rate(loan_type, credit_score, employment_years):
     """Calculate interest rate based on loan type, credit score, and employment history."""
@@ -510,10 +627,7 @@ def calculate_max_eligible_amount(monthly_income, existing_debt, interest_rate,
         return 0
     
     # Calculate maximum loan amount using the formula: PV = P * ((1 - (1 + r)^-n) / r)
-    monthly_rate = interest_rate / 100 / 12
-    max_amount = max_payment * ((1 - (1 + monthly_rate) ** -term_months) / monthly_rate)
-    
-    return max_amount
+    return present_value(max_payment, interest_rate, term_months).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
 
 def generate_eligibility_reason(is_eligible, dti_ratio, credit_score, employment_years):
     """Generate a reason for loan eligibility decision."""
@@ -532,3 +646,23 @@ def generate_eligibility_reason(is_eligible, dti_ratio, credit_score, employment
         return "Congratulations! You are eligible for this loan."
     else:
         return "We are unable to approve your loan request for the following reasons: " + " ".join(reasons)
+
+@login_required
+@require_GET
+def loan_payment_export(request):
+    """Stream the user's loan payments as CSV or XLSX, optionally within a date range."""
+    return export_queryset(
+        request,
+        LoanPayment.objects.filter(loan__user=request.user),
+        [
+            ('Date', 'payment_date'),
+            ('Loan type', 'loan__loan_type__name'),
+            ('Amount', 'amount'),
+            ('Principal', 'principal_amount'),
+            ('Interest', 'interest_amount'),
+            ('Remaining balance', 'remaining_balance'),
+            ('Paid', 'is_paid'),
+        ],
+        'loan-payments',
+        date_field='payment_date'
+    )